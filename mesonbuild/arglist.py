@@ -4,7 +4,6 @@
 
 from __future__ import annotations
 
-from functools import lru_cache
 import collections
 import enum
 import os
@@ -94,6 +93,17 @@ class CompilerArgs(T.MutableSequence[str]):
     # TODO: these should probably move too
     always_dedup_args = tuple('-l' + lib for lib in UNIXY_COMPILER_INTERNAL_LIBS)
 
+    # Memoized results of _can_dedup() and _should_prepend(), the same
+    # arguments are added over and over again for every target and source.
+    # Every subclass gets its own since the rules above differ.
+    _dedup_cache: T.Dict[str, Dedup] = {}
+    _prepend_cache: T.Dict[str, bool] = {}
+
+    def __init_subclass__(cls) -> None:
+        super().__init_subclass__()
+        cls._dedup_cache = {}
+        cls._prepend_cache = {}
+
     def __init__(self, compiler: T.Union['Compiler', 'StaticLinker'],
                  iterable: T.Optional[T.Iterable[str]] = None):
         self.compiler = compiler
@@ -111,15 +121,19 @@ class CompilerArgs(T.MutableSequence[str]):
         post_flush: T.Deque[str] = collections.deque()
         post_flush_set: T.Set[str] = set()
 
+        if not self.pre and not self.post:
+            return
+
+        dedup_cache = self._dedup_cache
         #The two lists are here walked from the front to the back, in order to not need removals for deduplication
         for a in self.pre:
-            dedup = self._can_dedup(a)
+            dedup = dedup_cache.get(a) or self._can_dedup(a)
             if a not in pre_flush_set:
                 new.append(a)
                 if dedup is Dedup.OVERRIDDEN:
                     pre_flush_set.add(a)
         for a in reversed(self.post):
-            dedup = self._can_dedup(a)
+            dedup = dedup_cache.get(a) or self._can_dedup(a)
             if a not in post_flush_set:
                 post_flush.appendleft(a)
                 if dedup is Dedup.OVERRIDDEN:
@@ -183,7 +197,6 @@ class CompilerArgs(T.MutableSequence[str]):
         return type(self)(self.compiler, self._container.copy())
 
     @classmethod
-    @lru_cache(maxsize=None)
     def _can_dedup(cls, arg: str) -> Dedup:
         """Returns whether the argument can be safely de-duped.
 
@@ -192,6 +205,14 @@ class CompilerArgs(T.MutableSequence[str]):
         to recursively search for symbols in the libraries. This is not needed
         with other linkers.
         """
+        try:
+            return cls._dedup_cache[arg]
+        except KeyError:
+            dedup = cls._dedup_cache[arg] = cls._compute_dedup(arg)
+            return dedup
+
+    @classmethod
+    def _compute_dedup(cls, arg: str) -> Dedup:
 
         # A standalone argument must never be deduplicated because it is
         # defined by what comes _after_ it. Thus deduping this:
@@ -215,9 +236,12 @@ class CompilerArgs(T.MutableSequence[str]):
         return Dedup.NO_DEDUP
 
     @classmethod
-    @lru_cache(maxsize=None)
     def _should_prepend(cls, arg: str) -> bool:
-        return arg.startswith(cls.prepend_prefixes)
+        try:
+            return cls._prepend_cache[arg]
+        except KeyError:
+            prepend = cls._prepend_cache[arg] = arg.startswith(cls.prepend_prefixes)
+            return prepend
 
     def to_native(self, copy: bool = False) -> T.List[str]:
         # Check if we need to add --start/end-group for circular dependencies
@@ -278,16 +302,21 @@ class CompilerArgs(T.MutableSequence[str]):
         tmp_pre: T.Deque[str] = collections.deque()
         if not isinstance(args, collections.abc.Iterable):
             raise TypeError(f'can only concatenate Iterable[str] (not "{args}") to CompilerArgs')
+        dedup_cache = self._dedup_cache
+        prepend_cache = self._prepend_cache
         for arg in args:
             # If the argument can be de-duped, do it either by removing the
             # previous occurrence of it and adding a new one, or not adding the
             # new occurrence.
-            dedup = self._can_dedup(arg)
+            dedup = dedup_cache.get(arg) or self._can_dedup(arg)
             if dedup is Dedup.UNIQUE:
                 # Argument already exists and adding a new instance is useless
                 if arg in self._container or arg in self.pre or arg in self.post:
                     continue
-            if self._should_prepend(arg):
+            prepend = prepend_cache.get(arg)
+            if prepend is None:
+                prepend = self._should_prepend(arg)
+            if prepend:
                 tmp_pre.appendleft(arg)
             else:
                 self.post.append(arg)
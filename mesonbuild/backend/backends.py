@@ -416,12 +416,130 @@ class Backend:
         osrc = f'{target.name}-unity{number}.{suffix}'
         return mesonlib.File.from_built_file(self.get_target_private_dir(target), osrc)
 
+    @lru_cache(maxsize=None)
+    def get_ninja_log_durations(self) -> T.Dict[str, int]:
+        '''Returns how long building each output took in the last ninja run, in milliseconds.'''
+        durations: T.Dict[str, int] = {}
+        try:
+            with open(os.path.join(self.environment.get_build_dir(), '.ninja_log'), encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    # start, end, mtime, output, command hash; later
+                    # entries supersede earlier ones
+                    fields = line.split('\t')
+                    if len(fields) == 5 and not line.startswith('#'):
+                        try:
+                            durations[fields[3].replace('\\', '/')] = int(fields[1]) - int(fields[0])
+                        except ValueError:
+                            pass
+        except OSError:
+            pass
+        return durations
+
+    def get_unity_source_weights(self, target: build.BuildTarget, suffix: str,
+                                 srcs: T.List[FileOrString], strategy: str) -> T.List[float]:
+        build_dir = self.environment.get_build_dir()
+        sizes: T.List[T.Optional[int]] = []
+        for src in srcs:
+            if isinstance(src, mesonlib.File):
+                path = src.absolute_path(self.environment.get_source_dir(), build_dir)
+            else:
+                path = os.path.join(build_dir, src)
+            try:
+                sizes.append(os.path.getsize(path))
+            except OSError:
+                # Not generated yet
+                sizes.append(None)
+        known_sizes = [s for s in sizes if s is not None]
+        default_size = sum(known_sizes) / len(known_sizes) if known_sizes else 1
+        weights = [float(default_size if s is None else s) for s in sizes]
+        if strategy != 'time':
+            return weights
+
+        # Spread the compile time of each unity object of the previous build
+        # over the sources it included, in proportion to their size. Unity
+        # files that were regrouped since they were compiled fall back to the
+        # size of their sources.
+        index = {str(src): i for i, src in enumerate(srcs)}
+        durations = self.get_ninja_log_durations()
+        times: T.Dict[int, float] = {}
+        number = 0
+        while True:
+            unity_src = self.get_unity_source_file(target, suffix, number)
+            number += 1
+            unity_path = unity_src.absolute_path(self.environment.get_source_dir(), build_dir)
+            try:
+                with open(unity_path, encoding='utf-8') as f:
+                    included = [index.get(m.group(1)) for m in re.finditer(r'^#include<(.*)>$', f.read(), re.MULTILINE)]
+            except OSError:
+                break
+            obj = os.path.join(self.get_target_private_dir(target), self.object_filename_from_source(target, unity_src))
+            duration = durations.get(obj.replace('\\', '/'))
+            members = [i for i in included if i is not None]
+            total_size = sum(weights[i] for i in members)
+            if duration is None or not members or total_size <= 0:
+                continue
+            # The duration is only about this grouping if the object was
+            # built after the unity file was last written
+            try:
+                if os.stat(os.path.join(build_dir, obj)).st_mtime_ns < os.stat(unity_path).st_mtime_ns:
+                    continue
+            except OSError:
+                continue
+            for i in members:
+                times[i] = duration * weights[i] / total_size
+        if not times:
+            return weights
+        # Estimate the sources that were not compiled yet from their size
+        rate = sum(times.values()) / sum(weights[i] for i in times)
+        return [times.get(i, weights[i] * rate) for i in range(len(srcs))]
+
+    def get_unity_source_groups(self, target: build.BuildTarget, suffix: str,
+                                srcs: T.List[FileOrString]) -> T.List[T.List[FileOrString]]:
+        '''
+        Splits the sources of one language into the contents of the unity
+        files of the target.
+
+        The number of unity files only depends on the number of sources and
+        unity_size, whatever the strategy, so that extracted objects can be
+        named without knowing the grouping. The strategy decides where each
+        group ends: after unity_size sources, or once the group reaches its
+        share of the total source size or of the compile time measured in
+        the previous build.
+        '''
+        unity_size = target.get_option(OptionKey('unity_size'))
+        assert isinstance(unity_size, int), 'for mypy'
+        count = (len(srcs) + unity_size - 1) // unity_size
+        strategy = target.get_option(OptionKey('unity_strategy'))
+        assert isinstance(strategy, str), 'for mypy'
+        if strategy == 'count' or count <= 1:
+            return [srcs[i:i + unity_size] for i in range(0, len(srcs), unity_size)]
+        weights = self.get_unity_source_weights(target, suffix, srcs, strategy)
+        total = sum(weights)
+        if total <= 0:
+            return [srcs[i:i + unity_size] for i in range(0, len(srcs), unity_size)]
+        # Groups stay contiguous, so that editing a source only moves the
+        # group boundaries next to it.
+        groups: T.List[T.List[FileOrString]] = []
+        start = 0
+        accumulated = 0.0
+        for group in range(1, count):
+            target_weight = total * group / count
+            end = start + 1
+            accumulated += weights[start]
+            # Leave at least one source for each remaining group
+            limit = len(srcs) - (count - group)
+            while end < limit and abs(accumulated + weights[end] - target_weight) <= abs(accumulated - target_weight):
+                accumulated += weights[end]
+                end += 1
+            groups.append(srcs[start:end])
+            start = end
+        groups.append(srcs[start:])
+        return groups
+
     def generate_unity_files(self, target: build.BuildTarget, unity_src: str) -> T.List[mesonlib.File]:
         abs_files: T.List[str] = []
         result: T.List[mesonlib.File] = []
         compsrcs = classify_unity_sources(target.compilers.values(), unity_src)
-        unity_size = target.get_option(OptionKey('unity_size'))
-        assert isinstance(unity_size, int), 'for mypy'
 
         def init_language_file(suffix: str, unity_file_number: int) -> T.TextIO:
             unity_src = self.get_unity_source_file(target, suffix, unity_file_number)
@@ -437,22 +555,11 @@ class Backend:
 
         # For each language, generate unity source files and return the list
         for comp, srcs in compsrcs.items():
-            files_in_current = unity_size + 1
-            unity_file_number = 0
-            # TODO: this could be simplified with an algorithm that pre-sorts
-            # the sources into the size of chunks we want
-            ofile = None
-            for src in srcs:
-                if files_in_current >= unity_size:
-                    if ofile:
-                        ofile.close()
-                    ofile = init_language_file(comp.get_default_suffix(), unity_file_number)
-                    unity_file_number += 1
-                    files_in_current = 0
-                ofile.write(f'#include<{src}>\n')
-                files_in_current += 1
-            if ofile:
-                ofile.close()
+            suffix = comp.get_default_suffix()
+            for unity_file_number, group in enumerate(self.get_unity_source_groups(target, suffix, srcs)):
+                with init_language_file(suffix, unity_file_number) as ofile:
+                    for src in group:
+                        ofile.write(f'#include<{src}>\n')
 
         for x in abs_files:
             mesonlib.replace_if_different(x, x + '.tmp')
@@ -762,6 +869,8 @@ class Backend:
     def rpaths_for_non_system_absolute_shared_libraries(self, target: build.BuildTarget, exclude_system: bool = True) -> 'ImmutableListProtocol[str]':
         paths: OrderedSet[str] = OrderedSet()
         srcdir = self.environment.get_source_dir()
+        external_rpath_dirs: T.Optional[T.Set[str]] = None
+        checked_libdirs: T.Set[str] = set()
 
         for dep in target.external_deps:
             if dep.type_name not in {'library', 'pkgconfig'}:
@@ -771,11 +880,15 @@ class Backend:
                 if not os.path.isabs(libpath):
                     continue
                 libdir = os.path.dirname(libpath)
-                if exclude_system and self._libdir_is_system(libdir, target.compilers, self.environment):
-                    # No point in adding system paths.
-                    continue
+                if libdir not in checked_libdirs:
+                    if exclude_system and self._libdir_is_system(libdir, target.compilers, self.environment):
+                        # No point in adding system paths.
+                        continue
+                    checked_libdirs.add(libdir)
                 # Don't remove rpaths specified in LDFLAGS.
-                if libdir in self.get_external_rpath_dirs(target):
+                if external_rpath_dirs is None:
+                    external_rpath_dirs = self.get_external_rpath_dirs(target)
+                if libdir in external_rpath_dirs:
                     continue
                 # Windows doesn't support rpaths, but we use this function to
                 # emulate rpaths by setting PATH
@@ -802,6 +915,7 @@ class Backend:
         return list(paths)
 
     # This may take other types
+    @lru_cache(maxsize=None)
     def determine_rpath_dirs(self, target: T.Union[build.BuildTarget, build.CustomTarget, build.CustomTargetIndex]
                              ) -> T.Tuple[str, ...]:
         result: OrderedSet[str]
@@ -899,7 +1013,8 @@ class Backend:
 
         # With unity builds, sources don't map directly to objects,
         # we only support extracting all the objects in this mode,
-        # so just return all object files.
+        # so just return all object files. The number of unity files does
+        # not depend on unity_strategy, see get_unity_source_groups().
         if extobj.target.is_unity:
             compsrcs = classify_unity_sources(extobj.target.compilers.values(), sources)
             sources = []
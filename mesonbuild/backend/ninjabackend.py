@@ -136,6 +136,43 @@ Please report this error with a test case to the Meson bug tracker.'''
         raise MesonException(errmsg)
     return quote_re.sub(r'$\g<0>', text)
 
+NINJA_EVAL_PAT = re.compile(r'\$(?:([$ :])|\{([a-zA-Z0-9_.-]+)\}|([a-zA-Z0-9_-]+))')
+NINJA_SHELL_UNSAFE_PAT = re.compile(r'[^A-Za-z0-9_+\-./]')
+
+def ninja_evaluate(text: str, variables: T.Mapping[str, str]) -> str:
+    '''Evaluates text the way ninja evaluates the command of a rule.'''
+    def repl(m: T.Match[str]) -> str:
+        if m.group(1):
+            return m.group(1)
+        # undefined ninja variables are empty
+        return variables.get(m.group(2) or m.group(3), '')
+    return NINJA_EVAL_PAT.sub(repl, text)
+
+def ninja_canonicalize(path: str) -> str:
+    '''Normalizes a path like ninja does with the paths of build statements.'''
+    path = path.replace('\\', '/')
+    absolute = path.startswith('/')
+    components: T.List[str] = []
+    for c in path.split('/'):
+        if c in {'', '.'}:
+            continue
+        if c == '..' and components and components[-1] != '..':
+            components.pop()
+            continue
+        components.append(c)
+    result = '/'.join(components)
+    if absolute:
+        result = '/' + result
+    return result or '.'
+
+def ninja_shell_escape(path: str) -> str:
+    '''Quotes a path like ninja does when expanding $in and $out.'''
+    if mesonlib.is_windows():
+        return quote_func(path)
+    if not NINJA_SHELL_UNSAFE_PAT.search(path):
+        return path
+    return "'" + path.replace("'", "'\\''") + "'"
+
 class TargetDependencyScannerInfo:
     def __init__(self, private_dir: str, source2object: T.Dict[str, str]):
         self.private_dir = private_dir
@@ -210,6 +247,7 @@ class NinjaRule:
         self.refcount = 0
         self.rsprefcount = 0
         self.rspfile_quote_style = rspfile_quote_style
+        self.command_template: T.Optional[str] = None
 
         if self.depfile == '$DEPFILE':
             self.depfile += '_UNQUOTED'
@@ -260,6 +298,12 @@ class NinjaRule:
                     outfile.write('\n')
             outfile.write('\n')
 
+    def get_command(self, variables: T.Mapping[str, str]) -> str:
+        '''The command run for a build statement without a response file.'''
+        if self.command_template is None:
+            self.command_template = ' '.join([self._quoter(x) for x in self.command + self.args])
+        return ninja_evaluate(self.command_template, variables)
+
     def length_estimate(self, infiles, outfiles, elems):
         # determine variables
         # this order of actions only approximates ninja's scoping rules, as
@@ -290,6 +334,29 @@ class NinjaRule:
         # determine command length
         return estimate
 
+class NinjaSharedVariables:
+    '''Top-level variables holding arguments common to many build statements.
+
+    Instead of repeating e.g. the hundreds of compile flags of a target for
+    each of its sources, they are written once as a variable that the build
+    statements reference. Ninja expands build statement variables when
+    parsing, so the executed commands are unchanged.
+    '''
+
+    def __init__(self) -> None:
+        self.names: T.Dict[T.Tuple[T.Tuple[str, ...], bool, T.Callable[[str], str]], str] = {}
+
+    def get_name(self, outfile: T.TextIO, elems: T.Tuple[str, ...], should_quote: bool,
+                 qf: T.Callable[[str], str]) -> str:
+        key = (elems, should_quote, qf)
+        name = self.names.get(key)
+        if name is None:
+            # Defined right before its first use
+            name = f'SHARED_ARGS_{len(self.names)}'
+            self.names[key] = name
+            outfile.write(f'{name} = {NinjaBuildElement.quote_elems(elems, should_quote, qf)}\n\n')
+        return name
+
 class NinjaBuildElement:
     def __init__(self, all_outputs: T.Set[str], outfilenames, rulename, infilenames, implicit_outs=None):
         self.implicit_outfilenames = implicit_outs or []
@@ -306,6 +373,7 @@ class NinjaBuildElement:
         self.deps = OrderedSet()
         self.orderdeps = OrderedSet()
         self.elems = []
+        self.shared_prefixes: T.Dict[str, T.Tuple[str, ...]] = {}
         self.all_outputs = all_outputs
         self.output_errors = ''
 
@@ -333,6 +401,23 @@ class NinjaBuildElement:
         if name == 'DEPFILE':
             self.elems.append((name + '_UNQUOTED', elems))
 
+    def add_item_with_shared_prefix(self, name: str, elems: T.Sequence[str], prefix: T.Tuple[str, ...]) -> None:
+        '''Like add_item(), for values that start with arguments shared with
+        other build statements, which are then only written once.'''
+        self.add_item(name, elems)
+        if elems is prefix or tuple(elems[:len(prefix)]) == prefix:
+            self.shared_prefixes[name] = prefix
+
+    @staticmethod
+    def quote_elems(elems: T.Iterable[str], should_quote: bool, qf: T.Callable[[str], str]) -> str:
+        newelems = []
+        for i in elems:
+            if not should_quote or i == '&&': # Hackety hack hack
+                newelems.append(ninja_quote(i))
+            else:
+                newelems.append(ninja_quote(qf(i)))
+        return ' '.join(newelems)
+
     def _should_use_rspfile(self):
         # 'phony' is a rule built-in to ninja
         if self.rulename == 'phony':
@@ -355,7 +440,7 @@ class NinjaBuildElement:
             else:
                 self.rule.refcount += 1
 
-    def write(self, outfile):
+    def write(self, outfile: T.TextIO, shared_vars: T.Optional[NinjaSharedVariables] = None) -> None:
         if self.output_errors:
             raise MesonException(self.output_errors)
         ins = ' '.join([ninja_quote(i, True) for i in self.infilenames])
@@ -389,7 +474,7 @@ class NinjaBuildElement:
                 (l.replace('//', '\\\\', 1) if l.startswith('//') else l)
                 for l in line.split(' ')
             )
-        outfile.write(line)
+        build_line = line
 
         if use_rspfile:
             if self.rule.rspfile_quote_style is RSPFileSyntax.MSVC:
@@ -399,21 +484,46 @@ class NinjaBuildElement:
         else:
             qf = quote_func
 
+        lines = []
         for e in self.elems:
             (name, elems) = e
             should_quote = name not in raw_names
             line = f' {name} = '
-            newelems = []
-            for i in elems:
-                if not should_quote or i == '&&': # Hackety hack hack
-                    newelems.append(ninja_quote(i))
-                else:
-                    newelems.append(ninja_quote(qf(i)))
-            line += ' '.join(newelems)
+            prefix = self.shared_prefixes.get(name)
+            if prefix and shared_vars is not None:
+                line += '$' + shared_vars.get_name(outfile, prefix, should_quote, qf)
+                elems = elems[len(prefix):]
+                if elems:
+                    line += ' '
+            line += self.quote_elems(elems, should_quote, qf)
             line += '\n'
-            outfile.write(line)
+            lines.append(line)
+        # Shared variables must be defined before the build statement
+        outfile.write(build_line)
+        outfile.writelines(lines)
         outfile.write('\n')
 
+    def get_compdb_entry(self, builddir: str) -> T.Dict[str, str]:
+        '''The entry of this build statement in compile_commands.json, as
+        written by ninja -t compdb -x but always without a response file.'''
+        infilenames = [ninja_canonicalize(i) for i in self.infilenames]
+        outfilenames = [ninja_canonicalize(o) for o in self.outfilenames]
+        variables = {
+            'in': ' '.join([ninja_shell_escape(i) for i in infilenames]),
+            'out': ' '.join([ninja_shell_escape(o) for o in outfilenames]),
+        }
+        for name, elems in self.elems:
+            if name in raw_names:
+                variables[name] = ' '.join(elems)
+            else:
+                variables[name] = ' '.join([i if i == '&&' else quote_func(i) for i in elems])
+        return {
+            'directory': builddir,
+            'command': self.rule.get_command(variables),
+            'file': infilenames[0] if infilenames else '',
+            'output': outfilenames[0],
+        }
+
     def check_outputs(self):
         for n in self.outfilenames:
             if n in self.all_outputs:
@@ -482,6 +592,11 @@ class NinjaBackend(backends.Backend):
         self.created_llvm_ir_rule = PerMachine(False, False)
         self.rust_crates: T.Dict[str, RustCrate] = {}
         self.implicit_meson_outs = []
+        # Identical compile argument tuples are shared between targets
+        self.interned_compile_args: T.Dict[T.Tuple[str, ...], T.Tuple[str, ...]] = {}
+        # Libraries found by guess_external_link_dependencies(), by search
+        # dirs, library name and naming patterns
+        self.guessed_library_paths: T.Dict[T.Tuple[T.Tuple[str, ...], str, T.Tuple[str, ...]], T.Optional[str]] = {}
 
     def create_phony_target(self, dummy_outfile: str, rulename: str, phony_infilename: str) -> NinjaBuildElement:
         '''
@@ -681,23 +796,34 @@ class NinjaBackend(backends.Backend):
 
     # http://clang.llvm.org/docs/JSONCompilationDatabase.html
     def generate_compdb(self):
-        rules = []
+        rules = set()
         # TODO: Rather than an explicit list here, rules could be marked in the
         # rule store as being wanted in compdb
         for for_machine in MachineChoice:
             for compiler in self.environment.coredata.compilers[for_machine].values():
-                rules += [f"{rule}{ext}" for rule in [self.compiler_to_rule_name(compiler)]
-                          for ext in ['', '_RSP']]
-                rules += [f"{rule}{ext}" for rule in [self.compiler_to_pch_rule_name(compiler)]
-                          for ext in ['', '_RSP']]
-        compdb_options = ['-x'] if mesonlib.version_compare(self.ninja_version, '>=1.9') else []
-        ninja_compdb = self.ninja_command + ['-t', 'compdb'] + compdb_options + rules
+                rules.add(self.compiler_to_rule_name(compiler))
+                rules.add(self.compiler_to_pch_rule_name(compiler))
+        # The entries are built from the build statements rather than by
+        # running ninja -t compdb, which would have to parse build.ninja again
         builddir = self.environment.get_build_dir()
+        entries = [b.get_compdb_entry(builddir) for b in self.build_elements
+                   if isinstance(b, NinjaBuildElement) and b.rulename in rules and hasattr(b, 'rule')]
+        # One entry per line, json.dumps() is much slower with indentation
+        jsondb = ('[\n' + ',\n'.join([json.dumps(e) for e in entries]) + '\n]\n').encode('utf-8')
+        # Leave the file alone if nothing changed, so that tools watching it
+        # do not reindex the project on every regeneration
+        compdb = os.path.join(builddir, 'compile_commands.json')
+        try:
+            with open(compdb, 'rb') as f:
+                if f.read() == jsondb:
+                    return
+        except OSError:
+            pass
         try:
-            jsondb = subprocess.check_output(ninja_compdb, cwd=builddir)
-            with open(os.path.join(builddir, 'compile_commands.json'), 'wb') as f:
+            with open(compdb + '~', 'wb') as f:
                 f.write(jsondb)
-        except Exception:
+            os.replace(compdb + '~', compdb)
+        except OSError:
             mlog.warning('Could not create compilation database.', fatal=False)
 
     # Get all generated headers. Any source file might need them so
@@ -716,10 +842,13 @@ class NinjaBackend(backends.Backend):
         if 'vala' in target.compilers and not isinstance(target, build.Executable):
             vala_header = File.from_built_file(self.get_target_dir(target), target.vala_header)
             header_deps.append(vala_header)
-        # Recurse and find generated headers
+        # Recurse and find generated headers, listing each header once as
+        # diamond-shaped dependency graphs would repeat them exponentially
+        deps_headers = OrderedSet(header_deps)
         for dep in itertools.chain(target.link_targets, target.link_whole_targets):
             if isinstance(dep, (build.StaticLibrary, build.SharedLibrary)):
-                header_deps += self.get_generated_headers(dep)
+                deps_headers.update(self.get_generated_headers(dep))
+        header_deps = list(deps_headers)
         target.cached_generated_headers = header_deps
         return header_deps
 
@@ -1315,14 +1444,17 @@ class NinjaBackend(backends.Backend):
         c = self.environment.get_build_command() + \
             ['--internal',
              'regenerate',
+             '$REGEN_ARGS',
              self.environment.get_source_dir(),
              # Ninja always runs from the build_dir. This includes cases where the user moved the
              # build directory and invalidated most references. Make sure it still regenerates.
              '.']
+        # The build files are left alone if their inputs were only touched,
+        # restat lets ninja know that they are up to date anyway.
         self.add_rule(NinjaRule('REGENERATE_BUILD',
                                 c, [],
                                 'Regenerating build files.',
-                                extra='generator = 1'))
+                                extra='generator = 1\nrestat = 1'))
 
     def add_rule_comment(self, comment: NinjaComment) -> None:
         self.rules.append(comment)
@@ -1356,8 +1488,12 @@ class NinjaBackend(backends.Backend):
             r.write(outfile)
 
     def write_builds(self, outfile: T.TextIO) -> None:
+        shared_vars = NinjaSharedVariables()
         for b in ProgressBar(self.build_elements, desc='Writing build.ninja'):
-            b.write(outfile)
+            if isinstance(b, NinjaBuildElement):
+                b.write(outfile, shared_vars)
+            else:
+                b.write(outfile)
         mlog.log_timestamp("build.ninja generated")
 
     def generate_phony(self) -> None:
@@ -2863,32 +2999,47 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
         commands += compiler.get_include_args(self.get_target_private_dir(target), False)
         return commands
 
-    # Returns a dictionary, mapping from each compiler src type (e.g. 'c', 'cpp', etc.) to a list of compiler arg strings
-    # used for that respective src type.
-    # Currently used for the purpose of populating VisualStudio intellisense fields but possibly useful in other scenarios.
-    def generate_common_compile_args_per_src_type(self, target: build.BuildTarget) -> dict[str, list[str]]:
-        src_type_to_args = {}
+    def intern_compile_args(self, args: T.Iterable[str]) -> T.Tuple[str, ...]:
+        args = tuple(args)
+        return self.interned_compile_args.setdefault(args, args)
+
+    @lru_cache(maxsize=None)
+    def _generate_single_compile_prefix(self, target: build.BuildTarget, compiler: Compiler) -> T.Tuple[str, ...]:
+        """The compile arguments shared by all sources of a target in a language.
 
+        Sources only add a few arguments of their own on top of this, so it
+        is computed and de-duplicated once per target and compiler.
+        """
+        commands = self._generate_single_compile_base_args(target, compiler)
+
+        # Include PCH header as first thing as it must be the first one or it will be
+        # ignored by gcc https://gcc.gnu.org/bugzilla/show_bug.cgi?id=100462
         use_pch = self.target_uses_pch(target)
+        if use_pch and 'mw' not in compiler.id:
+            commands += self.get_pch_include_args(compiler, target)
 
-        for src_type_str in target.compilers.keys():
-            compiler = target.compilers[src_type_str]
-            commands = self._generate_single_compile_base_args(target, compiler)
+        commands += self._generate_single_compile_target_args(target, compiler)
 
-            # Include PCH header as first thing as it must be the first one or it will be
-            # ignored by gcc https://gcc.gnu.org/bugzilla/show_bug.cgi?id=100462
-            if use_pch and 'mw' not in compiler.id:
-                commands += self.get_pch_include_args(compiler, target)
+        # Metrowerks compilers require PCH include args to come after intraprocedural analysis args
+        if use_pch and 'mw' in compiler.id:
+            commands += self.get_pch_include_args(compiler, target)
 
-            commands += self._generate_single_compile_target_args(target, compiler)
+        return self.intern_compile_args(commands)
 
-            # Metrowerks compilers require PCH include args to come after intraprocedural analysis args
-            if use_pch and 'mw' in compiler.id:
-                commands += self.get_pch_include_args(compiler, target)
+    @lru_cache(maxsize=None)
+    def _generate_single_compile_native_prefix(self, target: build.BuildTarget, compiler: Compiler) -> T.Tuple[str, ...]:
+        prefix = self._generate_single_compile_prefix(target, compiler)
+        return self.intern_compile_args(compiler.compiler_args(prefix).to_native())
 
-            commands = commands.compiler.compiler_args(commands)
+    # Returns a dictionary, mapping from each compiler src type (e.g. 'c', 'cpp', etc.) to a list of compiler arg strings
+    # used for that respective src type.
+    # Currently used for the purpose of populating VisualStudio intellisense fields but possibly useful in other scenarios.
+    def generate_common_compile_args_per_src_type(self, target: build.BuildTarget) -> dict[str, list[str]]:
+        src_type_to_args = {}
 
-            src_type_to_args[src_type_str] = commands.to_native()
+        for src_type_str in target.compilers.keys():
+            compiler = target.compilers[src_type_str]
+            src_type_to_args[src_type_str] = list(self._generate_single_compile_native_prefix(target, compiler))
         return src_type_to_args
 
     def generate_single_compile(self, target: build.BuildTarget, src,
@@ -2906,21 +3057,8 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
             raise AssertionError(f'BUG: sources should not contain headers {src!r}')
 
         compiler = get_compiler_for_source(target.compilers.values(), src)
-        commands = self._generate_single_compile_base_args(target, compiler)
-
-        # Include PCH header as first thing as it must be the first one or it will be
-        # ignored by gcc https://gcc.gnu.org/bugzilla/show_bug.cgi?id=100462
-        use_pch = self.target_uses_pch(target)
-        if use_pch and 'mw' not in compiler.id:
-            commands += self.get_pch_include_args(compiler, target)
-
-        commands += self._generate_single_compile_target_args(target, compiler)
-
-        # Metrowerks compilers require PCH include args to come after intraprocedural analysis args
-        if use_pch and 'mw' in compiler.id:
-            commands += self.get_pch_include_args(compiler, target)
-
-        commands = commands.compiler.compiler_args(commands)
+        prefix = self._generate_single_compile_prefix(target, compiler)
+        commands = compiler.compiler_args(prefix)
 
         # Create introspection information
         if is_generated is False:
@@ -2946,7 +3084,8 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
         dep_file = compiler.depfile_for_object(rel_obj)
 
         # Add MSVC debug file generation compile flags: /Fd /FS
-        commands += self.get_compile_debugfile_args(compiler, target, rel_obj)
+        debugfile_args = self.get_compile_debugfile_args(compiler, target, rel_obj)
+        commands += debugfile_args
 
         # PCH handling
         if self.target_uses_pch(target):
@@ -2965,6 +3104,7 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
 
         compiler_name = self.compiler_to_rule_name(compiler)
         extra_deps = []
+        module_args: T.List[str] = []
         if compiler.get_language() == 'fortran':
             # Can't read source file to scan for deps if it's generated later
             # at build-time. Skip scanning for deps, and just set the module
@@ -2987,7 +3127,8 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
                                                     'FORTRAN_DEP_HACK' + crstr,
                                                     rel_obj)
                         self.add_build(depelem)
-            commands += compiler.get_module_outdir_args(self.get_target_private_dir(target))
+            module_args = compiler.get_module_outdir_args(self.get_target_private_dir(target))
+            commands += module_args
         if extra_args is not None:
             commands.extend(extra_args)
 
@@ -3006,7 +3147,12 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
             element.add_orderdep(i)
         if dep_file:
             element.add_item('DEPFILE', dep_file)
-        element.add_item('ARGS', commands)
+        native_prefix = self._generate_single_compile_native_prefix(target, compiler)
+        if debugfile_args or module_args or extra_args:
+            element.add_item_with_shared_prefix('ARGS', commands.to_native(), native_prefix)
+        else:
+            # Nothing specific to this source, share the arguments of the target
+            element.add_item_with_shared_prefix('ARGS', native_prefix, native_prefix)
 
         self.add_dependency_scanner_entries_to_element(target, compiler, element, src)
         self.add_build(element)
@@ -3241,6 +3387,20 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
                 # Return the first result
                 return trial
 
+    def guess_resolved_library_path(self, linker, libname: str, search_dirs: T.Tuple[str, ...],
+                                    patterns: T.Tuple[str, ...]) -> T.Optional[str]:
+        # The same few libraries are looked up in the same directories by
+        # most link steps of a project.
+        key = (search_dirs, libname, patterns)
+        try:
+            return self.guessed_library_paths[key]
+        except KeyError:
+            pass
+        path = self.guess_library_absolute_path(linker, libname, search_dirs, patterns)
+        result = path.resolve().as_posix() if path else None
+        self.guessed_library_paths[key] = result
+        return result
+
     def guess_external_link_dependencies(self, linker, target, commands, internal):
         # Ideally the linker would generate dependency information that could be used.
         # But that has 2 problems:
@@ -3293,14 +3453,14 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
             for libname in libs:
                 # be conservative and record most likely shared and static resolution, because we don't know exactly
                 # which one the linker will prefer
-                staticlibs = self.guess_library_absolute_path(linker, libname,
+                staticlibs = self.guess_resolved_library_path(linker, libname,
                                                               search_dirs, static_patterns)
-                sharedlibs = self.guess_library_absolute_path(linker, libname,
+                sharedlibs = self.guess_resolved_library_path(linker, libname,
                                                               search_dirs, shared_patterns)
                 if staticlibs:
-                    guessed_dependencies.append(staticlibs.resolve().as_posix())
+                    guessed_dependencies.append(staticlibs)
                 if sharedlibs:
-                    guessed_dependencies.append(sharedlibs.resolve().as_posix())
+                    guessed_dependencies.append(sharedlibs)
         except (mesonlib.MesonException, AttributeError) as e:
             if 'get_library_naming' not in str(e):
                 raise
@@ -3657,6 +3817,7 @@ https://gcc.gnu.org/bugzilla/show_bug.cgi?id=47485'''))
 
         deps = self.get_regen_filelist()
         elem = NinjaBuildElement(self.all_outputs, 'build.ninja', 'REGENERATE_BUILD', deps)
+        elem.add_item('REGEN_ARGS', '--if-changed')
         elem.add_item('pool', 'console')
         self.add_build(elem)
 
@@ -3,6 +3,7 @@
 
 from __future__ import annotations
 import copy
+import functools
 import itertools
 import os
 import xml.dom.minidom
@@ -327,64 +328,80 @@ class Vs2010Backend(backends.Backend):
     def get_target_deps(self, t: T.Dict[T.Any, build.Target], recursive=False):
         all_deps: T.Dict[str, build.Target] = {}
         for target in t.values():
-            if isinstance(target, build.CustomTarget):
-                for d in target.get_target_dependencies():
-                    # FIXME: this isn't strictly correct, as the target doesn't
-                    # Get dependencies on non-targets, such as Files
-                    if isinstance(d, build.Target):
-                        all_deps[d.get_id()] = d
-            elif isinstance(target, build.RunTarget):
-                for d in target.get_dependencies():
+            if recursive:
+                all_deps.update(self._get_recursive_target_deps(target))
+            else:
+                all_deps.update(self._get_direct_target_deps(target))
+        return all_deps
+
+    # The dependencies of each target are computed once and shared by every
+    # project depending on it, instead of walking the whole graph again for
+    # each of them.
+    @functools.lru_cache(maxsize=None)
+    def _get_recursive_target_deps(self, target: build.Target) -> T.Dict[str, build.Target]:
+        all_deps: T.Dict[str, build.Target] = {}
+        direct_deps = self._get_direct_target_deps(target)
+        for dep in direct_deps.values():
+            all_deps.update(self._get_recursive_target_deps(dep))
+        all_deps.update(direct_deps)
+        return all_deps
+
+    @functools.lru_cache(maxsize=None)
+    def _get_direct_target_deps(self, target: build.Target) -> T.Dict[str, build.Target]:
+        all_deps: T.Dict[str, build.Target] = {}
+        if isinstance(target, build.CustomTarget):
+            for d in target.get_target_dependencies():
+                # FIXME: this isn't strictly correct, as the target doesn't
+                # Get dependencies on non-targets, such as Files
+                if isinstance(d, build.Target):
                     all_deps[d.get_id()] = d
-            elif isinstance(target, build.BuildTarget):
-                for ldep in target.link_targets:
-                    if isinstance(ldep, build.CustomTargetIndex):
-                        all_deps[ldep.get_id()] = ldep.target
-                    else:
-                        all_deps[ldep.get_id()] = ldep
-                for ldep in target.link_whole_targets:
-                    if isinstance(ldep, build.CustomTargetIndex):
-                        all_deps[ldep.get_id()] = ldep.target
-                    else:
-                        all_deps[ldep.get_id()] = ldep
-
-                for ldep in target.link_depends:
-                    if isinstance(ldep, build.CustomTargetIndex):
-                        all_deps[ldep.get_id()] = ldep.target
-                    elif isinstance(ldep, File):
-                        # Already built, no target references needed
-                        pass
-                    else:
-                        all_deps[ldep.get_id()] = ldep
+        elif isinstance(target, build.RunTarget):
+            for d in target.get_dependencies():
+                all_deps[d.get_id()] = d
+        elif isinstance(target, build.BuildTarget):
+            for ldep in target.link_targets:
+                if isinstance(ldep, build.CustomTargetIndex):
+                    all_deps[ldep.get_id()] = ldep.target
+                else:
+                    all_deps[ldep.get_id()] = ldep
+            for ldep in target.link_whole_targets:
+                if isinstance(ldep, build.CustomTargetIndex):
+                    all_deps[ldep.get_id()] = ldep.target
+                else:
+                    all_deps[ldep.get_id()] = ldep
+
+            for ldep in target.link_depends:
+                if isinstance(ldep, build.CustomTargetIndex):
+                    all_deps[ldep.get_id()] = ldep.target
+                elif isinstance(ldep, File):
+                    # Already built, no target references needed
+                    pass
+                else:
+                    all_deps[ldep.get_id()] = ldep
 
-                for obj_id, objdep in self.get_obj_target_deps(target.objects):
-                    all_deps[obj_id] = objdep
-            else:
-                raise MesonException(f'Unknown target type for target {target}')
+            for obj_id, objdep in self.get_obj_target_deps(target.objects):
+                all_deps[obj_id] = objdep
+        else:
+            raise MesonException(f'Unknown target type for target {target}')
 
-            for gendep in target.get_generated_sources():
-                if isinstance(gendep, build.CustomTarget):
-                    all_deps[gendep.get_id()] = gendep
-                elif isinstance(gendep, build.CustomTargetIndex):
-                    all_deps[gendep.target.get_id()] = gendep.target
-                else:
-                    generator = gendep.get_generator()
-                    gen_exe = generator.get_exe()
-                    if isinstance(gen_exe, build.Executable):
-                        all_deps[gen_exe.get_id()] = gen_exe
-                    for d in itertools.chain(generator.depends, gendep.depends):
-                        if isinstance(d, build.CustomTargetIndex):
-                            all_deps[d.get_id()] = d.target
-                        elif isinstance(d, build.Target):
-                            all_deps[d.get_id()] = d
-                        # FIXME: we don't handle other kinds of deps correctly here, such
-                        # as GeneratedLists, StructuredSources, and generated File.
-
-        if not t or not recursive:
-            return all_deps
-        ret = self.get_target_deps(all_deps, recursive)
-        ret.update(all_deps)
-        return ret
+        for gendep in target.get_generated_sources():
+            if isinstance(gendep, build.CustomTarget):
+                all_deps[gendep.get_id()] = gendep
+            elif isinstance(gendep, build.CustomTargetIndex):
+                all_deps[gendep.target.get_id()] = gendep.target
+            else:
+                generator = gendep.get_generator()
+                gen_exe = generator.get_exe()
+                if isinstance(gen_exe, build.Executable):
+                    all_deps[gen_exe.get_id()] = gen_exe
+                for d in itertools.chain(generator.depends, gendep.depends):
+                    if isinstance(d, build.CustomTargetIndex):
+                        all_deps[d.get_id()] = d.target
+                    elif isinstance(d, build.Target):
+                        all_deps[d.get_id()] = d
+                    # FIXME: we don't handle other kinds of deps correctly here, such
+                    # as GeneratedLists, StructuredSources, and generated File.
+        return all_deps
 
     def generate_solution_dirs(self, ofile: str, parents: T.Sequence[Path]) -> None:
         prj_templ = 'Project("{%s}") = "%s", "%s", "{%s}"\n'
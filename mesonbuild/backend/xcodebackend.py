@@ -1441,9 +1441,12 @@ class XCodeBackend(backends.Backend):
             settings_dict.add_item('SYMROOT', '"%s/build"' % self.environment.get_build_dir())
             bt_dict.add_item('name', f'"{buildtype}"')
 
-    def determine_internal_dep_link_args(self, target, buildtype):
+    # Memoized, as static libraries shared by several dependencies would
+    # be walked again for every path leading to them.
+    @functools.lru_cache(maxsize=None)
+    def determine_internal_dep_link_args(self, target, buildtype) -> T.Tuple[T.Tuple[str, ...], bool]:
         links_dylib = False
-        dep_libs = []
+        dep_libs: T.List[str] = []
         for l in target.link_targets:
             if isinstance(target, build.SharedModule) and isinstance(l, build.Executable):
                 continue
@@ -1464,7 +1467,7 @@ class XCodeBackend(backends.Backend):
                 (sub_libs, sub_links_dylib) = self.determine_internal_dep_link_args(l, buildtype)
                 dep_libs += sub_libs
                 links_dylib = links_dylib or sub_links_dylib
-        return (dep_libs, links_dylib)
+        return (tuple(dep_libs), links_dylib)
 
     def generate_single_build_target(self, objects_dict, target_name, target) -> None:
         for buildtype in self.buildtypes:
@@ -1487,7 +1490,8 @@ class XCodeBackend(backends.Backend):
                     relh = i.rel_to_builddir(self.build_to_src)
                     bridging_header = os.path.normpath(os.path.join(self.environment.get_build_dir(), relh))
                     break
-            (dep_libs, links_dylib) = self.determine_internal_dep_link_args(target, buildtype)
+            (dep_libs_t, links_dylib) = self.determine_internal_dep_link_args(target, buildtype)
+            dep_libs = list(dep_libs_t)
             if links_dylib:
                 dep_libs = ['-Wl,-search_paths_first', '-Wl,-headerpad_max_install_names'] + dep_libs
             dylib_version = None
@@ -1074,10 +1074,12 @@ class BuildTarget(Target):
 
     @lru_cache(maxsize=None)
     def get_transitive_link_deps(self) -> ImmutableListProtocol[BuildTargetTypes]:
-        result: T.List[Target] = []
+        # Each target is listed once, or diamond-shaped dependency graphs
+        # would make the list grow exponentially with their depth.
+        result: OrderedSet[Target] = OrderedSet()
         for i in self.link_targets:
-            result += i.get_all_link_deps()
-        return result
+            result.update(i.get_all_link_deps())
+        return list(result)
 
     def get_link_deps_mapping(self, prefix: str) -> T.Mapping[str, str]:
         return self.get_transitive_link_deps_mapping(prefix)
@@ -2991,19 +2993,139 @@ class CustomTargetIndex(CustomTargetBase, HoldableObject):
     def get_custom_install_dir(self) -> T.List[T.Union[str, Literal[False]]]:
         return self.target.get_custom_install_dir()
 
+ConfigurationValue = T.Tuple[T.Union[str, int, bool], T.Optional[str]]
+
+class _ConfigurationLayer:
+
+    """Entries of configuration data that are shared with its copies, and
+    therefore never modified again."""
+
+    __slots__ = ['parent', 'entries']
+
+    def __init__(self, parent: T.Optional[_ConfigurationLayer], entries: T.Dict[str, ConfigurationValue]):
+        self.parent = parent
+        self.entries = entries
+
+class ConfigurationValues(T.MutableMapping[str, ConfigurationValue]):
+
+    """Copy-on-write mapping holding the values of configuration data.
+
+    A copy shares all the entries present when it was made with the original,
+    and both only store the changes made afterwards. The shared entries are
+    kept in layers whose sizes decrease geometrically, so that lookups only
+    have to check a few of them and copying, merging and pickling many similar
+    configuration data objects costs in the number of changes rather than in
+    the number of entries.
+    """
+
+    def __init__(self, initial: T.Optional[T.Dict[str, ConfigurationValue]] = None) -> None:
+        self._base: T.Optional[_ConfigurationLayer] = None
+        self._changes: T.Dict[str, ConfigurationValue] = dict(initial) if initial else {}
+        self._size = len(self._changes)
+
+    def _in_base(self, key: str) -> bool:
+        layer = self._base
+        while layer is not None:
+            if key in layer.entries:
+                return True
+            layer = layer.parent
+        return False
+
+    def __getitem__(self, key: str) -> ConfigurationValue:
+        try:
+            return self._changes[key]
+        except KeyError:
+            pass
+        layer = self._base
+        while layer is not None:
+            try:
+                return layer.entries[key]
+            except KeyError:
+                layer = layer.parent
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._changes or (isinstance(key, str) and self._in_base(key))
+
+    def __setitem__(self, key: str, value: ConfigurationValue) -> None:
+        if key not in self._changes and not self._in_base(key):
+            self._size += 1
+        self._changes[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        entries = self._flatten()
+        del entries[key]
+        self._base = None
+        self._changes = entries
+        self._size -= 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> T.Iterator[str]:
+        return iter(self._flatten())
+
+    def __repr__(self) -> str:
+        return repr(self._flatten())
+
+    def _flatten(self) -> T.Dict[str, ConfigurationValue]:
+        layers: T.List[T.Dict[str, ConfigurationValue]] = [self._changes]
+        layer = self._base
+        while layer is not None:
+            layers.append(layer.entries)
+            layer = layer.parent
+        entries: T.Dict[str, ConfigurationValue] = {}
+        for l in reversed(layers):
+            entries.update(l)
+        return entries
+
+    def _freeze(self) -> None:
+        if not self._changes:
+            return
+        entries = self._changes
+        base = self._base
+        # Merge layers that are not much bigger than the new one, so that
+        # there are at most a logarithmic number of them
+        while base is not None and len(base.entries) <= 2 * len(entries):
+            entries = {**base.entries, **entries}
+            base = base.parent
+        self._base = _ConfigurationLayer(base, entries)
+        self._changes = {}
+
+    def copy(self) -> ConfigurationValues:
+        self._freeze()
+        new = ConfigurationValues()
+        new._base = self._base
+        new._size = self._size
+        return new
+
+    def update(self, other: T.Any = (), **kwargs: ConfigurationValue) -> None:
+        if isinstance(other, ConfigurationValues) and not self and not kwargs:
+            copied = other.copy()
+            self._base, self._changes, self._size = copied._base, copied._changes, copied._size
+            return
+        super().update(other, **kwargs)
+
 class ConfigurationData(HoldableObject):
     def __init__(self, initial_values: T.Optional[T.Union[
                 T.Dict[str, T.Tuple[T.Union[str, int, bool], T.Optional[str]]],
                 T.Dict[str, T.Union[str, int, bool]]]
             ] = None):
         super().__init__()
-        self.values: T.Dict[str, T.Tuple[T.Union[str, int, bool], T.Optional[str]]] = \
-            {k: v if isinstance(v, tuple) else (v, None) for k, v in initial_values.items()} if initial_values else {}
+        self.values = ConfigurationValues(
+            {k: v if isinstance(v, tuple) else (v, None) for k, v in initial_values.items()} if initial_values else None)
         self.used: bool = False
 
     def __repr__(self) -> str:
         return repr(self.values)
 
+    def __deepcopy__(self, memo: T.Dict[int, T.Any]) -> ConfigurationData:
+        # The values are immutable, only the mapping has to be copied
+        new = ConfigurationData()
+        new.values = self.values.copy()
+        new.used = self.used
+        return new
+
     def __contains__(self, value: str) -> bool:
         return value in self.values
 
@@ -28,6 +28,7 @@ __all__ = [
 
     'compiler_from_language',
     'detect_compiler_for',
+    'prefetch_compilers',
     'detect_static_linker',
     'detect_c_compiler',
     'detect_cpp_compiler',
@@ -70,6 +71,7 @@ from .compilers import (
 from .detect import (
     compiler_from_language,
     detect_compiler_for,
+    prefetch_compilers,
     detect_static_linker,
     detect_c_compiler,
     detect_cpp_compiler,
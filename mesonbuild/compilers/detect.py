@@ -4,18 +4,26 @@
 from __future__ import annotations
 
 from ..mesonlib import (
-    MesonException, EnvironmentException, MachineChoice, join_args,
+    MesonException, EnvironmentException, MachineChoice, OptionKey, join_args,
     search_version, is_windows, Popen_safe, Popen_safe_logged, windows_proof_rm,
+    prefetch_popen, clear_prefetched_popen,
 )
 from ..envconfig import BinaryTable
+from ..coredata import version as coredata_version
 from .. import mlog
 
 from ..linkers import guess_win_linker, guess_nix_linker
 
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+import hashlib
+import json
 import subprocess
 import platform
+import pickle
 import re
 import shutil
+import sys
 import tempfile
 import os
 import typing as T
@@ -102,17 +110,190 @@ def compiler_from_language(env: 'Environment', lang: str, for_machine: MachineCh
     return lang_map[lang](env, for_machine) if lang in lang_map else None
 
 def detect_compiler_for(env: 'Environment', lang: str, for_machine: MachineChoice, skip_sanity_check: bool) -> T.Optional[Compiler]:
-    comp = compiler_from_language(env, lang, for_machine)
+    cache_file = _get_detection_cache_file(env, lang, for_machine)
+    cached = _load_cached_compiler(cache_file) if cache_file else None
+    if cached is not None:
+        comp, sanity_checked = cached
+        mlog.debug(f'Using cached detection of the {lang} compiler from {cache_file}')
+        env.coredata.add_lang_args(comp.language, type(comp), for_machine, env)
+    else:
+        comp = compiler_from_language(env, lang, for_machine)
+        sanity_checked = False
     if comp is None:
         return comp
     assert comp.for_machine == for_machine
     env.coredata.process_new_compiler(lang, comp, env)
-    if not skip_sanity_check:
+    if not skip_sanity_check and not sanity_checked:
         comp.sanity_check(env.get_scratch_dir(), env)
+        sanity_checked = True
+    if cache_file and (cached is None or sanity_checked != cached[1]):
+        _store_cached_compiler(cache_file, comp, sanity_checked)
     env.coredata.compilers[comp.for_machine][lang] = comp
     return comp
 
 
+# Detection cache
+# ===============
+#
+# If MESON_COMPILER_CACHE_DIR is set, detected compilers are stored there and
+# reused by later setups that would run the exact same detection: same
+# candidate binaries, same environment and machine files. This saves the
+# --version probes, define dumps, linker detection and sanity checks on
+# every fresh build directory.
+
+# Environment variables read by compilers and linkers themselves. Variables
+# like CC and CFLAGS are already part of the binaries and options.
+_DETECTION_ENV_VARS = ['PATH', 'CPATH', 'C_INCLUDE_PATH', 'CPLUS_INCLUDE_PATH', 'OBJC_INCLUDE_PATH',
+                       'LIBRARY_PATH', 'COMPILER_PATH', 'GCC_EXEC_PREFIX', 'SDKROOT',
+                       'MACOSX_DEPLOYMENT_TARGET', 'INCLUDE', 'LIB', 'WATCOM']
+
+# Detected with the help of the C compiler of the same machine
+_USES_C_COMPILER = {'rust', 'd', 'nasm', 'masm'}
+
+def _get_binary_identity(name: str) -> T.Optional[T.Tuple[str, int, int, int]]:
+    path = shutil.which(name)
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.realpath(path), st.st_size, st.st_mtime_ns, st.st_ino)
+
+def _get_detection_cache_file(env: 'Environment', lang: str, for_machine: MachineChoice) -> T.Optional[str]:
+    cache_dir = os.environ.get('MESON_COMPILER_CACHE_DIR')
+    if not cache_dir:
+        return None
+    # These pick their linker or machine information from the C compiler
+    langs = [lang, 'c'] if lang in _USES_C_COMPILER else [lang]
+    candidates: T.List[str] = []
+    for l in langs:
+        entry = env.lookup_binary_entry(for_machine, l)
+        if entry is not None:
+            candidates.append(entry[0])
+        elif l in defaults:
+            candidates += defaults[l]
+        else:
+            return None
+    key = {
+        'meson': coredata_version,
+        'python': sys.version,
+        'lang': lang,
+        'machine': for_machine.get_lower_case_name(),
+        'machines': [repr(sorted(vars(m).items())) for m in (env.machines.build, env.machines.host, env.machines.target)],
+        'cross': env.is_cross_build(),
+        'binaries': [env.lookup_binary_entry(for_machine, n)
+                     for n in [f'{l}{s}' for l in langs for s in ['', '_ld']] + ['exe_wrapper']],
+        'identities': {n: _get_binary_identity(n) for n in candidates + ['ccache', 'sccache']},
+        'options': sorted((str(k), repr(v)) for k, v in env.options.items()
+                          if k.lang in langs and k.machine is for_machine),
+        'properties': repr(sorted(env.properties[for_machine].properties.items())),
+        'env': [os.environ.get(v) for v in _DETECTION_ENV_VARS],
+    }
+    digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+    return os.path.join(cache_dir, f'{lang}-{digest}.dat')
+
+def _load_cached_compiler(fname: str) -> T.Optional[T.Tuple[Compiler, bool]]:
+    try:
+        with open(fname, 'rb') as f:
+            data = pickle.load(f)
+        comp = data['compiler']
+        identities = data['identities']
+        sanity_checked = data['sanity_checked']
+    except Exception:
+        # Missing, truncated or from an incompatible Meson
+        return None
+    # The binaries that ended up being used, including ones that were not
+    # candidates such as the linker, must not have changed either
+    for name, identity in identities.items():
+        if _get_binary_identity(name) != identity:
+            return None
+    return comp, sanity_checked
+
+def _store_cached_compiler(fname: str, comp: Compiler, sanity_checked: bool) -> None:
+    names = [comp.get_exelist(ccache=False)[0]]
+    if comp.linker is not None:
+        names.append(comp.linker.exelist[0])
+    data = {
+        'compiler': comp,
+        'identities': {n: _get_binary_identity(n) for n in names},
+        'sanity_checked': sanity_checked,
+    }
+    try:
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        tempfilename = fname + f'.{os.getpid()}~'
+        with open(tempfilename, 'wb') as f:
+            pickle.dump(data, f)
+        os.replace(tempfilename, fname)
+    except (OSError, pickle.PicklingError) as e:
+        mlog.debug(f'Could not store the detected {comp.language} compiler in {fname}: {e}')
+
+# Concurrent probing
+# ==================
+#
+# Most of the time spent detecting a compiler is spent waiting for it to
+# answer --version and similar probes. For the common GCC and Clang drivers
+# these probes are predictable, so prefetch_compilers() starts them for all
+# requested languages and machines at once in a thread pool. Detection itself
+# still runs language by language and picks the results up through
+# Popen_safe(), so logging, errors and the detected compilers are the same
+# as when running the probes one after the other.
+
+_PREFETCH_LANGUAGES = {'c', 'cpp', 'objc', 'objcpp', 'fortran'}
+_PREFETCH_COMPILER_RE = re.compile(r'^(?:.*-)?(?:cc|c\+\+|gcc|g\+\+|clang|clang\+\+|gfortran)(?:-[0-9.]+)?(?:\.exe)?$')
+
+def _prefetch_compiler_probes(executor: ThreadPoolExecutor, env: 'Environment', lang: str, for_machine: MachineChoice) -> None:
+    cache_file = _get_detection_cache_file(env, lang, for_machine)
+    if cache_file and os.path.exists(cache_file):
+        return
+    try:
+        compilers, _, _ = _get_compilers(env, lang, for_machine)
+    except EnvironmentException:
+        return
+    compiler = compilers[0]
+    if not _PREFETCH_COMPILER_RE.match(os.path.basename(compiler[0])):
+        return
+    # The linker probe depends on the flags, don't guess them
+    flag_keys = [OptionKey(n, lang=lang, machine=for_machine) for n in ['args', 'env_args', 'link_args']]
+    guess_linker = env.lookup_binary_entry(for_machine, f'{lang}_ld') is None and not any(env.options.get(k) for k in flag_keys)
+
+    def version_done(future: Future[T.Tuple[subprocess.Popen[str], str, str]]) -> None:
+        try:
+            out = future.result()[1]
+        except Exception:
+            return
+        if 'Free Software Foundation' not in out and 'clang' not in out:
+            return
+        try:
+            prefetch_popen(executor, compiler + ['-E', '-dM', '-'], write='')
+            if guess_linker:
+                prefetch_popen(executor, compiler + ['-Wl,--version'])
+        except RuntimeError:
+            # The executor was shut down, detection is already over
+            pass
+
+    prefetch_popen(executor, compiler + ['--version']).add_done_callback(version_done)
+
+@contextmanager
+def prefetch_compilers(env: 'Environment', langs: T.List[str], machines: T.List[MachineChoice]) -> T.Iterator[None]:
+    """Run the probes for detecting the compilers of langs concurrently.
+
+    The compilers must be detected inside the with block to benefit from it.
+    """
+    todo = [(lang, m) for m in machines for lang in langs
+            if lang in _PREFETCH_LANGUAGES and lang not in env.coredata.compilers[m]]
+    if not todo:
+        yield
+        return
+    executor = ThreadPoolExecutor(max_workers=3 * len(todo))
+    try:
+        for lang, m in todo:
+            _prefetch_compiler_probes(executor, env, lang, m)
+        yield
+    finally:
+        clear_prefetched_popen()
+        executor.shutdown(wait=False)
+
 # Helpers
 # =======
 
@@ -48,6 +48,11 @@ GROUP_FLAGS = re.compile(r'''\.so (?:\.[0-9]+)? (?:\.[0-9]+)? (?:\.[0-9]+)?$ |
                              ^(?:-Wl,)?-l |
                              \.a$''', re.X)
 
+# Arguments that change where, or whether, the linker looks for -l<name>
+LIBRARY_SEARCH_PREFIXES = ('-L', '-Wl,-L', '-Wl,--library-path', '-Wl,-B', '-Wl,-static',
+                           '-Wl,--sysroot', '-Wl,-nostdlib', '-Xlinker', '--sysroot',
+                           '-static', '-nostdlib', '-B')
+
 class CLikeCompilerArgs(arglist.CompilerArgs):
     prepend_prefixes = ('-I', '-L')
     dedup2_prefixes = ('-I', '-isystem', '-L', '-D', '-U')
@@ -213,28 +218,25 @@ class CLikeCompiler(Compiler):
         # the compiler knows what it's doing, and accept the directory anyway.
         retval: T.List[str] = []
         for d in dirs:
-            files = [f for f in os.listdir(d) if f.endswith('.so') and os.path.isfile(os.path.join(d, f))]
+            files = [f for f in mesonlib.library_dir_index.files(d) if f.endswith('.so')]
             # if no files, accept directory and move on
             if not files:
                 retval.append(d)
                 continue
 
             for f in files:
-                file_to_check = os.path.join(d, f)
-                try:
-                    with open(file_to_check, 'rb') as fd:
-                        header = fd.read(5)
-                        # if file is not an ELF file, it's weird, but accept dir
-                        # if it is elf, and the class matches, accept dir
-                        if header[1:4] != b'ELF' or int(header[4]) == elf_class:
-                            retval.append(d)
-                        # at this point, it's an ELF file which doesn't match the
-                        # appropriate elf_class, so skip this one
-                    # stop scanning after the first successful read
-                    break
-                except OSError:
-                    # Skip the file if we can't read it
-                    pass
+                file_class = mesonlib.library_dir_index.elf_class(os.path.join(d, f))
+                # Skip the file if we can't read it
+                if file_class is None:
+                    continue
+                # if file is not an ELF file, it's weird, but accept dir
+                # if it is elf, and the class matches, accept dir
+                if file_class in {0, elf_class}:
+                    retval.append(d)
+                # at this point, it's an ELF file which doesn't match the
+                # appropriate elf_class, so skip this one
+                # stop scanning after the first successful read
+                break
 
         return retval
 
@@ -1106,7 +1108,7 @@ class CLikeCompiler(Compiler):
         architecture.
         '''
         for p in paths:
-            if p.is_file():
+            if mesonlib.library_dir_index.is_file(str(p)):
 
                 if env.machines.host.is_darwin() and env.machines.build.is_darwin():
                     # Run `lipo` and check if the library supports the arch we want
@@ -1126,6 +1128,50 @@ class CLikeCompiler(Compiler):
         '''
         return self.sizeof('void *', '', env)[0] == 8
 
+    def _get_elf_class(self, env: 'Environment') -> int:
+        # try to detect if we are 64-bit or 32-bit. If we can't
+        # detect, we will just skip path validity checks done in
+        # get_library_dirs() call
+        try:
+            if self.output_is_64bit(env):
+                return 2
+            else:
+                return 1
+        except (mesonlib.MesonException, KeyError): # TODO evaluate if catching KeyError is wanted here
+            return 0
+
+    def _links_from_library_dirs(self, libname: str, env: 'Environment') -> bool:
+        '''
+        Whether the linker will find a matching lib<libname>.so or
+        lib<libname>.a in its default search path, without having to link a
+        test program.
+
+        Returns False whenever this cannot be decided for sure, e.g. because
+        the compiler or linker flags from the environment change the search
+        path, or the first candidate has the wrong ELF class, in which case
+        the caller has to run the link check.
+        '''
+        m = env.machines[self.for_machine]
+        if m.is_darwin() or m.is_windows() or m.is_cygwin() or m.is_openbsd():
+            return False
+        # CFLAGS are used when linking too
+        sys_args = env.coredata.get_external_args(self.for_machine, self.language) + \
+            env.coredata.get_external_link_args(self.for_machine, self.language)
+        if any(a.startswith(LIBRARY_SEARCH_PREFIXES) for a in sys_args):
+            return False
+        elf_class = self._get_elf_class(env)
+        for d in self.get_library_dirs(env, elf_class):
+            # The linker prefers the shared library in each directory
+            for suffix in ('so', 'a'):
+                path = os.path.join(d, f'lib{libname}.{suffix}')
+                if not mesonlib.library_dir_index.is_file(path):
+                    continue
+                if suffix == 'so' and elf_class:
+                    # Linker scripts such as libc.so are not ELF files
+                    return mesonlib.library_dir_index.elf_class(path) in {0, elf_class}
+                return True
+        return False
+
     def _find_library_real(self, libname: str, env: 'Environment', extra_dirs: T.List[str], code: str, libtype: LibType, lib_prefix_warning: bool) -> T.Optional[T.List[str]]:
         # First try if we can just add the library as -l.
         # Gcc + co seem to prefer builtin lib dirs to -L dirs.
@@ -1135,6 +1181,11 @@ class CLikeCompiler(Compiler):
         if ((not extra_dirs and libtype is LibType.PREFER_SHARED) or
                 libname in self.internal_libs):
             cargs = ['-l' + libname]
+            # Avoid spawning the compiler if the library is in the default
+            # search path anyway
+            if self._links_from_library_dirs(libname, env):
+                return cargs
+
             largs = self.get_linker_always_args() + self.get_allow_undefined_link_args()
             extra_args = cargs + self.linker_to_compiler_args(largs)
 
@@ -1146,16 +1197,7 @@ class CLikeCompiler(Compiler):
         # Not found or we want to use a specific libtype? Try to find the
         # library file itself.
         patterns = self.get_library_naming(env, libtype)
-        # try to detect if we are 64-bit or 32-bit. If we can't
-        # detect, we will just skip path validity checks done in
-        # get_library_dirs() call
-        try:
-            if self.output_is_64bit(env):
-                elf_class = 2
-            else:
-                elf_class = 1
-        except (mesonlib.MesonException, KeyError): # TODO evaluate if catching KeyError is wanted here
-            elf_class = 0
+        elf_class = self._get_elf_class(env)
         # Search in the specified dirs, and then in the system libraries
         for d in itertools.chain(extra_dirs, self.get_library_dirs(env, elf_class)):
             for p in patterns:
@@ -6,7 +6,7 @@ from __future__ import annotations
 from pathlib import Path
 
 from .base import ExternalDependency, DependencyException, sort_libpaths, DependencyTypeName
-from ..mesonlib import EnvironmentVariables, OptionKey, OrderedSet, PerMachine, Popen_safe, Popen_safe_logged, MachineChoice, join_args
+from ..mesonlib import EnvironmentVariables, OptionKey, OrderedSet, PerMachine, Popen_safe, Popen_safe_logged, MachineChoice, join_args, library_dir_index
 from ..programs import find_external_program, ExternalProgram
 from .. import mlog
 from pathlib import PurePath
@@ -434,7 +434,7 @@ class PkgConfigDependency(ExternalDependency):
                 foundname = None
                 for libdir in libpaths:
                     target = os.path.join(libdir, libfilename)
-                    if os.path.exists(target):
+                    if library_dir_index.exists(target):
                         foundname = target
                         break
                 if foundname is None:
@@ -20,6 +20,7 @@ from ..mesonlib import (EnvironmentVariables, ExecutableSerialisation, MesonBugE
 from ..programs import ExternalProgram, NonExistingExternalProgram
 from ..dependencies import Dependency
 from ..depfile import DepFile
+from ..utils import profiler
 from ..interpreterbase import ContainerTypeInfo, InterpreterBase, KwargInfo, typed_kwargs, typed_pos_args
 from ..interpreterbase import noPosargs, noKwargs, permittedKwargs, noArgsFlattening, noSecondLevelHolderResolving, unholder_return
 from ..interpreterbase import InterpreterException, InvalidArguments, InvalidCode, SubdirDoneRequest
@@ -298,6 +299,7 @@ class Interpreter(InterpreterBase, HoldableObject):
         self.subprojects: T.Dict[str, SubprojectHolder] = {}
         self.subproject_stack: T.List[str] = []
         self.configure_file_outputs: T.Dict[str, int] = {}
+        self.configure_file_writer = mesonlib.ConfigureFileWriter(self.coredata.configure_file_cache)
         # Passed from the outside, only used in subprojects.
         if default_project_options:
             self.default_project_options = default_project_options.copy()
@@ -596,6 +598,21 @@ class Interpreter(InterpreterBase, HoldableObject):
                 dep = df.lookup(kwargs, force_fallback=True)
                 self.build.stdlibs[for_machine][l] = dep
 
+    # Outputs of configure_file() are written in the background until
+    # something else than configuring files is done, as it could read them.
+    def function_call(self, node: mparser.FunctionNode) -> T.Optional[InterpreterObject]:
+        if self.configure_file_writer.pending and node.func_name.value not in {'configure_file', 'configuration_data'}:
+            self.configure_file_writer.flush()
+        return super().function_call(node)
+
+    def method_call(self, node: mparser.MethodNode) -> T.Optional[InterpreterObject]:
+        if self.configure_file_writer.pending:
+            obj = node.source_object
+            if not (isinstance(obj, mparser.IdNode) and
+                    isinstance(self.variables.get(obj.value), OBJ.ConfigurationDataHolder)):
+                self.configure_file_writer.flush()
+        return super().method_call(node)
+
     @typed_pos_args('import', str)
     @typed_kwargs(
         'import',
@@ -758,6 +775,7 @@ class Interpreter(InterpreterBase, HoldableObject):
         KwargInfo('check', (bool, NoneType), since='0.47.0'),
         KwargInfo('capture', bool, default=True, since='0.47.0'),
         ENV_KW.evolve(since='0.50.0'),
+        KwargInfo('cache', bool, default=False, since='1.4.0'),
     )
     def func_run_command(self, node: mparser.BaseNode,
                          args: T.Tuple[T.Union[build.Executable, ExternalProgram, compilers.Compiler, mesonlib.File, str],
@@ -839,7 +857,8 @@ class Interpreter(InterpreterBase, HoldableObject):
 
         return RunProcess(cmd, expanded_args, env, srcdir, builddir, self.subdir,
                           self.environment.get_build_command() + ['introspect'],
-                          in_builddir=in_builddir, check=check, capture=capture)
+                          in_builddir=in_builddir, check=check, capture=capture,
+                          cache=self.coredata.run_command_cache if kwargs['cache'] else None)
 
     def func_option(self, nodes, args, kwargs):
         raise InterpreterException('Tried to call option() in build description file. All options must be in the option file.')
@@ -1281,6 +1300,8 @@ class Interpreter(InterpreterBase, HoldableObject):
                 self.environment.wrap_resolver.merge_wraps(r)
             else:
                 self.environment.wrap_resolver = r
+            if self.coredata.get_option(OptionKey('wrap_prefetch')):
+                self.environment.wrap_resolver.prefetch(list(r.wraps))
 
         self.build.projects[self.subproject] = proj_name
         mlog.log('Project name:', mlog.bold(proj_name))
@@ -1296,8 +1317,9 @@ class Interpreter(InterpreterBase, HoldableObject):
             force_vsenv = vsenv or backend.startswith('vs')
             mesonlib.setup_vsenv(force_vsenv)
 
-        self.add_languages(proj_langs, True, MachineChoice.HOST)
-        self.add_languages(proj_langs, False, MachineChoice.BUILD)
+        with compilers.prefetch_compilers(self.environment, proj_langs, [MachineChoice.HOST, MachineChoice.BUILD]):
+            self.add_languages(proj_langs, True, MachineChoice.HOST)
+            self.add_languages(proj_langs, False, MachineChoice.BUILD)
 
         self.set_backend()
         if not self.is_subproject():
@@ -1315,7 +1337,9 @@ class Interpreter(InterpreterBase, HoldableObject):
                 mlog.log('Compiler for language', mlog.bold(lang), 'skipped: feature', mlog.bold(feature), 'disabled')
             return False
         if native is not None:
-            return self.add_languages(langs, required, self.machine_from_native_kwarg(kwargs))
+            for_machine = self.machine_from_native_kwarg(kwargs)
+            with compilers.prefetch_compilers(self.environment, langs, [for_machine]):
+                return self.add_languages(langs, required, for_machine)
         else:
             # absent 'native' means 'both' for backwards compatibility
             tv = FeatureNew.get_target_version(self.subproject)
@@ -1323,8 +1347,9 @@ class Interpreter(InterpreterBase, HoldableObject):
                 mlog.warning('add_languages is missing native:, assuming languages are wanted for both host and build.',
                              location=node)
 
-            success = self.add_languages(langs, False, MachineChoice.BUILD)
-            success &= self.add_languages(langs, required, MachineChoice.HOST)
+            with compilers.prefetch_compilers(self.environment, langs, [MachineChoice.BUILD, MachineChoice.HOST]):
+                success = self.add_languages(langs, False, MachineChoice.BUILD)
+                success &= self.add_languages(langs, required, MachineChoice.HOST)
             return success
 
     def _stringify_user_arguments(self, args: T.List[TYPE_var], func_name: str) -> T.List[str]:
@@ -2411,7 +2436,8 @@ class Interpreter(InterpreterBase, HoldableObject):
             me.file = absname
             raise me
         try:
-            self.evaluate_codeblock(codeblock)
+            with profiler.file_span(self.subdir):
+                self.evaluate_codeblock(codeblock)
         except SubdirDoneRequest:
             pass
         self.subdir = prev_subdir
@@ -2634,6 +2660,10 @@ class Interpreter(InterpreterBase, HoldableObject):
         (ofile_path, ofile_fname) = os.path.split(os.path.join(self.subdir, output))
         ofile_abs = os.path.join(self.environment.build_dir, ofile_path, ofile_fname)
 
+        # Inputs and outputs of other actions may be pending
+        if kwargs['configuration'] is None or any(f.is_built for f in inputs):
+            self.configure_file_writer.flush()
+
         # Perform the appropriate action
         if kwargs['configuration'] is not None:
             conf = kwargs['configuration']
@@ -2651,8 +2681,8 @@ class Interpreter(InterpreterBase, HoldableObject):
                 os.makedirs(os.path.join(self.environment.build_dir, self.subdir), exist_ok=True)
                 file_encoding = kwargs['encoding']
                 missing_variables, confdata_useless = \
-                    mesonlib.do_conf_file(inputs_abs[0], ofile_abs, conf,
-                                          fmt, file_encoding, self.subproject)
+                    self.configure_file_writer.conf_file(inputs_abs[0], ofile_abs, conf,
+                                                         fmt, file_encoding, self.subproject)
                 if missing_variables:
                     var_list = ", ".join(repr(m) for m in sorted(missing_variables))
                     mlog.warning(
@@ -2668,7 +2698,7 @@ class Interpreter(InterpreterBase, HoldableObject):
                                      'argument added in 0.47.0', location=node)
             else:
                 macro_name = kwargs['macro_name']
-                mesonlib.dump_conf_header(ofile_abs, conf, output_format, macro_name)
+                self.configure_file_writer.conf_header(ofile_abs, conf, output_format, macro_name)
             conf.used = True
         elif kwargs['command'] is not None:
             if len(inputs) > 1:
@@ -2685,7 +2715,7 @@ class Interpreter(InterpreterBase, HoldableObject):
             mlog.log('Configuring', mlog.bold(output), 'with command')
             cmd, *args = _cmd
             res = self.run_command_impl((cmd, args),
-                                        {'capture': True, 'check': True, 'env': EnvironmentVariables()},
+                                        {'capture': True, 'check': True, 'env': EnvironmentVariables(), 'cache': False},
                                         True)
             if kwargs['capture']:
                 dst_tmp = ofile_abs + '~'
@@ -2992,7 +3022,10 @@ class Interpreter(InterpreterBase, HoldableObject):
             return ret
 
     def run(self) -> None:
-        super().run()
+        try:
+            super().run()
+        finally:
+            self.configure_file_writer.flush()
         mlog.log('Build targets in project:', mlog.bold(str(len(self.build.targets))))
         FeatureNew.report(self.subproject)
         FeatureDeprecated.report(self.subproject)
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import hashlib
 import os
 import shlex
 import subprocess
@@ -210,12 +211,13 @@ class RunProcess(MesonInterpreterObject):
                  mesonintrospect: T.List[str],
                  in_builddir: bool = False,
                  check: bool = False,
-                 capture: bool = True) -> None:
+                 capture: bool = True,
+                 cache: T.Optional[T.Dict['coredata.RunCommandCacheKey', 'coredata.RunCommandCacheValue']] = None) -> None:
         super().__init__()
         if not isinstance(cmd, ExternalProgram):
             raise AssertionError('BUG: RunProcess must be passed an ExternalProgram')
         self.capture = capture
-        self.returncode, self.stdout, self.stderr = self.run_command(cmd, args, env, source_dir, build_dir, subdir, mesonintrospect, in_builddir, check)
+        self.returncode, self.stdout, self.stderr = self.run_command(cmd, args, env, source_dir, build_dir, subdir, mesonintrospect, in_builddir, check, cache)
         self.methods.update({'returncode': self.returncode_method,
                              'stdout': self.stdout_method,
                              'stderr': self.stderr_method,
@@ -230,7 +232,9 @@ class RunProcess(MesonInterpreterObject):
                     subdir: str,
                     mesonintrospect: T.List[str],
                     in_builddir: bool,
-                    check: bool = False) -> T.Tuple[int, str, str]:
+                    check: bool = False,
+                    cache: T.Optional[T.Dict['coredata.RunCommandCacheKey', 'coredata.RunCommandCacheValue']] = None
+                    ) -> T.Tuple[int, str, str]:
         command_array = cmd.get_command() + args
         menv = {'MESON_SOURCE_ROOT': source_dir,
                 'MESON_BUILD_ROOT': build_dir,
@@ -245,6 +249,18 @@ class RunProcess(MesonInterpreterObject):
         child_env.update(menv)
         child_env = env.get_env(child_env)
         stdout = subprocess.PIPE if self.capture else subprocess.DEVNULL
+        if cache is not None:
+            # Only the variables set for the command are part of the key, the
+            # result must not depend on the rest of the environment.
+            env_changes = tuple(sorted((k, v) for k, v in child_env.items() if os.environ.get(k) != v))
+            key = (tuple(command_array), cwd, env_changes, self.capture)
+            inputs = self._hash_inputs(command_array, cwd)
+            cached = cache.get(key)
+            if cached is not None and cached[0] == inputs:
+                mlog.debug('Using cached result of command:', mesonlib.join_args(command_array))
+                if check and cached[1] != 0:
+                    raise InterpreterException('Command `{}` failed with status {}.'.format(mesonlib.join_args(command_array), cached[1]))
+                return cached[1:]
         mlog.debug('Running command:', mesonlib.join_args(command_array))
         try:
             p, o, e = Popen_safe(command_array, stdout=stdout, env=child_env, cwd=cwd)
@@ -261,10 +277,26 @@ class RunProcess(MesonInterpreterObject):
             if check and p.returncode != 0:
                 raise InterpreterException('Command `{}` failed with status {}.'.format(mesonlib.join_args(command_array), p.returncode))
 
+            if cache is not None:
+                cache[key] = (inputs, p.returncode, o, e)
             return p.returncode, o, e
         except FileNotFoundError:
             raise InterpreterException('Could not execute command `%s`.' % mesonlib.join_args(command_array))
 
+    @staticmethod
+    def _hash_inputs(command_array: T.List[str], cwd: str) -> T.Tuple[T.Tuple[str, str], ...]:
+        '''Content hashes of the files in the command line.'''
+        hashes = []
+        for arg in command_array:
+            path = os.path.join(cwd, arg)
+            if os.path.isfile(path):
+                h = hashlib.sha256()
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        h.update(chunk)
+                hashes.append((arg, h.hexdigest()))
+        return tuple(hashes)
+
     @noPosargs
     @noKwargs
     def returncode_method(self, args: T.List[TYPE_var], kwargs: TYPE_kwargs) -> int:
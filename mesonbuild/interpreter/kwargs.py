@@ -247,6 +247,7 @@ class RunCommand(TypedDict):
     check: bool
     capture: T.Optional[bool]
     env: EnvironmentVariables
+    cache: bool
 
 
 class FeatureOptionRequire(TypedDict):
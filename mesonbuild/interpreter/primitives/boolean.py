@@ -15,24 +15,20 @@ from ...interpreterbase import (
 import typing as T
 
 if T.TYPE_CHECKING:
-    # Object holders need the actual interpreter
-    from ...interpreter import Interpreter
     from ...interpreterbase import TYPE_var, TYPE_kwargs
 
 class BooleanHolder(ObjectHolder[bool]):
-    def __init__(self, obj: bool, interpreter: 'Interpreter') -> None:
-        super().__init__(obj, interpreter)
-        self.methods.update({
-            'to_int': self.to_int_method,
-            'to_string': self.to_string_method,
-        })
-
-        self.trivial_operators.update({
-            MesonOperator.BOOL: (None, lambda x: self.held_object),
-            MesonOperator.NOT: (None, lambda x: not self.held_object),
-            MesonOperator.EQUALS: (bool, lambda x: self.held_object == x),
-            MesonOperator.NOT_EQUALS: (bool, lambda x: self.held_object != x),
-        })
+    METHODS = {
+        'to_int': 'to_int_method',
+        'to_string': 'to_string_method',
+    }
+
+    TRIVIAL_OPERATORS = {
+        MesonOperator.BOOL: (None, lambda obj, x: obj.held_object),
+        MesonOperator.NOT: (None, lambda obj, x: not obj.held_object),
+        MesonOperator.EQUALS: (bool, lambda obj, x: obj.held_object == x),
+        MesonOperator.NOT_EQUALS: (bool, lambda obj, x: obj.held_object != x),
+    }
 
     def display_name(self) -> str:
         return 'bool'
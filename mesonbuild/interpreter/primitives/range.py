@@ -15,12 +15,13 @@ if T.TYPE_CHECKING:
     from ...interpreterbase import SubProject
 
 class RangeHolder(MesonInterpreterObject, IterableObject):
+    OPERATORS = {
+        MesonOperator.INDEX: 'op_index',
+    }
+
     def __init__(self, start: int, stop: int, step: int, *, subproject: 'SubProject') -> None:
         super().__init__(subproject=subproject)
         self.range = range(start, stop, step)
-        self.operators.update({
-            MesonOperator.INDEX: self.op_index,
-        })
 
     def op_index(self, other: int) -> int:
         try:
@@ -38,6 +38,33 @@ TYPE_key_resolver = T.Callable[[mparser.BaseNode], str]
 SubProject = T.NewType('SubProject', str)
 
 class InterpreterObject:
+    # Methods and operators supported by every instance of a class. Unlike
+    # the per-instance tables set up in __init__, these are built once per
+    # class, and entries of base classes are inherited. METHODS and OPERATORS
+    # map to the names of the implementing methods, so that subclasses can
+    # override them. TRIVIAL_OPERATORS hold functions taking the object and
+    # the other operand. The per-instance tables take precedence.
+    METHODS: T.ClassVar[T.Dict[str, str]] = {}
+    OPERATORS: T.ClassVar[T.Dict[MesonOperator, str]] = {
+        MesonOperator.EQUALS: 'op_equals',
+        MesonOperator.NOT_EQUALS: 'op_not_equals',
+    }
+    TRIVIAL_OPERATORS: T.ClassVar[T.Dict[
+        MesonOperator,
+        T.Tuple[
+            T.Union[T.Type, T.Tuple[T.Type, ...], None],
+            T.Callable[[T.Any, T.Any], TYPE_var]
+        ]
+    ]] = {}
+
+    def __init_subclass__(cls, **kwargs: T.Any) -> None:
+        super().__init_subclass__(**kwargs)
+        for table in ('METHODS', 'OPERATORS', 'TRIVIAL_OPERATORS'):
+            merged: T.Dict[T.Any, T.Any] = {}
+            for base in reversed(cls.__mro__):
+                merged.update(base.__dict__.get(table, {}))
+            setattr(cls, table, merged)
+
     def __init__(self, *, subproject: T.Optional['SubProject'] = None) -> None:
         self.methods: T.Dict[
             str,
@@ -56,12 +83,6 @@ class InterpreterObject:
         self.current_node:  mparser.BaseNode = None
         self.subproject = subproject or SubProject('')
 
-        # Some default operators supported by all objects
-        self.operators.update({
-            MesonOperator.EQUALS: self.op_equals,
-            MesonOperator.NOT_EQUALS: self.op_not_equals,
-        })
-
     # The type of the object that can be printed to the user
     def display_name(self) -> str:
         return type(self).__name__
@@ -72,8 +93,10 @@ class InterpreterObject:
                 args: T.List[TYPE_var],
                 kwargs: TYPE_kwargs
             ) -> TYPE_var:
-        if method_name in self.methods:
-            method = self.methods[method_name]
+        method = self.methods.get(method_name)
+        if method is None and method_name in self.METHODS:
+            method = getattr(self, self.METHODS[method_name])
+        if method is not None:
             if not getattr(method, 'no-args-flattening', False):
                 args = flatten(args)
             if not getattr(method, 'no-second-level-holder-flattening', False):
@@ -84,15 +107,27 @@ class InterpreterObject:
     def operator_call(self, operator: MesonOperator, other: TYPE_var) -> TYPE_var:
         if operator in self.trivial_operators:
             op = self.trivial_operators[operator]
-            if op[0] is None and other is not None:
-                raise MesonBugException(f'The unary operator `{operator.value}` of {self.display_name()} was passed the object {other} of type {type(other).__name__}')
-            if op[0] is not None and not isinstance(other, op[0]):
-                raise InvalidArguments(f'The `{operator.value}` operator of {self.display_name()} does not accept objects of type {type(other).__name__} ({other})')
+            self._check_trivial_operand(operator, op[0], other)
             return op[1](other)
         if operator in self.operators:
             return self.operators[operator](other)
+        if operator in self.TRIVIAL_OPERATORS:
+            cop = self.TRIVIAL_OPERATORS[operator]
+            self._check_trivial_operand(operator, cop[0], other)
+            return cop[1](self, other)
+        if operator in self.OPERATORS:
+            method: OperatorCall = getattr(self, self.OPERATORS[operator])
+            return method(other)
         raise InvalidCode(f'Object {self} of type {self.display_name()} does not support the `{operator.value}` operator.')
 
+    def _check_trivial_operand(self, operator: MesonOperator,
+                               accepted: T.Union[T.Type, T.Tuple[T.Type, ...], None],
+                               other: TYPE_var) -> None:
+        if accepted is None and other is not None:
+            raise MesonBugException(f'The unary operator `{operator.value}` of {self.display_name()} was passed the object {other} of type {type(other).__name__}')
+        if accepted is not None and not isinstance(other, accepted):
+            raise InvalidArguments(f'The `{operator.value}` operator of {self.display_name()} does not accept objects of type {type(other).__name__} ({other})')
+
     # Default comparison operator support
     def _throw_comp_exception(self, other: TYPE_var, opt_type: str) -> T.NoReturn:
         raise InvalidArguments(textwrap.dedent(
@@ -10,6 +10,7 @@ from ._unholder import _unholder
 
 from dataclasses import dataclass
 from functools import wraps
+import functools
 import abc
 import itertools
 import copy
@@ -181,6 +182,8 @@ def typed_pos_args(name: str, *types: T.Union[T.Type, T.Tuple[T.Type, ...]],
     correct, all of the arguments are string names of files. If the first
     argument is something else the it should be separated.
     """
+    num_types = len(types)
+
     def inner(f: TV_func) -> TV_func:
 
         @wraps(f)
@@ -195,7 +198,6 @@ def typed_pos_args(name: str, *types: T.Union[T.Type, T.Tuple[T.Type, ...]],
                 'varargs and optargs not supported together as this would be ambiguous'
 
             num_args = len(args)
-            num_types = len(types)
             a_types = types
 
             if varargs:
@@ -229,7 +231,8 @@ def typed_pos_args(name: str, *types: T.Union[T.Type, T.Tuple[T.Type, ...]],
             # Depending on what kind of function we're calling the length of
             # wrapped_args can vary.
             nargs = list(wrapped_args)
-            i = nargs.index(args)
+            # get_callee_args() always takes the arguments from there
+            i = len(nargs) - 2
             if varargs:
                 # if we have varargs we need to split them into a separate
                 # tuple, as python's typing doesn't understand tuples with
@@ -451,126 +454,157 @@ def typed_kwargs(name: str, *types: KwargInfo, allow_unknown: bool = False) -> T
     :param *types: KwargInfo entries for each keyword argument.
     """
     def inner(f: TV_func) -> TV_func:
-
-        def types_description(types_tuple: T.Tuple[T.Union[T.Type, ContainerTypeInfo], ...]) -> str:
-            candidates = []
-            for t in types_tuple:
-                if isinstance(t, ContainerTypeInfo):
-                    candidates.append(t.description())
-                else:
-                    candidates.append(t.__name__)
-            shouldbe = 'one of: ' if len(candidates) > 1 else ''
-            shouldbe += ', '.join(candidates)
-            return shouldbe
-
-        def raw_description(t: object) -> str:
-            """describe a raw type (ie, one that is not a ContainerTypeInfo)."""
-            if isinstance(t, list):
-                if t:
-                    return f"array[{' | '.join(sorted(mesonlib.OrderedSet(type(v).__name__ for v in t)))}]"
-                return 'array[]'
-            elif isinstance(t, dict):
-                if t:
-                    return f"dict[{' | '.join(sorted(mesonlib.OrderedSet(type(v).__name__ for v in t.values())))}]"
-                return 'dict[]'
-            return type(t).__name__
-
-        def check_value_type(types_tuple: T.Tuple[T.Union[T.Type, ContainerTypeInfo], ...],
-                             value: T.Any) -> bool:
-            for t in types_tuple:
-                if isinstance(t, ContainerTypeInfo):
-                    if t.check(value):
-                        return True
-                elif isinstance(value, t):
-                    return True
-            return False
+        # The specification is compiled into a list of validators once, so
+        # that calls only do the work required by the arguments they got
+        validators = [_compile_kwarg_info(name, info) for info in types]
+        all_names = frozenset(t.name for t in types)
 
         @wraps(f)
         def wrapper(*wrapped_args: T.Any, **wrapped_kwargs: T.Any) -> T.Any:
-
-            def emit_feature_change(values: T.Dict[_T, T.Union[str, T.Tuple[str, str]]], feature: T.Union[T.Type['FeatureDeprecated'], T.Type['FeatureNew']]) -> None:
-                for n, version in values.items():
-                    if isinstance(version, tuple):
-                        version, msg = version
-                    else:
-                        msg = None
-
-                    warning: T.Optional[str] = None
-                    if isinstance(n, ContainerTypeInfo):
-                        if n.check_any(value):
-                            warning = f'of type {n.description()}'
-                    elif isinstance(n, type):
-                        if isinstance(value, n):
-                            warning = f'of type {n.__name__}'
-                    elif isinstance(value, list):
-                        if n in value:
-                            warning = f'value "{n}" in list'
-                    elif isinstance(value, dict):
-                        if n in value.keys():
-                            warning = f'value "{n}" in dict keys'
-                    elif n == value:
-                        warning = f'value "{n}"'
-                    if warning:
-                        feature.single_use(f'"{name}" keyword argument "{info.name}" {warning}', version, subproject, msg, location=node)
-
             node, _, _kwargs, subproject = get_callee_args(wrapped_args)
             # Cast here, as the convertor function may place something other than a TYPE_var in the kwargs
             kwargs = T.cast('T.Dict[str, object]', _kwargs)
 
-            if not allow_unknown:
-                all_names = {t.name for t in types}
+            if not allow_unknown and not all_names.issuperset(kwargs):
                 unknowns = set(kwargs).difference(all_names)
-                if unknowns:
-                    ustr = ', '.join([f'"{u}"' for u in sorted(unknowns)])
-                    raise InvalidArguments(f'{name} got unknown keyword arguments {ustr}')
-
-            for info in types:
-                types_tuple = info.types if isinstance(info.types, tuple) else (info.types,)
-                value = kwargs.get(info.name)
-                if value is not None:
-                    if info.since:
-                        feature_name = info.name + ' arg in ' + name
-                        FeatureNew.single_use(feature_name, info.since, subproject, info.since_message, location=node)
-                    if info.deprecated:
-                        feature_name = info.name + ' arg in ' + name
-                        FeatureDeprecated.single_use(feature_name, info.deprecated, subproject, info.deprecated_message, location=node)
-                    if info.listify:
-                        kwargs[info.name] = value = mesonlib.listify(value)
-                    if not check_value_type(types_tuple, value):
-                        shouldbe = types_description(types_tuple)
-                        raise InvalidArguments(f'{name} keyword argument {info.name!r} was of type {raw_description(value)} but should have been {shouldbe}')
-
-                    if info.validator is not None:
-                        msg = info.validator(value)
-                        if msg is not None:
-                            raise InvalidArguments(f'{name} keyword argument "{info.name}" {msg}')
-
-                    if info.deprecated_values is not None:
-                        emit_feature_change(info.deprecated_values, FeatureDeprecated)
-
-                    if info.since_values is not None:
-                        emit_feature_change(info.since_values, FeatureNew)
-
-                elif info.required:
-                    raise InvalidArguments(f'{name} is missing required keyword argument "{info.name}"')
-                else:
-                    # set the value to the default, this ensuring all kwargs are present
-                    # This both simplifies the typing checking and the usage
-                    assert check_value_type(types_tuple, info.default), f'In function {name} default value of {info.name} is not a valid type, got {type(info.default)} expected {types_description(types_tuple)}'
-                    # Create a shallow copy of the container. This allows mutable
-                    # types to be used safely as default values
-                    kwargs[info.name] = copy.copy(info.default)
-                    if info.not_set_warning:
-                        mlog.warning(info.not_set_warning)
-
-                if info.convertor:
-                    kwargs[info.name] = info.convertor(kwargs[info.name])
+                ustr = ', '.join([f'"{u}"' for u in sorted(unknowns)])
+                raise InvalidArguments(f'{name} got unknown keyword arguments {ustr}')
+
+            for validator in validators:
+                validator(kwargs, node, subproject)
 
             return f(*wrapped_args, **wrapped_kwargs)
         return T.cast('TV_func', wrapper)
     return inner
 
 
+def _types_description(types_tuple: T.Tuple[T.Union[T.Type, ContainerTypeInfo], ...]) -> str:
+    candidates = []
+    for t in types_tuple:
+        if isinstance(t, ContainerTypeInfo):
+            candidates.append(t.description())
+        else:
+            candidates.append(t.__name__)
+    shouldbe = 'one of: ' if len(candidates) > 1 else ''
+    shouldbe += ', '.join(candidates)
+    return shouldbe
+
+def _raw_description(t: object) -> str:
+    """describe a raw type (ie, one that is not a ContainerTypeInfo)."""
+    if isinstance(t, list):
+        if t:
+            return f"array[{' | '.join(sorted(mesonlib.OrderedSet(type(v).__name__ for v in t)))}]"
+        return 'array[]'
+    elif isinstance(t, dict):
+        if t:
+            return f"dict[{' | '.join(sorted(mesonlib.OrderedSet(type(v).__name__ for v in t.values())))}]"
+        return 'dict[]'
+    return type(t).__name__
+
+def _make_type_checker(types_tuple: T.Tuple[T.Union[T.Type, ContainerTypeInfo], ...]) -> T.Callable[[T.Any], bool]:
+    plain = tuple(t for t in types_tuple if not isinstance(t, ContainerTypeInfo))
+    containers = [t for t in types_tuple if isinstance(t, ContainerTypeInfo)]
+    if not containers:
+        return lambda value: isinstance(value, plain)
+
+    def check(value: T.Any) -> bool:
+        # Order does not matter, the result is the same whichever type matches
+        if plain and isinstance(value, plain):
+            return True
+        return any(c.check(value) for c in containers)
+    return check
+
+def _emit_feature_change(name: str, info: KwargInfo, value: T.Any,
+                         values: T.Dict[_T, T.Union[str, T.Tuple[str, str]]],
+                         feature: T.Union[T.Type['FeatureDeprecated'], T.Type['FeatureNew']],
+                         node: mparser.BaseNode, subproject: SubProject) -> None:
+    for n, version in values.items():
+        if isinstance(version, tuple):
+            version, msg = version
+        else:
+            msg = None
+
+        warning: T.Optional[str] = None
+        if isinstance(n, ContainerTypeInfo):
+            if n.check_any(value):
+                warning = f'of type {n.description()}'
+        elif isinstance(n, type):
+            if isinstance(value, n):
+                warning = f'of type {n.__name__}'
+        elif isinstance(value, list):
+            if n in value:
+                warning = f'value "{n}" in list'
+        elif isinstance(value, dict):
+            if n in value.keys():
+                warning = f'value "{n}" in dict keys'
+        elif n == value:
+            warning = f'value "{n}"'
+        if warning:
+            feature.single_use(f'"{name}" keyword argument "{info.name}" {warning}', version, subproject, msg, location=node)
+
+_IMMUTABLE_DEFAULTS = (str, int, float, tuple, frozenset, type(None))
+
+def _compile_kwarg_info(name: str, info: KwargInfo) -> T.Callable[[T.Dict[str, object], mparser.BaseNode, SubProject], None]:
+    """Turn a KwargInfo into a function validating its argument in the
+    keyword arguments of a call, and setting its default value."""
+    types_tuple = info.types if isinstance(info.types, tuple) else (info.types,)
+    check_type = _make_type_checker(types_tuple)
+    kwname = info.name
+    feature_name = info.name + ' arg in ' + name
+    since, since_message = info.since, info.since_message
+    deprecated, deprecated_message = info.deprecated, info.deprecated_message
+    listify, validator, convertor = info.listify, info.validator, info.convertor
+    since_values, deprecated_values = info.since_values, info.deprecated_values
+    required, not_set_warning = info.required, info.not_set_warning
+    default = info.default
+    # Mutable defaults are shallow copied, so that they can be used safely
+    copy_default: T.Optional[T.Callable[[], T.Any]] = None
+    if isinstance(default, (list, dict)):
+        copy_default = default.copy
+    elif not isinstance(default, _IMMUTABLE_DEFAULTS):
+        copy_default = functools.partial(copy.copy, default)
+    default_ok = check_type(default)
+
+    def validate(kwargs: T.Dict[str, object], node: mparser.BaseNode, subproject: SubProject) -> None:
+        value = kwargs.get(kwname)
+        if value is not None:
+            if since:
+                FeatureNew.single_use(feature_name, since, subproject, since_message, location=node)
+            if deprecated:
+                FeatureDeprecated.single_use(feature_name, deprecated, subproject, deprecated_message, location=node)
+            if listify:
+                kwargs[kwname] = value = mesonlib.listify(value)
+            if not check_type(value):
+                shouldbe = _types_description(types_tuple)
+                raise InvalidArguments(f'{name} keyword argument {kwname!r} was of type {_raw_description(value)} but should have been {shouldbe}')
+
+            if validator is not None:
+                msg = validator(value)
+                if msg is not None:
+                    raise InvalidArguments(f'{name} keyword argument "{kwname}" {msg}')
+
+            if deprecated_values is not None:
+                _emit_feature_change(name, info, value, deprecated_values, FeatureDeprecated, node, subproject)
+
+            if since_values is not None:
+                _emit_feature_change(name, info, value, since_values, FeatureNew, node, subproject)
+
+        elif required:
+            raise InvalidArguments(f'{name} is missing required keyword argument "{kwname}"')
+        else:
+            # set the value to the default, this ensuring all kwargs are present
+            # This both simplifies the typing checking and the usage
+            assert default_ok, f'In function {name} default value of {kwname} is not a valid type, got {type(default)} expected {_types_description(types_tuple)}'
+            kwargs[kwname] = copy_default() if copy_default else default
+            if not_set_warning:
+                mlog.warning(not_set_warning)
+
+        if convertor:
+            kwargs[kwname] = convertor(kwargs[kwname])
+
+    return validate
+
+
 # This cannot be a dataclass due to https://github.com/python/mypy/issues/5374
 class FeatureCheckBase(metaclass=abc.ABCMeta):
     "Base class for feature version checks"
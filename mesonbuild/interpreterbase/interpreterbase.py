@@ -6,6 +6,7 @@
 from __future__ import annotations
 
 from .. import environment, mparser, mesonlib
+from ..utils import profiler
 
 from .baseobjects import (
     InterpreterObject,
@@ -59,6 +60,13 @@ if T.TYPE_CHECKING:
         T.Callable[[mparser.BaseNode, T.List[TYPE_var], T.Dict[str, TYPE_var]], TYPE_var]
     ]
 
+# Holders of these exact types are shared between all occurrences of the same
+# value, see InterpreterBase._holderify().
+SHARED_HOLDER_TYPES = frozenset({str, int, bool})
+# Bounds on the shared holders kept by an interpreter.
+MAX_SHARED_HOLDERS = 1024
+MAX_SHARED_STRING_LENGTH = 256
+
 
 class InvalidCodeOnVoid(InvalidCode):
 
@@ -74,6 +82,7 @@ class InterpreterBase:
         # Holder maps store a mapping from an HoldableObject to a class ObjectHolder
         self.holder_map: HolderMapType = {}
         self.bound_holder_map: HolderMapType = {}
+        self.shared_holders: T.Dict[T.Tuple[type, T.Union[str, int, bool]], InterpreterObject] = {}
         self.subdir = subdir
         self.root_subdir = subdir
         self.subproject = subproject
@@ -118,7 +127,8 @@ class InterpreterBase:
         Parses project() and initializes languages, compilers etc. Do this
         early because we need this before we parse the rest of the AST.
         """
-        self.evaluate_codeblock(self.ast, end=1)
+        with profiler.file_span(self.subdir):
+            self.evaluate_codeblock(self.ast, end=1)
 
     def sanity_check_ast(self) -> None:
         def _is_project(ast: mparser.CodeBlockNode) -> object:
@@ -158,7 +168,8 @@ class InterpreterBase:
         # Evaluate everything after the first line, which is project() because
         # we already parsed that in self.parse_project()
         try:
-            self.evaluate_codeblock(self.ast, start=1)
+            with profiler.file_span(self.subdir):
+                self.evaluate_codeblock(self.ast, start=1)
         except SubdirDoneRequest:
             pass
 
@@ -516,7 +527,11 @@ class InterpreterBase:
             if not getattr(func, 'no-second-level-holder-flattening', False):
                 func_args, kwargs = resolve_second_level_holders(func_args, kwargs)
             self.current_node = node
-            res = func(node, func_args, kwargs)
+            if profiler.active is None:
+                res = func(node, func_args, kwargs)
+            else:
+                with profiler.active.span(func_name, 'function', self.subdir, node.lineno):
+                    res = func(node, func_args, kwargs)
             return self._holderify(res) if res is not None else None
         else:
             self.unknown_function_called(func_name)
@@ -545,10 +560,31 @@ class InterpreterBase:
             elif not isinstance(obj, Disabler):
                 raise InvalidArguments(f'Invalid operation "extract_objects" on {object_display_name} of type {type(obj).__name__}')
         obj.current_node = self.current_node = node
-        res = obj.method_call(method_name, args, kwargs)
+        if profiler.active is None:
+            res = obj.method_call(method_name, args, kwargs)
+        else:
+            with profiler.active.span(f'{obj.display_name()}.{method_name}', 'method', self.subdir, node.lineno):
+                res = obj.method_call(method_name, args, kwargs)
         return self._holderify(res) if res is not None else None
 
     def _holderify(self, res: T.Union[TYPE_var, InterpreterObject]) -> InterpreterObject:
+        # Holders of strings, integers and booleans have no state besides the
+        # immutable held object (current_node is set before every method and
+        # operator call), so one holder is shared by all uses of a value.
+        # This avoids building the method tables of a new holder for every
+        # literal and every value returned in loops.
+        if type(res) in SHARED_HOLDER_TYPES and isinstance(res, (str, int)) and \
+                (not isinstance(res, str) or len(res) <= MAX_SHARED_STRING_LENGTH):
+            key = (type(res), res)
+            holder = self.shared_holders.get(key)
+            if holder is not None:
+                return holder
+            cls = self.holder_map.get(type(res), None)
+            if cls is not None:
+                if len(self.shared_holders) >= MAX_SHARED_HOLDERS:
+                    self.shared_holders.clear()
+                holder = self.shared_holders[key] = cls(res, T.cast('Interpreter', self))
+                return holder
         if isinstance(res, HoldableTypes):
             # Always check for an exact match first.
             cls = self.holder_map.get(type(res), None)
@@ -3,6 +3,10 @@
 from enum import Enum
 
 class MesonOperator(Enum):
+    # Members are singletons, so hashing them by identity is correct. This
+    # skips Enum.__hash__ for the operator tables built by every object.
+    __hash__ = object.__hash__
+
     # Arithmetic
     PLUS = '+'
     MINUS = '-'
@@ -0,0 +1,460 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The Meson development team
+
+from __future__ import annotations
+
+"""Reports on the last build of a configured project."""
+
+import json
+import os
+import re
+import posixpath
+import typing as T
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import depfile
+from . import mintro
+from .compilers import lang_suffixes
+from .compilers.compilers import source_suffixes
+from .environment import detect_ninja
+from .mcompile import validate_builddir
+from .mesonlib import MesonException, Popen_safe, RealPathAction
+
+if T.TYPE_CHECKING:
+    import argparse
+
+    # Header as spelled in #include lines, such as <stdio.h> or "foo.h"
+    Spelling = str
+
+# Targets that are compiled from C-like sources
+BUILD_TARGET_TYPES = {'executable', 'static library', 'shared library', 'shared module'}
+PCH_LANGUAGES = ('c', 'cpp')
+INCLUDE_RE = re.compile(r'^\s*#\s*include\s*([<"][^>"\n]+[>"])', re.MULTILINE)
+
+def add_includes_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('-C', dest='builddir', action=RealPathAction, default='.',
+                        help='Path to build directory')
+    parser.add_argument('--min-share', type=float, default=0.5,
+                        help='Only suggest headers included by at least this fraction of the objects of a target (default: %(default)s)')
+    parser.add_argument('--min-savings', type=int, default=1024, metavar='KIB',
+                        help='Only suggest a precompiled header if it saves parsing this many KiB of headers (default: %(default)s)')
+    parser.add_argument('--write-pch', metavar='DIR', default=None,
+                        help='Write the suggested precompiled headers into this directory')
+
+def load_targets(builddir: str) -> T.Tuple[T.Dict[str, T.Dict[str, T.Any]], T.Dict[str, T.Dict[str, T.Any]]]:
+    '''Returns the introspection data of targets, indexed by private directory and by output.'''
+    by_privdir: T.Dict[str, T.Dict[str, T.Any]] = {}
+    by_output: T.Dict[str, T.Dict[str, T.Any]] = {}
+    for t in mintro.load_info_file(mintro.get_infodir(builddir), 'targets'):
+        for i, f in enumerate(t['filename']):
+            output = os.path.relpath(f, builddir).replace('\\', '/')
+            by_output[output] = t
+            if i == 0:
+                by_privdir[output + '.p'] = t
+    return by_privdir, by_output
+
+def read_ninja_deps(builddir: str) -> T.Dict[str, T.List[str]]:
+    '''Returns the headers ninja recorded for each output, in the order the compiler listed them.'''
+    ninja = detect_ninja()
+    if ninja is None or not os.path.exists(os.path.join(builddir, '.ninja_deps')):
+        return {}
+    p, out, _ = Popen_safe(ninja + ['-C', builddir, '-t', 'deps'])
+    if p.returncode != 0:
+        return {}
+    result: T.Dict[str, T.List[str]] = {}
+    deps: T.Optional[T.List[str]] = None
+    for line in out.splitlines():
+        if not line.strip():
+            deps = None
+        elif line[0].isspace():
+            if deps is not None:
+                deps.append(line.strip())
+        else:
+            # foo.p/foo.c.o: #deps 2, deps mtime 123 (VALID)
+            deps = result[line.split(': #deps ', 1)[0].replace('\\', '/')] = []
+    return result
+
+def read_depfiles(builddir: str, privdirs: T.Iterable[str], result: T.Dict[str, T.List[str]]) -> None:
+    '''Adds the dependencies listed in depfiles that ninja did not absorb in .ninja_deps.'''
+    for privdir in privdirs:
+        for root, _, files in os.walk(os.path.join(builddir, privdir)):
+            for f in files:
+                if not f.endswith('.d'):
+                    continue
+                try:
+                    with open(os.path.join(root, f), encoding='utf-8', errors='replace') as ifile:
+                        rules = depfile.parse(ifile)
+                except OSError:
+                    continue
+                for targets, deps in rules:
+                    for t in targets:
+                        result.setdefault(t.replace('\\', '/'), deps)
+
+def get_object_language(obj: str) -> T.Optional[str]:
+    # Objects are named after their source, e.g. foo.cpp.o
+    suffix = os.path.splitext(os.path.splitext(obj)[0])[1][1:]
+    for lang in PCH_LANGUAGES:
+        if suffix in lang_suffixes[lang]:
+            return lang
+    return None
+
+class IncludeStats:
+
+    '''Top level headers of the objects of one language of a target.'''
+
+    def __init__(self, target: T.Dict[str, T.Any], lang: str):
+        self.target = target
+        self.lang = lang
+        self.objects = 0
+        self.count: T.Counter[Spelling] = Counter()
+        # Size of each header and of the headers it includes, summed over
+        # the objects including it
+        self.size: T.Counter[Spelling] = Counter()
+
+    def candidates(self, min_share: float) -> T.List[Spelling]:
+        threshold = max(2, min_share * self.objects)
+        return [h for h, c in self.count.items() if c >= threshold]
+
+    def savings(self, headers: T.List[Spelling]) -> float:
+        # Once precompiled, each header is parsed once instead of once per object
+        return sum(self.size[h] * (self.count[h] - 1) / self.count[h] for h in headers)
+
+def get_included_headers(sources: T.Iterable[str]) -> T.Dict[str, T.List[Spelling]]:
+    '''Returns the headers sources include directly, indexed by their basename.'''
+    spellings: T.Set[Spelling] = set()
+    for s in sources:
+        try:
+            with open(s, encoding='utf-8', errors='replace') as f:
+                spellings.update(INCLUDE_RE.findall(f.read()))
+        except OSError:
+            pass
+    result: T.Dict[str, T.List[Spelling]] = {}
+    for spelling in sorted(spellings):
+        result.setdefault(posixpath.basename(spelling[1:-1]), []).append(spelling)
+    return result
+
+def add_object(stats: IncludeStats, builddir: str, deps: T.List[str],
+               included: T.Dict[str, T.List[Spelling]], sizes: T.Dict[str, int]) -> None:
+    stats.objects += 1
+    # The compiler lists headers depth first, so the headers following a top
+    # level header up to the next one are the ones it includes.
+    current: T.Optional[Spelling] = None
+    for dep in deps:
+        dep = dep.replace('\\', '/')
+        if posixpath.splitext(dep)[1][1:] in source_suffixes:
+            current = None
+            continue
+        for spelling in included.get(posixpath.basename(dep), []):
+            name = spelling[1:-1]
+            if dep == name or dep.endswith('/' + name):
+                stats.count[spelling] += 1
+                current = spelling
+                break
+        if current is None:
+            continue
+        try:
+            size = sizes[dep]
+        except KeyError:
+            try:
+                size = os.path.getsize(os.path.join(builddir, dep))
+            except OSError:
+                size = 0
+            sizes[dep] = size
+        stats.size[current] += size
+
+def analyze_includes(builddir: str) -> T.List[IncludeStats]:
+    by_privdir = {d: t for d, t in load_targets(builddir)[0].items() if t['type'] in BUILD_TARGET_TYPES}
+
+    deps = read_ninja_deps(builddir)
+    read_depfiles(builddir, by_privdir, deps)
+
+    stats: T.Dict[T.Tuple[str, str], IncludeStats] = {}
+    included: T.Dict[str, T.Dict[str, T.List[Spelling]]] = {}
+    sizes: T.Dict[str, int] = {}
+    for obj in sorted(deps):
+        target = by_privdir.get(posixpath.dirname(obj))
+        lang = get_object_language(obj)
+        if target is None or lang is None:
+            continue
+        if target['id'] not in included:
+            sources = [s for ts in target['target_sources'] for s in ts.get('sources', [])]
+            included[target['id']] = get_included_headers(sources)
+        key = (target['id'], lang)
+        if key not in stats:
+            stats[key] = IncludeStats(target, lang)
+        add_object(stats[key], builddir, deps[obj], included[target['id']], sizes)
+    return list(stats.values())
+
+def format_size(size: float) -> str:
+    for unit in ['B', 'KiB', 'MiB']:
+        if size < 1024 or unit == 'MiB':
+            break
+        size /= 1024
+    return f'{size:.1f} {unit}'
+
+def write_pch(stats: IncludeStats, headers: T.List[Spelling], outdir: str, names: T.Counter[str]) -> str:
+    name = stats.target['name']
+    if names[name] > 1:
+        name = stats.target['id'].replace('@', '_')
+    fname = os.path.join(outdir, f'{name}_{stats.lang}_pch.h')
+    with open(fname, 'w', encoding='utf-8') as f:
+        f.write(f"/* Headers most often included by the sources of {stats.target['name']}. */\n\n")
+        for h in headers:
+            f.write(f'#include {h}\n')
+    return fname
+
+def run_includes(options: argparse.Namespace) -> int:
+    builddir = options.builddir
+    validate_builddir(Path(builddir))
+    all_stats = analyze_includes(builddir)
+    if not all_stats:
+        raise MesonException('No header dependencies found. Was the project built?')
+
+    names = Counter(s.target['name'] for s in all_stats)
+    if options.write_pch:
+        os.makedirs(options.write_pch, exist_ok=True)
+    suggestions = []
+    for stats in all_stats:
+        headers = stats.candidates(options.min_share)
+        savings = stats.savings(headers)
+        if headers and savings >= options.min_savings * 1024:
+            suggestions.append((savings, stats, headers))
+
+    if not suggestions:
+        print('No target would benefit from a precompiled header.')
+        return 0
+    for savings, stats, headers in sorted(suggestions, key=lambda s: -s[0]):
+        target = stats.target
+        plural = 's' if len(headers) > 1 else ''
+        print(f"{target['name']} ({target['type']}, {stats.lang}): precompiling {len(headers)} header{plural} "
+              f"saves parsing {format_size(savings)} in {stats.objects} objects")
+        for h in sorted(headers, key=lambda h: -stats.size[h] * (stats.count[h] - 1) / stats.count[h]):
+            print(f'    {stats.count[h]:>5}/{stats.objects:<5} {format_size(stats.size[h] / stats.count[h]):>10}  {h}')
+        if options.write_pch:
+            fname = write_pch(stats, headers, options.write_pch, names)
+            print(f'    Written to {fname}, use it with {stats.lang}_pch')
+    return 0
+
+def add_build_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('-C', dest='builddir', action=RealPathAction, default='.',
+                        help='Path to build directory')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Number of targets and directories to list (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='Number of jobs the build was allowed to run in parallel (default: the largest number that ran)')
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help='Write the build steps in the Chrome trace event format')
+
+@dataclass(eq=False)
+class BuildStep:
+
+    '''An edge of the build graph, as run by the last build.'''
+
+    outputs: T.List[str]
+    start: int
+    end: int
+    # Share of the wall time of the build, the time of the step divided by
+    # the number of steps running at the same time
+    weighted: float = 0.0
+    target: T.Optional[T.Dict[str, T.Any]] = None
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+def read_ninja_log(builddir: str) -> T.List[BuildStep]:
+    '''Returns the steps of the last build recorded in .ninja_log.'''
+    steps: T.List[BuildStep] = []
+    by_command: T.Dict[T.Tuple[int, int, str], BuildStep] = {}
+    last_end = 0
+    try:
+        with open(os.path.join(builddir, '.ninja_log'), encoding='utf-8', errors='replace') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) != 5 or line.startswith('#'):
+                    continue
+                start, end, output, command = int(fields[0]), int(fields[1]), fields[3], fields[4]
+                # Steps are logged as they finish, times are relative to the
+                # start of each build
+                if end < last_end:
+                    steps = []
+                    by_command = {}
+                last_end = end
+                # Steps with several outputs have a line per output
+                key = (start, end, command)
+                if key in by_command:
+                    by_command[key].outputs.append(output)
+                else:
+                    by_command[key] = BuildStep([output], start, end)
+                    steps.append(by_command[key])
+    except (OSError, ValueError):
+        raise MesonException('Could not read .ninja_log. Was the project built with the ninja backend?')
+    return steps
+
+def read_ninja_inputs(builddir: str, outputs: T.List[str]) -> T.Optional[T.Dict[str, T.List[str]]]:
+    '''Returns the inputs of the steps producing outputs, as known to ninja.'''
+    ninja = detect_ninja()
+    if ninja is None:
+        return None
+    result: T.Dict[str, T.List[str]] = {}
+    # Query many outputs at once, within command line length limits
+    batches: T.List[T.List[str]] = [[]]
+    length = 0
+    for output in outputs:
+        if length > 16000:
+            batches.append([])
+            length = 0
+        batches[-1].append(output)
+        length += len(output) + 3
+    for batch in batches:
+        p, out, _ = Popen_safe(ninja + ['-C', builddir, '-t', 'query'] + batch)
+        if p.returncode != 0:
+            return None
+        inputs: T.List[str] = []
+        section = ''
+        for line in out.splitlines():
+            if not line.startswith(' '):
+                inputs = result.setdefault(line[:-1], [])
+            elif not line.startswith('    '):
+                section = line.strip()
+            elif section.startswith('input'):
+                # Implicit and order-only inputs are prefixed with | and ||
+                inputs.append(re.sub(r'^\|\|? ', '', line.strip()))
+    return result
+
+def compute_weighted_times(steps: T.List[BuildStep]) -> None:
+    events = sorted([(s.start, 1, i) for i, s in enumerate(steps)] + [(s.end, -1, i) for i, s in enumerate(steps)])
+    running: T.Set[int] = set()
+    last = 0
+    for time, kind, i in events:
+        if running and time > last:
+            share = (time - last) / len(running)
+            for r in running:
+                steps[r].weighted += share
+        last = time
+        if kind > 0:
+            running.add(i)
+        else:
+            running.discard(i)
+
+def compute_critical_path(steps: T.List[BuildStep], inputs: T.Dict[str, T.List[str]]) -> T.List[BuildStep]:
+    producers = {o: s for s in steps for o in s.outputs}
+    longest: T.Dict[BuildStep, T.Tuple[int, T.Optional[BuildStep]]] = {}
+    # The inputs of a step finished before it started
+    for step in sorted(steps, key=lambda s: s.end):
+        best: T.Tuple[int, T.Optional[BuildStep]] = (0, None)
+        for o in step.outputs:
+            for i in inputs.get(o, []):
+                pred = producers.get(i)
+                if pred is not None and pred is not step and pred in longest and longest[pred][0] > best[0]:
+                    best = (longest[pred][0], pred)
+        longest[step] = (best[0] + step.duration, best[1])
+    path: T.List[BuildStep] = []
+    current = max(longest, key=lambda s: longest[s][0], default=None)
+    while current is not None:
+        path.append(current)
+        current = longest[current][1]
+    return list(reversed(path))
+
+def get_max_parallelism(steps: T.List[BuildStep]) -> int:
+    events = sorted([(s.start, 1) for s in steps] + [(s.end, -1) for s in steps])
+    running = maximum = 0
+    for _, kind in events:
+        running += kind
+        maximum = max(maximum, running)
+    return maximum
+
+def format_time(ms: float) -> str:
+    if ms < 1000:
+        return f'{ms:.0f} ms'
+    return f'{ms / 1000:.1f} s'
+
+def write_trace(fname: str, steps: T.List[BuildStep], sources: T.Dict[str, str]) -> None:
+    events: T.List[T.Dict[str, T.Any]] = []
+    # Show the steps running in parallel on as few rows as possible
+    lanes: T.List[int] = []
+    for step in sorted(steps, key=lambda s: (s.start, s.end)):
+        for lane, end in enumerate(lanes):
+            if end <= step.start:
+                lanes[lane] = step.end
+                break
+        else:
+            lane = len(lanes)
+            lanes.append(step.end)
+        args = {'outputs': step.outputs}
+        if step.target is not None:
+            args['target'] = step.target['id']
+        if step.outputs[0] in sources:
+            args['source'] = sources[step.outputs[0]]
+        events.append({'name': step.outputs[0], 'cat': step.target['name'] if step.target else 'other',
+                       'ph': 'X', 'ts': step.start * 1000, 'dur': step.duration * 1000,
+                       'pid': 0, 'tid': lane, 'args': args})
+    with open(fname, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+def load_compdb_sources(builddir: str) -> T.Dict[str, str]:
+    try:
+        with open(os.path.join(builddir, 'compile_commands.json'), encoding='utf-8') as f:
+            return {e['output']: e['file'] for e in json.load(f) if 'output' in e}
+    except (OSError, ValueError):
+        return {}
+
+def print_table(title: str, rows: T.List[T.Tuple[str, float, float, int]], wall: float, top: int) -> None:
+    print(f'\n{title}:')
+    print(f"  {'Wall':>8} {'Share':>6} {'CPU':>8} {'Steps':>6}  Name")
+    for name, weighted, cpu, count in sorted(rows, key=lambda r: -r[1])[:top]:
+        print(f'  {format_time(weighted):>8} {weighted * 100 / wall:>5.1f}% {format_time(cpu):>8} {count:>6}  {name}')
+
+def run_build(options: argparse.Namespace) -> int:
+    builddir = options.builddir
+    validate_builddir(Path(builddir))
+    steps = read_ninja_log(builddir)
+    if not steps:
+        raise MesonException('The ninja log has no build steps. Was the project built?')
+
+    by_privdir, by_output = load_targets(builddir)
+    for step in steps:
+        for o in step.outputs:
+            step.target = by_output.get(o) or by_privdir.get(posixpath.dirname(o))
+            if step.target is not None:
+                break
+    compute_weighted_times(steps)
+
+    wall = max(s.end for s in steps) - min(s.start for s in steps)
+    cpu = sum(s.duration for s in steps)
+    jobs = options.jobs or get_max_parallelism(steps)
+    print(f'Last build: {len(steps)} steps, {format_time(wall)} wall time, {format_time(cpu)} CPU time')
+    print(f'Average parallelism: {cpu / max(wall, 1):.1f}, {cpu * 100 / max(wall * jobs, 1):.0f}% of {jobs} jobs')
+
+    targets: T.Dict[str, T.List[T.Any]] = {}
+    dirs: T.Dict[str, T.List[T.Any]] = {}
+    for step in steps:
+        if step.target is not None:
+            tname = f"{step.target['name']} ({step.target['type']})"
+            dirname = posixpath.dirname(os.path.relpath(step.target['filename'][0], builddir).replace('\\', '/'))
+        else:
+            tname = 'other'
+            dirname = posixpath.dirname(step.outputs[0])
+        for key, table in ((tname, targets), (dirname or '.', dirs)):
+            row = table.setdefault(key, [key, 0.0, 0.0, 0])
+            row[1] += step.weighted
+            row[2] += step.duration
+            row[3] += 1
+    print_table('Targets', [tuple(r) for r in targets.values()], max(wall, 1), options.top)
+    print_table('Directories', [tuple(r) for r in dirs.values()], max(wall, 1), options.top)
+
+    inputs = read_ninja_inputs(builddir, [s.outputs[0] for s in steps])
+    if inputs is None:
+        print('\nCould not get the build graph from ninja to compute the critical path.')
+    else:
+        path = compute_critical_path(steps, inputs)
+        print(f'\nCritical path: {format_time(sum(s.duration for s in path))}')
+        for step in path:
+            print(f'  {format_time(step.duration):>8}  {step.outputs[0]}')
+
+    if options.trace:
+        write_trace(options.trace, steps, load_compdb_sources(builddir))
+        print(f'\nTrace written to {options.trace}')
+    return 0
@@ -18,7 +18,7 @@ from . import mlog
 from . import mesonlib
 from .mesonlib import MesonException, RealPathAction, join_args, setup_vsenv
 from mesonbuild.environment import detect_ninja
-from mesonbuild.coredata import UserArrayOption
+from mesonbuild.coredata import UserArrayOption, version as coredata_version
 from mesonbuild import build
 
 if T.TYPE_CHECKING:
@@ -34,11 +34,48 @@ def validate_builddir(builddir: Path) -> None:
                              'It is also possible that the build directory was generated with an old\n'
                              'meson version. Please regenerate it in this case.')
 
+def get_intro_targets_file(builddir: Path) -> Path:
+    """
+    Returns the path of intro-targets.json, or of the index of the per-target
+    files when the `sharded` introspection layout is used.
+    """
+    path_to_shards = builddir / 'meson-info' / 'intro-targets' / 'index.json'
+    if path_to_shards.exists():
+        return path_to_shards
+    return builddir / 'meson-info' / 'intro-targets.json'
+
+def load_target_index(builddir: Path) -> T.Optional[T.Dict[str, T.List[dict]]]:
+    """
+    Loads the compact target index written at generate time.
+
+    Returns None if the index is missing, was written by a different version
+    of Meson, or is older than intro-targets.json.
+    """
+    path_to_index = builddir / 'meson-private' / 'target-index.json'
+    path_to_intro = get_intro_targets_file(builddir)
+    try:
+        index_mtime = path_to_index.stat().st_mtime
+        if path_to_intro.exists() and path_to_intro.stat().st_mtime > index_mtime:
+            return None
+        with path_to_index.open(encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or index.get('version') != coredata_version:
+        return None
+    return defaultdict(list, index['targets'])
+
 def parse_introspect_data(builddir: Path) -> T.Dict[str, T.List[dict]]:
     """
     Converts a List of name-to-dict to a dict of name-to-dicts (since names are not unique)
     """
-    path_to_intro = builddir / 'meson-info' / 'intro-targets.json'
+    index = load_target_index(builddir)
+    if index is not None:
+        return index
+
+    # The index of the sharded layout has all the keys we need, so the
+    # per-target files never have to be loaded here.
+    path_to_intro = get_intro_targets_file(builddir)
     if not path_to_intro.exists():
         raise MesonException(f'`{path_to_intro.name}` is missing! Directory is not configured yet?')
     with path_to_intro.open(encoding='utf-8') as f:
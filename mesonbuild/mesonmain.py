@@ -60,7 +60,7 @@ def errorhandler(e, command):
 class CommandLineParser:
     def __init__(self):
         # only import these once we do full argparse processing
-        from . import mconf, mdist, minit, minstall, mintro, msetup, mtest, rewriter, msubprojects, munstable_coredata, mcompile, mdevenv
+        from . import mconf, mdist, minit, minstall, mintro, msetup, mtest, rewriter, msubprojects, munstable_coredata, mcompile, mdevenv, manalyze
         from .scripts import env2mfile
         from .wrap import wraptool
         import shutil
@@ -99,6 +99,10 @@ class CommandLineParser:
                          help_msg='Run commands in developer environment')
         self.add_command('env2mfile', env2mfile.add_arguments, env2mfile.run,
                          help_msg='Convert current environment to a cross or native file')
+        self.add_command('analyze-includes', manalyze.add_includes_arguments, manalyze.run_includes,
+                         help_msg='Suggest precompiled headers from the headers sources include')
+        self.add_command('analyze-build', manalyze.add_build_arguments, manalyze.run_build,
+                         help_msg='Report where the time of the last build went')
         # Add new commands above this line to list them in help command
         self.add_command('help', self.add_help_arguments, self.run_help_command,
                          help_msg='Print help of a subcommand')
@@ -263,6 +267,14 @@ def run(original_args, mainfile):
     if len(args) >= 2 and args[0] == '--internal':
         if args[1] == 'regenerate':
             set_meson_command(mainfile)
+            if args[2:3] == ['--if-changed']:
+                # Nothing to do if the build files were only touched. Ninja
+                # passes the source dir and then the build dir.
+                del args[2]
+                from .scripts.regen_checker import regen_inputs_unchanged
+                if len(args) > 3 and regen_inputs_unchanged(args[3]):
+                    print('Build files are up to date, not regenerating.')
+                    return 0
             from . import msetup
             try:
                 return msetup.run(['--reconfigure'] + args[2:])
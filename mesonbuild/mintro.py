@@ -13,9 +13,11 @@ project files and don't need this info."""
 from contextlib import redirect_stdout
 import collections
 import dataclasses
+import hashlib
 import json
 import os
 from pathlib import Path, PurePath
+import re
 import sys
 import typing as T
 
@@ -37,12 +39,19 @@ if T.TYPE_CHECKING:
 def get_meson_info_file(info_dir: str) -> str:
     return os.path.join(info_dir, 'meson-info.json')
 
+def get_target_index_file(scratch_dir: str) -> str:
+    return os.path.join(scratch_dir, 'target-index.json')
+
 def get_meson_introspection_version() -> str:
-    return '1.0.0'
+    return '1.1.0'
 
 def get_meson_introspection_required_version() -> T.List[str]:
     return ['>=1.0', '<2.0']
 
+# Introspection types that can be written as one file per entry, see the
+# `introspection_layout` option
+SHARDED_INTRO_TYPES = {'targets'}
+
 class IntroCommand:
     def __init__(self,
                  desc: str,
@@ -522,7 +531,15 @@ def get_info_file(infodir: str, kind: T.Optional[str] = None) -> str:
     return os.path.join(infodir,
                         'meson-info.json' if not kind else f'intro-{kind}.json')
 
+def get_shard_dir(infodir: str, kind: str) -> str:
+    return os.path.join(infodir, f'intro-{kind}')
+
+def get_shard_index_file(infodir: str, kind: str) -> str:
+    return os.path.join(get_shard_dir(infodir, kind), 'index.json')
+
 def load_info_file(infodir: str, kind: T.Optional[str] = None) -> T.Any:
+    if kind in SHARDED_INTRO_TYPES and os.path.isfile(get_shard_index_file(infodir, kind)):
+        return load_intro_shards(infodir, kind)
     with open(get_info_file(infodir, kind), encoding='utf-8') as fp:
         return json.load(fp)
 
@@ -587,9 +604,21 @@ def run(options: argparse.Namespace) -> int:
 
 updated_introspection_files: T.List[str] = []
 
-def write_intro_info(intro_info: T.Sequence[T.Tuple[str, T.Union[dict, T.List[T.Any]]]], info_dir: str) -> None:
+def write_intro_info(intro_info: T.Sequence[T.Tuple[str, T.Union[dict, T.List[T.Any]]]], info_dir: str,
+                     sharded: bool = False) -> None:
     for kind, data in intro_info:
         out_file = os.path.join(info_dir, f'intro-{kind}.json')
+        if kind in SHARDED_INTRO_TYPES:
+            shard_dir = get_shard_dir(info_dir, kind)
+            if sharded:
+                assert isinstance(data, list), 'for mypy'
+                write_intro_shards(kind, data, info_dir)
+                if os.path.exists(out_file):
+                    os.unlink(out_file)
+                updated_introspection_files.append(kind)
+                continue
+            elif os.path.isdir(shard_dir):
+                mesonlib.windows_proof_rmtree(shard_dir)
         tmp_file = os.path.join(info_dir, 'tmp_dump.json')
         with open(tmp_file, 'w', encoding='utf-8') as fp:
             json.dump(data, fp)
@@ -597,6 +626,66 @@ def write_intro_info(intro_info: T.Sequence[T.Tuple[str, T.Union[dict, T.List[T.
         os.replace(tmp_file, out_file)
         updated_introspection_files.append(kind)
 
+def _shard_file_name(target_id: str, used: T.Set[str]) -> str:
+    name = re.sub(r'[^\w.@+-]', '_', target_id)
+    if name in used:
+        # Sanitizing made two distinct IDs collide, disambiguate with a hash
+        name += '-' + hashlib.sha1(target_id.encode('utf-8')).hexdigest()[:8]
+    used.add(name)
+    return name + '.json'
+
+def write_intro_shards(kind: str, data: T.List[T.Dict[str, T.Any]], info_dir: str) -> None:
+    """Write one file per entry plus a small index.
+
+    Files whose content did not change are left untouched, so that readers
+    can rely on their timestamps to only reload the entries that changed.
+    """
+    shard_dir = get_shard_dir(info_dir, kind)
+    os.makedirs(shard_dir, exist_ok=True)
+    used: T.Set[str] = set()
+    index: T.List[T.Dict[str, T.Any]] = []
+    for entry in data:
+        fname = _shard_file_name(entry['id'], used)
+        out_file = os.path.join(shard_dir, fname)
+        content = json.dumps(entry)
+        try:
+            with open(out_file, encoding='utf-8') as fp:
+                unchanged = fp.read() == content
+        except FileNotFoundError:
+            unchanged = False
+        if not unchanged:
+            tmp_file = os.path.join(shard_dir, 'tmp_dump.json')
+            with open(tmp_file, 'w', encoding='utf-8') as fp:
+                fp.write(content)
+            os.replace(tmp_file, out_file)
+        index.append({
+            'name': entry['name'],
+            'id': entry['id'],
+            'type': entry['type'],
+            'filename': entry['filename'],
+            'file': f'intro-{kind}/{fname}',
+        })
+
+    # Remove the entries of targets that no longer exist
+    used_files = {i['file'].rsplit('/', 1)[1] for i in index}
+    for fname in os.listdir(shard_dir):
+        if fname.endswith('.json') and fname != 'index.json' and fname not in used_files:
+            os.unlink(os.path.join(shard_dir, fname))
+
+    tmp_file = os.path.join(shard_dir, 'tmp_dump.json')
+    with open(tmp_file, 'w', encoding='utf-8') as fp:
+        json.dump(index, fp)
+    os.replace(tmp_file, get_shard_index_file(info_dir, kind))
+
+def load_intro_shards(infodir: str, kind: str) -> T.List[T.Dict[str, T.Any]]:
+    with open(get_shard_index_file(infodir, kind), encoding='utf-8') as fp:
+        index = json.load(fp)
+    result: T.List[T.Dict[str, T.Any]] = []
+    for i in index:
+        with open(os.path.join(infodir, i['file']), encoding='utf-8') as fp:
+            result.append(json.load(fp))
+    return result
+
 def generate_introspection_file(builddata: build.Build, backend: backends.Backend) -> None:
     coredata = builddata.environment.get_coredata()
     intro_types = get_meson_introspection_types(coredata=coredata, builddata=builddata, backend=backend)
@@ -607,7 +696,34 @@ def generate_introspection_file(builddata: build.Build, backend: backends.Backen
             continue
         intro_info += [(key, val.func())]
 
-    write_intro_info(intro_info, builddata.environment.info_dir)
+    sharded = coredata.get_option(OptionKey('introspection_layout')) == 'sharded'
+    write_intro_info(intro_info, builddata.environment.info_dir, sharded)
+    targets = T.cast('T.List[T.Dict[str, T.Any]]', dict(intro_info)['targets'])
+    write_target_index(builddata, targets)
+
+def write_target_index(builddata: build.Build, targets: T.List[T.Dict[str, T.Any]]) -> None:
+    """Write a compact name -> targets lookup table for `meson compile`.
+
+    It only contains the keys needed to resolve a target name to its outputs,
+    so that resolving a single target does not require loading the (possibly
+    very large) intro-targets.json.
+    """
+    build_targets = builddata.get_targets()
+    index: T.Dict[str, T.List[T.Dict[str, T.Any]]] = collections.defaultdict(list)
+    for t in targets:
+        index[t['name']].append({
+            'name': t['name'],
+            'id': t['id'],
+            'type': t['type'],
+            'subdir': build_targets[t['id']].subdir,
+            'filename': t['filename'],
+        })
+
+    scratch_dir = builddata.environment.get_scratch_dir()
+    tmp_file = os.path.join(scratch_dir, 'tmp_target_index.json')
+    with open(tmp_file, 'w', encoding='utf-8') as fp:
+        json.dump({'version': cdata.version, 'targets': index}, fp, separators=(',', ':'))
+    os.replace(tmp_file, get_target_index_file(scratch_dir))
 
 def update_build_options(coredata: cdata.CoreData, info_dir: str) -> None:
     intro_info = [
@@ -631,6 +747,8 @@ def write_meson_info_file(builddata: build.Build, errors: list, build_files_upda
     intro_types = get_meson_introspection_types()
     intro_info = {}
 
+    sharded = builddata.environment.coredata.get_option(OptionKey('introspection_layout')) == 'sharded'
+
     for i, v in intro_types.items():
         if not v.func:
             continue
@@ -638,6 +756,9 @@ def write_meson_info_file(builddata: build.Build, errors: list, build_files_upda
             'file': f'intro-{i}.json',
             'updated': i in updated_introspection_files
         }
+        if sharded and i in SHARDED_INTRO_TYPES:
+            intro_info[i]['file'] = f'intro-{i}/index.json'
+            intro_info[i]['sharded'] = True
 
     info_data = {
         'meson_version': split_version_string(cdata.version),
@@ -10,6 +10,9 @@ import typing as T
 
 from . import build, coredata, environment, interpreter, mesonlib, mintro, mlog
 from .mesonlib import MesonException
+from .programs import program_cache
+from .scripts import regen_checker
+from .utils import profiler
 
 git_ignore_file = '''# This file is autogenerated by Meson. If you change or delete it, it won't be recreated.
 *
@@ -37,6 +40,9 @@ def add_arguments(parser: argparse.ArgumentParser) -> None:
                         version=coredata.version)
     parser.add_argument('--profile-self', action='store_true', dest='profile',
                         help=argparse.SUPPRESS)
+    parser.add_argument('--profile-configure', action='store_true',
+                        help='Record the time spent in each build file, function call and the backend, '
+                             'and write a report and a Chrome trace into meson-logs. Since 1.4.0.')
     parser.add_argument('--fatal-meson-warnings', action='store_true', dest='fatal_warnings',
                         help='Make all Meson warnings fatal')
     parser.add_argument('--reconfigure', action='store_true',
@@ -161,16 +167,31 @@ class MesonApp:
 
     # See class Backend's 'generate' for comments on capture args and returned dictionary.
     def generate(self, capture: bool = False, vslite_ctx: T.Optional[dict] = None) -> T.Optional[dict]:
-        env = environment.Environment(self.source_dir, self.build_dir, self.options)
-        mlog.initialize(env.get_log_dir(), self.options.fatal_warnings)
-        if self.options.profile:
-            mlog.set_timestamp_start(time.monotonic())
-        if self.options.clearcache:
-            env.coredata.clear_cache()
-        with mesonlib.BuildDirLock(self.build_dir):
-            return self._generate(env, capture, vslite_ctx)
+        if self.options.profile_configure:
+            profiler.start()
+        try:
+            if self.options.clearcache:
+                program_cache.clear()
+            else:
+                program_cache.load(os.path.join(self.build_dir, environment.Environment.private_dir))
+            env = environment.Environment(self.source_dir, self.build_dir, self.options)
+            mlog.initialize(env.get_log_dir(), self.options.fatal_warnings)
+            if self.options.profile:
+                mlog.set_timestamp_start(time.monotonic())
+            if self.options.clearcache:
+                env.coredata.clear_cache()
+            with mesonlib.BuildDirLock(self.build_dir):
+                return self._generate(env, capture, vslite_ctx)
+        finally:
+            prof = profiler.stop()
+            log_dir = os.path.join(self.build_dir, 'meson-logs')
+            # Also written when configuration fails, slow checks are
+            # often what is being debugged.
+            if prof is not None and os.path.isdir(log_dir):
+                prof.write(log_dir)
 
     def _generate(self, env: environment.Environment, capture: bool, vslite_ctx: T.Optional[dict]) -> T.Optional[dict]:
+        start_time = time.time()
         # Get all user defined options, including options that have been defined
         # during a previous invocation or using meson configure.
         user_defined_options = argparse.Namespace(**vars(self.options))
@@ -237,10 +258,14 @@ class MesonApp:
                 profile.runctx('gen_result = intr.backend.generate(capture, vslite_ctx)', globals(), locals(), filename=fname)
                 captured_compile_args = locals()['gen_result']
                 assert captured_compile_args is None or isinstance(captured_compile_args, dict)
+            elif profiler.active is not None:
+                with profiler.active.span(f'{intr.backend.name} backend', 'backend', ''):
+                    captured_compile_args = intr.backend.generate(capture, vslite_ctx)
             else:
                 captured_compile_args = intr.backend.generate(capture, vslite_ctx)
 
             build.save(b, dumpfile)
+            program_cache.save(env.get_scratch_dir())
             if env.first_invocation:
                 # Use path resolved by coredata because they could have been
                 # read from a pipe and wrote into a private file.
@@ -254,9 +279,13 @@ class MesonApp:
             if self.options.profile:
                 fname = os.path.join(self.build_dir, 'meson-logs', 'profile-introspector.log')
                 profile.runctx('mintro.generate_introspection_file(b, intr.backend)', globals(), locals(), filename=fname)
+            elif profiler.active is not None:
+                with profiler.active.span('introspection', 'backend', ''):
+                    mintro.generate_introspection_file(b, intr.backend)
             else:
                 mintro.generate_introspection_file(b, intr.backend)
             mintro.write_meson_info_file(b, [], True)
+            regen_checker.record_regen_inputs(self.build_dir, intr.backend.get_regen_filelist(), start_time)
 
             # Post-conf scripts must be run after writing coredata or else introspection fails.
             intr.backend.run_postconf_scripts()
@@ -7,10 +7,12 @@ from __future__ import annotations
 
 import functools
 import os
+import pickle
 import shutil
 import stat
 import sys
 import re
+import time
 import typing as T
 from pathlib import Path
 
@@ -23,6 +25,123 @@ if T.TYPE_CHECKING:
     from .interpreter import Interpreter
 
 
+# Identity of the files of a command: (path, mtime, size) of each of them
+_FileIdentity = T.Tuple[T.Tuple[str, int, int], ...]
+
+
+class ProgramCache:
+
+    """Results of program lookups in PATH and of running `prog --version`.
+
+    Shared by all the programs found during a configure, and saved in the
+    private directory so that reconfiguring does not look up and run the same
+    programs again. Lookups are invalidated when one of the PATH directories
+    changes, versions when one of the files of the command changes.
+    """
+
+    version = 1
+    filename = 'program_cache.dat'
+
+    def __init__(self) -> None:
+        self.lookups: T.Dict[T.Tuple[str, T.Optional[str]], T.Optional[str]] = {}
+        self.versions: T.Dict[T.Tuple[str, ...], T.Tuple[_FileIdentity, str]] = {}
+
+    def clear(self) -> None:
+        self.lookups.clear()
+        self.versions.clear()
+
+    def which(self, name: str, path: T.Optional[str]) -> T.Optional[str]:
+        key = (name, path)
+        try:
+            return self.lookups[key]
+        except KeyError:
+            result = self.lookups[key] = shutil.which(name, path=path)
+            return result
+
+    @staticmethod
+    def _identity(command: T.Sequence[T.Optional[str]]) -> T.Optional[_FileIdentity]:
+        identity = []
+        for arg in command:
+            if arg is None:
+                return None
+            try:
+                st = os.stat(arg)
+            except OSError:
+                continue
+            identity.append((arg, st.st_mtime_ns, st.st_size))
+        # Nothing to check the cached version against
+        if not identity:
+            return None
+        return tuple(identity)
+
+    def get_version(self, command: T.List[str]) -> T.Optional[str]:
+        entry = self.versions.get(tuple(command))
+        if entry is None or entry[0] != self._identity(command):
+            return None
+        return entry[1]
+
+    def set_version(self, command: T.List[str], version: str) -> None:
+        identity = self._identity(command)
+        if identity is not None:
+            self.versions[tuple(command)] = (identity, version)
+
+    @staticmethod
+    def _path_dirs_mtime(path: T.Optional[str]) -> T.Optional[T.Tuple[int, ...]]:
+        if path is None:
+            path = os.environ.get('PATH', os.defpath)
+        mtimes = []
+        for d in path.split(os.pathsep):
+            # Lookups in relative directories depend on the working directory
+            if not os.path.isabs(d):
+                return None
+            try:
+                mtimes.append(os.stat(d).st_mtime_ns)
+            except OSError:
+                mtimes.append(0)
+        return tuple(mtimes)
+
+    def load(self, private_dir: str) -> None:
+        """Replace the contents of the cache with the one saved in private_dir."""
+        self.clear()
+        try:
+            with open(os.path.join(private_dir, self.filename), 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return
+        if not isinstance(data, dict) or data.get('version') != self.version:
+            return
+        mtimes: T.Dict[T.Optional[str], T.Optional[T.Tuple[int, ...]]] = {}
+        for (name, path), (dirs_mtime, result) in data['lookups'].items():
+            if path not in mtimes:
+                mtimes[path] = self._path_dirs_mtime(path)
+            if dirs_mtime is None or mtimes[path] != dirs_mtime or (result is not None and not os.path.isfile(result)):
+                continue
+            self.lookups[(name, path)] = result
+        self.versions.update(data['versions'])
+
+    def save(self, private_dir: str) -> None:
+        # Directories changed very recently may still change without
+        # their timestamp being updated
+        racy = time.time_ns() - mesonlib.DirectoryIndex.RACY_WINDOW_NS
+        mtimes: T.Dict[T.Optional[str], T.Optional[T.Tuple[int, ...]]] = {}
+        lookups = {}
+        for (name, path), result in self.lookups.items():
+            if path not in mtimes:
+                mtimes[path] = self._path_dirs_mtime(path)
+            dirs_mtime = mtimes[path]
+            if dirs_mtime is None or any(m > racy for m in dirs_mtime):
+                continue
+            lookups[(name, path)] = (dirs_mtime, result)
+        data = {'version': self.version, 'lookups': lookups, 'versions': self.versions}
+        filename = os.path.join(private_dir, self.filename)
+        tempfilename = filename + '~'
+        with open(tempfilename, 'wb') as f:
+            pickle.dump(data, f)
+        os.replace(tempfilename, filename)
+
+program_cache = ProgramCache()
+
+
 class ExternalProgram(mesonlib.HoldableObject):
 
     """A program that is found on the system."""
@@ -92,13 +211,19 @@ class ExternalProgram(mesonlib.HoldableObject):
         return ' '.join(self.command)
 
     def get_version(self, interpreter: T.Optional['Interpreter'] = None) -> str:
+        if not self.cached_version:
+            self.cached_version = program_cache.get_version(self.command)
+            if self.cached_version and interpreter:
+                # Running it would have made the program a regen dependency
+                interpreter.add_build_def_file(self.get_path())
         if not self.cached_version:
             raw_cmd = self.get_command() + ['--version']
             if interpreter:
                 res = interpreter.run_command_impl((self, ['--version']),
                                                    {'capture': True,
                                                     'check': True,
-                                                    'env': mesonlib.EnvironmentVariables()},
+                                                    'env': mesonlib.EnvironmentVariables(),
+                                                    'cache': False},
                                                    True)
                 o, e = res.stdout, res.stderr
             else:
@@ -113,6 +238,7 @@ class ExternalProgram(mesonlib.HoldableObject):
             if not match:
                 raise mesonlib.MesonException(f'Could not find a version number in output of {raw_cmd!r}')
             self.cached_version = match.group(1)
+            program_cache.set_version(self.command, self.cached_version)
         return self.cached_version
 
     @classmethod
@@ -299,7 +425,7 @@ class ExternalProgram(mesonlib.HoldableObject):
         path = os.environ.get('PATH', None)
         if mesonlib.is_windows() and path:
             path = self._windows_sanitize_path(path)
-        command = shutil.which(name, path=path)
+        command = program_cache.which(name, path)
         if mesonlib.is_windows():
             return self._search_windows_special_cases(name, command)
         # On UNIX-like platforms, shutil.which() is enough to find
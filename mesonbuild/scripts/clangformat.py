@@ -7,7 +7,7 @@ import argparse
 import subprocess
 from pathlib import Path
 
-from .run_tool import run_tool
+from .run_tool import ResultCache, run_tool
 from ..environment import detect_clangformat
 from ..mesonlib import version_compare
 from ..programs import ExternalProgram
@@ -52,4 +52,6 @@ def run(args: T.List[str]) -> int:
     else:
         cformat_ver = None
 
-    return run_tool('clang-format', srcdir, builddir, run_clang_format, exelist, options.check, cformat_ver)
+    cache = ResultCache(builddir / 'meson-private' / f'clang-format{"-check" if options.check else ""}-results.json',
+                        exelist, ['--check'] if options.check else [], ['.clang-format', '_clang-format'])
+    return run_tool('clang-format', srcdir, builddir, run_clang_format, exelist, options.check, cformat_ver, cache=cache)
@@ -4,17 +4,41 @@
 from __future__ import annotations
 
 import argparse
+import json
+import os
 import subprocess
 from pathlib import Path
 
-from .run_tool import run_tool
+from .run_tool import ResultCache, run_tool
 import typing as T
 
+def run_captured(cmd: T.List[str]) -> subprocess.CompletedProcess:
+    # The output is kept to be shown again for files that are not checked
+    # again on the next run
+    ret = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    print(ret.stdout, end='')
+    return ret
+
 def run_clang_tidy(fname: Path, builddir: Path) -> subprocess.CompletedProcess:
-    return subprocess.run(['clang-tidy', '-p', str(builddir), str(fname)])
+    return run_captured(['clang-tidy', '-p', str(builddir), str(fname)])
 
 def run_clang_tidy_fix(fname: Path, builddir: Path) -> subprocess.CompletedProcess:
-    return subprocess.run(['run-clang-tidy', '-fix', '-format', '-quiet', '-p', str(builddir), str(fname)])
+    return run_captured(['run-clang-tidy', '-fix', '-format', '-quiet', '-p', str(builddir), str(fname)])
+
+def load_compile_commands(builddir: Path) -> T.Dict[str, str]:
+    '''Returns the compile commands of compile_commands.json by file, as json.'''
+    commands: T.Dict[str, str] = {}
+    try:
+        with (builddir / 'compile_commands.json').open(encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return commands
+    for e in entries:
+        fname = os.path.normpath(os.path.join(e['directory'], e['file']))
+        command = e.get('arguments', e.get('command'))
+        # clang-tidy may pick any of the commands of a file built by several targets
+        commands[fname] = commands.get(fname, '') + json.dumps([e['directory'], command])
+    return commands
 
 def run(args: T.List[str]) -> int:
     parser = argparse.ArgumentParser()
@@ -26,5 +50,14 @@ def run(args: T.List[str]) -> int:
     srcdir = Path(options.sourcedir)
     builddir = Path(options.builddir)
 
-    run_func = run_clang_tidy_fix if options.fix else run_clang_tidy
-    return run_tool('clang-tidy', srcdir, builddir, run_func, builddir)
+    if options.fix:
+        run_func = run_clang_tidy_fix
+        exelist = ['run-clang-tidy', 'clang-tidy', 'clang-apply-replacements']
+    else:
+        run_func = run_clang_tidy
+        exelist = ['clang-tidy']
+    commands = load_compile_commands(builddir)
+    cache = ResultCache(builddir / 'meson-private' / f'clang-tidy{"-fix" if options.fix else ""}-results.json',
+                        exelist, ['--fix'] if options.fix else [], ['.clang-tidy'],
+                        lambda f: commands.get(os.path.normpath(str(f.absolute())), ''))
+    return run_tool('clang-tidy', srcdir, builddir, run_func, builddir, cache=cache)
@@ -11,30 +11,107 @@ from compileall import compile_file
 
 quiet = int(os.environ.get('MESON_INSTALL_QUIET', 0))
 
-def compileall(files):
+def find_sources(files):
+    '''Yields the path of every installed source and the path to record in its bytecode.'''
     for f in files:
         # f is prefixed by {py_xxxxlib}, both variants are 12 chars
         # the key is the middle 10 chars of the prefix
         key = f[1:11].upper()
         f = f[12:]
 
-        ddir = None
         fullpath = os.environ['MESON_INSTALL_DESTDIR_'+key] + f
         f = os.environ['MESON_INSTALL_'+key] + f
 
-        if fullpath != f:
-            ddir = os.path.dirname(f)
-
         if os.path.isdir(fullpath):
             for root, _, files in os.walk(fullpath):
-                if ddir is not None:
-                    ddir = root.replace(fullpath, f, 1)
+                droot = root.replace(fullpath, f, 1)
                 for dirf in files:
                     if dirf.endswith('.py'):
-                        fullpath = os.path.join(root, dirf)
-                        compile_file(fullpath, ddir, force=True, quiet=quiet)
+                        yield os.path.join(root, dirf), os.path.join(droot, dirf)
         else:
-            compile_file(fullpath, ddir, force=True, quiet=quiet)
+            yield fullpath, f
+
+def compileall(files):
+    for fullpath, dfile in find_sources(files):
+        ddir = None
+        if fullpath != dfile:
+            ddir = os.path.dirname(dfile)
+        compile_file(fullpath, ddir, force=True, quiet=quiet)
+
+def is_up_to_date(source, cfile, invalidation_mode):
+    '''Whether cfile holds bytecode of the current contents of source.'''
+    import importlib.util, py_compile, struct
+    try:
+        with open(cfile, 'rb') as f:
+            header = f.read(16)
+    except OSError:
+        return False
+    if len(header) != 16 or header[:4] != importlib.util.MAGIC_NUMBER:
+        return False
+    flags = struct.unpack('<I', header[4:8])[0]
+    if invalidation_mode == py_compile.PycInvalidationMode.TIMESTAMP:
+        if flags != 0:
+            return False
+        st = os.stat(source)
+        return header[8:16] == struct.pack('<II', int(st.st_mtime) & 0xFFFFFFFF, st.st_size & 0xFFFFFFFF)
+    expected_flags = 0b11 if invalidation_mode == py_compile.PycInvalidationMode.CHECKED_HASH else 0b01
+    if flags != expected_flags:
+        return False
+    with open(source, 'rb') as f:
+        return header[8:16] == importlib.util.source_hash(f.read())
+
+def compile_source(job):
+    '''Compiles source at every optimization level that is out of date.'''
+    import importlib.util, py_compile
+    fullpath, dfile, optlevels, invalidation_mode = job
+    messages = []
+    for level in optlevels:
+        cfile = importlib.util.cache_from_source(fullpath, optimization=level if level else '')
+        if is_up_to_date(fullpath, cfile, invalidation_mode):
+            continue
+        if not quiet and not messages:
+            messages.append('Compiling {!r}...'.format(fullpath))
+        try:
+            py_compile.compile(fullpath, cfile, dfile, doraise=True, optimize=level,
+                               invalidation_mode=invalidation_mode)
+        except py_compile.PyCompileError as e:
+            messages += ['*** Error compiling {!r}...'.format(fullpath), e.msg]
+            break
+        except (SyntaxError, UnicodeError, OSError) as e:
+            messages += ['*** Error compiling {!r}...'.format(fullpath),
+                         '{}: {}'.format(e.__class__.__name__, e)]
+            break
+    return messages
+
+def compile_incremental(files, optlevels):
+    '''
+    Compiles all optimization levels in one go, on all CPUs, skipping
+    bytecode that is already up to date. Like py_compile, writes checked
+    hash-based pycs instead of timestamp-based ones if SOURCE_DATE_EPOCH is
+    set.
+    '''
+    import py_compile
+    if os.environ.get('SOURCE_DATE_EPOCH'):
+        invalidation_mode = py_compile.PycInvalidationMode.CHECKED_HASH
+    else:
+        invalidation_mode = py_compile.PycInvalidationMode.TIMESTAMP
+    jobs = [(fullpath, dfile, optlevels, invalidation_mode) for fullpath, dfile in find_sources(files)]
+
+    results = None
+    workers = os.cpu_count() or 1
+    if workers > 1 and len(jobs) > 1:
+        try:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(compile_source, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+        except (ImportError, NotImplementedError, OSError):
+            # Some platforms lack working multiprocessing primitives
+            results = None
+    if results is None:
+        results = [compile_source(job) for job in jobs]
+    for messages in results:
+        for m in messages:
+            print(m)
 
 def run(manifest):
     data_file = os.path.join(os.path.dirname(__file__), manifest)
@@ -42,13 +119,27 @@ def run(manifest):
         dat = json.load(f)
     compileall(dat)
 
+def run_incremental(manifest, optlevel):
+    data_file = os.path.join(os.path.dirname(__file__), manifest)
+    with open(data_file, 'rb') as f:
+        dat = json.load(f)
+    optlevels = [0]
+    if optlevel > 0:
+        optlevels.append(1)
+    if optlevel == 2:
+        optlevels.append(2)
+    compile_incremental(dat, optlevels)
+
 if __name__ == '__main__':
     manifest = sys.argv[1]
-    run(manifest)
-    if len(sys.argv) > 2:
-        optlevel = int(sys.argv[2])
-        # python2 only needs one or the other
-        if optlevel == 1 or (sys.version_info >= (3,) and optlevel > 0):
-            subprocess.check_call([sys.executable, '-O'] + sys.argv[:2])
-        if optlevel == 2:
-            subprocess.check_call([sys.executable, '-OO'] + sys.argv[:2])
+    optlevel = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    if sys.version_info >= (3, 7) and not sys.flags.optimize:
+        run_incremental(manifest, optlevel)
+    else:
+        run(manifest)
+        if len(sys.argv) > 2:
+            # python2 only needs one or the other
+            if optlevel == 1 or (sys.version_info >= (3,) and optlevel > 0):
+                subprocess.check_call([sys.executable, '-O'] + sys.argv[:2])
+            if optlevel == 2:
+                subprocess.check_call([sys.executable, '-OO'] + sys.argv[:2])
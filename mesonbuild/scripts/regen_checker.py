@@ -4,19 +4,95 @@
 from __future__ import annotations
 
 import sys, os
-import pickle, subprocess
+import hashlib, json, pickle, subprocess
 import typing as T
-from ..coredata import CoreData
-from ..backend.backends import RegenInfo
-from ..mesonlib import OptionKey
+
+# Imported lazily, checking whether the build must be regenerated has to be
+# fast when it need not be.
+if T.TYPE_CHECKING:
+    from ..backend.backends import RegenInfo
 
 # This could also be used for XCode.
 
+INPUTS_FILE = 'regen-inputs.json'
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _meson_identity() -> str:
+    # The Meson version is defined there
+    return _hash_file(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'coredata.py'))
+
+def record_regen_inputs(build_dir: str, files: T.List[str], start_time: float) -> None:
+    '''
+    Records the contents of the files whose change means that the build must
+    be regenerated, once it was generated successfully.
+
+    Files modified since start_time may have changed after Meson read them,
+    so they are recorded as changed, except for the ones Meson writes in its
+    private directory.
+    '''
+    private_dir = os.path.join(os.path.abspath(build_dir), 'meson-private')
+    inputs: T.Dict[str, T.Optional[T.Tuple[int, int, str]]] = {}
+    for fname in files:
+        path = os.path.join(build_dir, fname)
+        try:
+            st = os.stat(path)
+            if st.st_mtime < start_time or os.path.abspath(path).startswith(private_dir + os.sep):
+                inputs[fname] = (st.st_mtime_ns, st.st_size, _hash_file(path))
+            else:
+                inputs[fname] = None
+        except OSError:
+            inputs[fname] = None
+    data = {'meson': _meson_identity(), 'inputs': inputs}
+    filename = os.path.join(build_dir, 'meson-private', INPUTS_FILE)
+    with open(filename + '~', 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(filename + '~', filename)
+
+def regen_inputs_unchanged(build_dir: str) -> bool:
+    '''
+    Whether the files the build was generated from have the same contents as
+    when it was generated, even if they were touched since.
+    '''
+    filename = os.path.join(build_dir, 'meson-private', INPUTS_FILE)
+    try:
+        with open(filename, encoding='utf-8') as f:
+            data = json.load(f)
+        if data['meson'] != _meson_identity():
+            return False
+        touched = False
+        for fname, recorded in data['inputs'].items():
+            if recorded is None:
+                return False
+            path = os.path.join(build_dir, fname)
+            st = os.stat(path)
+            if (st.st_mtime_ns, st.st_size) == tuple(recorded[:2]):
+                continue
+            if st.st_size != recorded[1] or _hash_file(path) != recorded[2]:
+                return False
+            recorded[0] = st.st_mtime_ns
+            touched = True
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        return False
+    if touched:
+        # Avoid hashing the touched files again next time
+        with open(filename + '~', 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(filename + '~', filename)
+    return True
+
 def need_regen(regeninfo: RegenInfo, regen_timestamp: float) -> bool:
     for i in regeninfo.depfiles:
         curfile = os.path.join(regeninfo.build_dir, i)
         curtime = os.stat(curfile).st_mtime
         if curtime > regen_timestamp:
+            if regen_inputs_unchanged(regeninfo.build_dir):
+                break
             return True
     # The timestamp file gets automatically deleted by MSBuild during a 'Clean' build.
     # We must make sure to recreate it, even if we do not regenerate the solution.
@@ -35,6 +111,9 @@ def regen(regeninfo: RegenInfo, meson_command: T.List[str], backend: str) -> Non
     subprocess.check_call(cmd)
 
 def run(args: T.List[str]) -> int:
+    from ..coredata import CoreData
+    from ..backend.backends import RegenInfo
+    from ..mesonlib import OptionKey
     private_dir = args[0]
     dumpfile = os.path.join(private_dir, 'regeninfo.dump')
     coredata_file = os.path.join(private_dir, 'coredata.dat')
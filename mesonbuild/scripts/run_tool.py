@@ -5,6 +5,11 @@ from __future__ import annotations
 
 import itertools
 import fnmatch
+import hashlib
+import json
+import os
+import re
+import shutil
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor
 
@@ -27,7 +32,121 @@ def parse_pattern_file(fname: Path) -> T.List[str]:
         pass
     return patterns
 
-def run_tool(name: str, srcdir: Path, builddir: Path, fn: T.Callable[..., subprocess.CompletedProcess], *args: T.Any) -> int:
+def compile_patterns(patterns: T.List[str]) -> T.Callable[[str], bool]:
+    '''Combines fnmatch patterns into a single matcher for paths.'''
+    if not patterns:
+        return lambda path: False
+    regex = re.compile('|'.join(fnmatch.translate(os.path.normcase(p)) for p in patterns))
+    return lambda path: regex.match(os.path.normcase(path)) is not None
+
+
+class ResultCache:
+
+    '''
+    Remembers the files a tool succeeded on, so that it is only run again
+    on files that changed since.
+
+    A result is reused if the file, the tool executable, the configuration
+    files of the tool in the directory of the file or its parents, and any
+    extra key for the file, such as its compile command, are all unchanged.
+    Files included by the file are not taken into account.
+    '''
+
+    VERSION = 1
+
+    def __init__(self, path: Path, exelist: T.List[str], args: T.List[str], config_files: T.List[str],
+                 extra_key: T.Optional[T.Callable[[Path], str]] = None) -> None:
+        self.path = path
+        self.config_files = config_files
+        self.extra_key = extra_key
+        self.config_hashes: T.Dict[Path, str] = {}
+        self.content_hashes: T.Dict[str, T.Tuple[int, int, str]] = {}
+        self.results: T.Dict[str, T.Tuple[str, str]] = {}
+        # Files that were looked at in this run, only those are saved
+        self.seen: T.Set[str] = set()
+        self.tool_key = json.dumps([exelist, args, self._tool_identity(exelist)])
+        try:
+            with path.open(encoding='utf-8') as f:
+                data = json.load(f)
+            if data['version'] == self.VERSION and data['tool'] == self.tool_key:
+                self.content_hashes = {k: tuple(v) for k, v in data['hashes'].items()}
+                self.results = {k: tuple(v) for k, v in data['results'].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    @staticmethod
+    def _tool_identity(exelist: T.List[str]) -> T.List[T.Tuple[str, int, int]]:
+        # The executables change with the version of the tool
+        identity = []
+        for e in exelist:
+            exe = shutil.which(e)
+            if exe is not None:
+                exe = os.path.realpath(exe)
+                st = os.stat(exe)
+                identity.append((exe, st.st_mtime_ns, st.st_size))
+        return identity
+
+    def _content_hash(self, fname: Path) -> str:
+        st = fname.stat()
+        cached = self.content_hashes.get(str(fname))
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        h = hashlib.sha256(fname.read_bytes()).hexdigest()
+        self.content_hashes[str(fname)] = (st.st_mtime_ns, st.st_size, h)
+        return h
+
+    def _config_hash(self, dirname: Path) -> str:
+        try:
+            return self.config_hashes[dirname]
+        except KeyError:
+            pass
+        h = hashlib.sha256()
+        if dirname.parent != dirname:
+            h.update(self._config_hash(dirname.parent).encode())
+        for name in self.config_files:
+            try:
+                h.update(name.encode() + b'\0' + (dirname / name).read_bytes())
+            except OSError:
+                pass
+        result = h.hexdigest()
+        self.config_hashes[dirname] = result
+        return result
+
+    def key(self, fname: Path) -> str:
+        self.seen.add(str(fname))
+        key = [self._content_hash(fname), self._config_hash(fname.parent.absolute())]
+        if self.extra_key:
+            key.append(self.extra_key(fname))
+        return json.dumps(key)
+
+    def lookup(self, fname: Path) -> T.Optional[str]:
+        '''Returns the output of the previous run if it is still valid.'''
+        result = self.results.get(str(fname))
+        if result is not None and result[0] == self.key(fname):
+            return result[1]
+        return None
+
+    def store(self, fname: Path, output: str) -> None:
+        self.results[str(fname)] = (self.key(fname), output)
+
+    def forget(self, fname: Path) -> None:
+        self.results.pop(str(fname), None)
+
+    def save(self) -> None:
+        data = {
+            'version': self.VERSION,
+            'tool': self.tool_key,
+            'hashes': {k: v for k, v in self.content_hashes.items() if k in self.seen},
+            'results': {k: v for k, v in self.results.items() if k in self.seen},
+        }
+        tempfilename = self.path.with_name(self.path.name + '~')
+        with tempfilename.open('w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tempfilename, self.path)
+
+
+def run_tool(name: str, srcdir: Path, builddir: Path, fn: T.Callable[..., subprocess.CompletedProcess], *args: T.Any,
+             cache: T.Optional[ResultCache] = None) -> int:
     patterns = parse_pattern_file(srcdir / f'.{name}-include')
     globs: T.Union[T.List[T.List[Path]], T.List[T.Generator[Path, None, None]]]
     if patterns:
@@ -41,6 +160,7 @@ def run_tool(name: str, srcdir: Path, builddir: Path, fn: T.Callable[..., subpro
     patterns = parse_pattern_file(srcdir / f'.{name}-ignore')
     ignore = [str(builddir / '*')]
     ignore.extend([str(srcdir / p) for p in patterns])
+    is_ignored = compile_patterns(ignore)
     suffixes = set(lang_suffixes['c']).union(set(lang_suffixes['cpp']))
     suffixes.add('h')
     suffixes = {f'.{s}' for s in suffixes}
@@ -48,11 +168,25 @@ def run_tool(name: str, srcdir: Path, builddir: Path, fn: T.Callable[..., subpro
     returncode = 0
     with ThreadPoolExecutor() as e:
         for f in itertools.chain(*globs):
-            strf = str(f)
-            if f.is_dir() or f.suffix not in suffixes or \
-                    any(fnmatch.fnmatch(strf, i) for i in ignore):
+            if f.suffix not in suffixes or is_ignored(str(f)) or f.is_dir():
                 continue
-            futures.append(e.submit(fn, f, *args))
-        if futures:
-            returncode = max(x.result().returncode for x in futures)
+            if cache is not None:
+                output = cache.lookup(f)
+                if output is not None:
+                    if output:
+                        print(output, end='')
+                    continue
+            futures.append((f, e.submit(fn, f, *args)))
+        for f, future in futures:
+            ret = future.result()
+            returncode = max(returncode, ret.returncode)
+            if cache is not None:
+                # The tool may have modified the file, so the key is
+                # computed after it ran
+                if ret.returncode == 0:
+                    cache.store(f, ret.stdout if isinstance(ret.stdout, str) else '')
+                else:
+                    cache.forget(f)
+    if cache is not None:
+        cache.save()
     return returncode
@@ -0,0 +1,209 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The Meson development team
+
+"""Wall time profiler for the configure step.
+
+The interpreter records a span for every function and method call, every
+build file it evaluates and the backend generation. At the end of setup the
+spans are summarized per build file, call site and function, and dumped as a
+Chrome trace that can be loaded into chrome://tracing or Perfetto.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager, nullcontext
+import json
+import os
+import threading
+import time
+import typing as T
+
+from .. import mlog
+
+__all__ = [
+    'ConfigureProfiler',
+    'active',
+    'file_span',
+    'start',
+    'stop',
+]
+
+# Spans shorter than this are only accounted in the report, not in the trace,
+# to keep the trace of huge projects loadable.
+TRACE_THRESHOLD = 50e-6
+
+class Span:
+
+    __slots__ = ['name', 'category', 'subdir', 'lineno', 'start', 'duration', 'children', 'tid']
+
+    def __init__(self, name: str, category: str, subdir: str, lineno: int, start: float, tid: int) -> None:
+        self.name = name
+        self.category = category
+        self.subdir = subdir
+        self.lineno = lineno
+        self.start = start
+        self.duration = 0.0
+        self.children = 0.0
+        self.tid = tid
+
+    @property
+    def filename(self) -> str:
+        return os.path.join(self.subdir, 'meson.build')
+
+    @property
+    def self_time(self) -> float:
+        return max(self.duration - self.children, 0.0)
+
+
+class ConfigureProfiler:
+
+    def __init__(self) -> None:
+        self.start_time = time.perf_counter()
+        self.end_time: T.Optional[float] = None
+        self.spans: T.List[Span] = []
+        self.local = threading.local()
+
+    def _stack(self) -> T.List[Span]:
+        try:
+            return self.local.stack
+        except AttributeError:
+            self.local.stack = []
+            return self.local.stack
+
+    @contextmanager
+    def span(self, name: str, category: str, subdir: str, lineno: int = 0) -> T.Iterator[None]:
+        stack = self._stack()
+        s = Span(name, category, subdir, lineno, time.perf_counter(), threading.get_ident())
+        stack.append(s)
+        try:
+            yield
+        finally:
+            s.duration = time.perf_counter() - s.start
+            stack.pop()
+            if stack:
+                stack[-1].children += s.duration
+            self.spans.append(s)
+
+    @property
+    def total_time(self) -> float:
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        return end - self.start_time
+
+    def by_file(self) -> T.List[T.Tuple[str, float, float, int]]:
+        '''Returns (file, self time, total time, calls) sorted by self time.
+
+        Self time of a file is the time spent in calls made from that file,
+        excluding calls made from other files, plus the time spent
+        evaluating the file itself. Total time is the wall time spent
+        evaluating the file, including everything it called.
+        '''
+        result: T.Dict[str, T.List[float]] = {}
+        for s in self.spans:
+            if s.category == 'backend':
+                continue
+            entry = result.setdefault(s.filename, [0.0, 0.0, 0])
+            entry[0] += s.self_time
+            if s.category == 'file':
+                entry[1] += s.duration
+            else:
+                entry[2] += 1
+        return sorted(((f, e[0], e[1], int(e[2])) for f, e in result.items()),
+                      key=lambda x: x[1], reverse=True)
+
+    def by_call_site(self) -> T.List[T.Tuple[str, str, float, float, int]]:
+        '''Returns (file:line, function, self time, total time, calls) sorted by self time.'''
+        result: T.Dict[T.Tuple[str, int, str], T.List[float]] = {}
+        for s in self.spans:
+            if s.category in {'file', 'backend'}:
+                continue
+            entry = result.setdefault((s.filename, s.lineno, s.name), [0.0, 0.0, 0])
+            entry[0] += s.self_time
+            entry[1] += s.duration
+            entry[2] += 1
+        return sorted(((f'{k[0]}:{k[1]}', k[2], e[0], e[1], int(e[2])) for k, e in result.items()),
+                      key=lambda x: x[2], reverse=True)
+
+    def by_function(self) -> T.List[T.Tuple[str, float, int]]:
+        '''Returns (function, self time, calls) sorted by self time.'''
+        result: T.Dict[str, T.List[float]] = {}
+        for s in self.spans:
+            if s.category == 'file':
+                continue
+            entry = result.setdefault(s.name, [0.0, 0])
+            entry[0] += s.self_time
+            entry[1] += 1
+        return sorted(((n, e[0], int(e[1])) for n, e in result.items()),
+                      key=lambda x: x[1], reverse=True)
+
+    def format_report(self, limit: int = 50) -> str:
+        lines = [f'Configure profile, total wall time {self.total_time:.3f} s',
+                 '',
+                 'Times are in seconds. Self time excludes nested calls and build files.']
+
+        lines += ['', 'Build files by self time:',
+                  f'{"self":>10} {"total":>10} {"calls":>7}  file']
+        for fname, self_time, total, calls in self.by_file()[:limit]:
+            lines.append(f'{self_time:10.3f} {total:10.3f} {calls:7}  {fname}')
+
+        lines += ['', 'Call sites by self time:',
+                  f'{"self":>10} {"total":>10} {"calls":>7}  location: function']
+        for location, name, self_time, total, calls in self.by_call_site()[:limit]:
+            lines.append(f'{self_time:10.3f} {total:10.3f} {calls:7}  {location}: {name}')
+
+        lines += ['', 'Functions by self time:',
+                  f'{"self":>10} {"calls":>7}  function']
+        for name, self_time, calls in self.by_function()[:limit]:
+            lines.append(f'{self_time:10.3f} {calls:7}  {name}')
+        return '\n'.join(lines) + '\n'
+
+    def trace_events(self) -> T.List[T.Dict[str, object]]:
+        pid = os.getpid()
+        events: T.List[T.Dict[str, object]] = []
+        for s in sorted(self.spans, key=lambda s: s.start):
+            if s.duration < TRACE_THRESHOLD:
+                continue
+            event: T.Dict[str, object] = {
+                'name': s.name,
+                'cat': s.category,
+                'ph': 'X',
+                'ts': round((s.start - self.start_time) * 1e6, 3),
+                'dur': round(s.duration * 1e6, 3),
+                'pid': pid,
+                'tid': s.tid,
+            }
+            if s.category != 'backend':
+                event['args'] = {'file': s.filename, 'line': s.lineno}
+            events.append(event)
+        return events
+
+    def write(self, log_dir: str) -> None:
+        if self.end_time is None:
+            self.end_time = time.perf_counter()
+        report = os.path.join(log_dir, 'configure-profile.txt')
+        with open(report, 'w', encoding='utf-8') as f:
+            f.write(self.format_report())
+        trace = os.path.join(log_dir, 'configure-profile.json')
+        with open(trace, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, f)
+        mlog.log('Configure profile written to', mlog.bold(report), 'and', mlog.bold(trace))
+
+
+# The profiler of the currently running setup, if profiling was requested.
+# Checked by the interpreter on every call, so it must stay a plain global.
+active: T.Optional[ConfigureProfiler] = None
+
+def start() -> ConfigureProfiler:
+    global active  # pylint: disable=global-statement
+    active = ConfigureProfiler()
+    return active
+
+def stop() -> T.Optional[ConfigureProfiler]:
+    global active  # pylint: disable=global-statement
+    profiler, active = active, None
+    return profiler
+
+def file_span(subdir: str) -> T.ContextManager[None]:
+    '''Records the evaluation of the build file in subdir, if profiling.'''
+    if active is None:
+        return nullcontext()
+    return active.span(os.path.join(subdir, 'meson.build'), 'file', subdir)
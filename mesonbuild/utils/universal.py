@@ -21,12 +21,18 @@ import typing as T
 import textwrap
 import pickle
 import errno
+import codecs
+import hashlib
+import io
 import json
+import threading
+import weakref
 
 from mesonbuild import mlog
 from .core import MesonException, HoldableObject
 
 if T.TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
     from typing_extensions import Literal, Protocol
 
     from .._typing import ImmutableListProtocol
@@ -68,6 +74,7 @@ __all__ = [
     'GitException',
     'OptionKey',
     'dump_conf_header',
+    'ConfigureFileWriter',
     'OptionType',
     'OrderedSet',
     'PerMachine',
@@ -82,6 +89,7 @@ __all__ = [
     'classify_unity_sources',
     'current_vs_supports_modules',
     'darwin_get_object_archs',
+    'DirectoryIndex',
     'default_libdir',
     'default_libexecdir',
     'default_prefix',
@@ -128,12 +136,15 @@ __all__ = [
     'is_wsl',
     'iter_regexin_iter',
     'join_args',
+    'library_dir_index',
     'listify',
     'partition',
     'path_is_in_root',
     'pickle_load',
     'Popen_safe',
     'Popen_safe_logged',
+    'prefetch_popen',
+    'clear_prefetched_popen',
     'quiet_git',
     'quote_arg',
     'relative_to_if_possible',
@@ -368,13 +379,61 @@ dot_C_dot_H_warning = """You are using .C or .H files in your project. This is d
          the /TP compiler flag, but this is unreliable.
          See https://github.com/mesonbuild/meson/pull/8747 for the discussions."""
 class File(HoldableObject):
-    def __init__(self, is_built: bool, subdir: str, fname: str):
+
+    """A source or built file, relative to the source or build root.
+
+    Files are immutable and interned: creating a File equal to one that is
+    still alive returns the existing object. The paths derived from a File
+    are computed once and stored on it.
+    """
+
+    __slots__ = ['is_built', 'subdir', 'fname', 'hash', '_relative_name',
+                 '_build_to_src', '_rel_to_builddir', '_srcdir', '_builddir', '_absolute_path',
+                 '_checked_root', '__weakref__']
+
+    is_built: bool
+    subdir: str
+    fname: str
+    hash: int
+    _relative_name: T.Optional[str]
+    # The last arguments and results of rel_to_builddir() and absolute_path()
+    _build_to_src: T.Optional[str]
+    _rel_to_builddir: str
+    _srcdir: T.Optional[str]
+    _builddir: T.Optional[str]
+    _absolute_path: str
+    # Source root in which from_source_file() found this file
+    _checked_root: T.Optional[str]
+
+    _interned: 'weakref.WeakValueDictionary[T.Tuple[bool, str, str], File]' = weakref.WeakValueDictionary()
+
+    def __new__(cls, is_built: bool, subdir: str, fname: str) -> 'File':
+        key = (is_built, subdir, fname)
+        self = cls._interned.get(key)
+        if self is not None:
+            return self
         if fname.endswith(".C") or fname.endswith(".H"):
             mlog.warning(dot_C_dot_H_warning, once=True)
+        self = super().__new__(cls)
         self.is_built = is_built
         self.subdir = subdir
         self.fname = fname
-        self.hash = hash((is_built, subdir, fname))
+        self.hash = hash(key)
+        self._relative_name = None
+        self._build_to_src = None
+        self._srcdir = self._builddir = None
+        self._checked_root = None
+        cls._interned[key] = self
+        return self
+
+    def __reduce__(self) -> T.Tuple[T.Type['File'], T.Tuple[bool, str, str]]:
+        return (File, (self.is_built, self.subdir, self.fname))
+
+    def __copy__(self) -> 'File':
+        return self
+
+    def __deepcopy__(self, memo: T.Dict[int, T.Any]) -> 'File':
+        return self
 
     def __str__(self) -> str:
         return self.relative_name()
@@ -387,11 +446,13 @@ class File(HoldableObject):
         return ret.format(self.relative_name())
 
     @staticmethod
-    @lru_cache(maxsize=None)
     def from_source_file(source_root: str, subdir: str, fname: str) -> 'File':
-        if not os.path.isfile(os.path.join(source_root, subdir, fname)):
-            raise MesonException(f'File {fname} does not exist.')
-        return File(False, subdir, fname)
+        f = File(False, subdir, fname)
+        if f._checked_root != source_root:
+            if not os.path.isfile(os.path.join(source_root, subdir, fname)):
+                raise MesonException(f'File {fname} does not exist.')
+            f._checked_root = source_root
+        return f
 
     @staticmethod
     def from_built_file(subdir: str, fname: str) -> 'File':
@@ -406,19 +467,22 @@ class File(HoldableObject):
     def from_absolute_file(fname: str) -> 'File':
         return File(False, '', fname)
 
-    @lru_cache(maxsize=None)
     def rel_to_builddir(self, build_to_src: str) -> str:
         if self.is_built:
             return self.relative_name()
-        else:
-            return os.path.join(build_to_src, self.subdir, self.fname)
+        if self._build_to_src != build_to_src:
+            self._rel_to_builddir = os.path.join(build_to_src, self.subdir, self.fname)
+            self._build_to_src = build_to_src
+        return self._rel_to_builddir
 
-    @lru_cache(maxsize=None)
     def absolute_path(self, srcdir: str, builddir: str) -> str:
-        absdir = srcdir
-        if self.is_built:
-            absdir = builddir
-        return os.path.join(absdir, self.relative_name())
+        if self._srcdir != srcdir or self._builddir != builddir:
+            absdir = srcdir
+            if self.is_built:
+                absdir = builddir
+            self._absolute_path = os.path.join(absdir, self.relative_name())
+            self._srcdir, self._builddir = srcdir, builddir
+        return self._absolute_path
 
     @property
     def suffix(self) -> str:
@@ -434,6 +498,8 @@ class File(HoldableObject):
         return self.fname.rsplit(s, maxsplit=maxsplit)
 
     def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
         if not isinstance(other, File):
             return NotImplemented
         if self.hash != other.hash:
@@ -443,9 +509,11 @@ class File(HoldableObject):
     def __hash__(self) -> int:
         return self.hash
 
-    @lru_cache(maxsize=None)
     def relative_name(self) -> str:
-        return os.path.join(self.subdir, self.fname)
+        name = self._relative_name
+        if name is None:
+            name = self._relative_name = os.path.join(self.subdir, self.fname)
+        return name
 
 
 def get_compiler_for_source(compilers: T.Iterable['Compiler'], src: 'FileOrString') -> 'Compiler':
@@ -717,6 +785,104 @@ def darwin_get_object_archs(objpath: str) -> 'ImmutableListProtocol[str]':
 
     return meson_archs
 
+
+class DirectoryIndex:
+    '''
+    Caches the listing of directories that are searched many times, such as
+    the library directories used by find_library() and pkg-config
+    dependencies, so that looking up a file name does not need a stat() call
+    for each candidate.
+
+    A listing is reused as long as the modification time of the directory
+    does not change. Directories that were modified shortly before they were
+    listed are not trusted, since a file could have been added afterwards
+    without changing the timestamp.
+    '''
+
+    # Timestamps of some filesystems only have a granularity of a few
+    # seconds
+    RACY_WINDOW_NS = 2_000_000_000
+
+    def __init__(self) -> None:
+        self.listings: T.Dict[str, T.Tuple[int, T.Dict[str, os.DirEntry[str]]]] = {}
+        self.elf_classes: T.Dict[str, T.Tuple[int, int, int]] = {}
+
+    def clear(self) -> None:
+        self.listings.clear()
+        self.elf_classes.clear()
+
+    def entries(self, directory: str) -> T.Dict[str, os.DirEntry[str]]:
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return {}
+        cached = self.listings.get(directory)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        scan_time = time.time_ns()
+        try:
+            with os.scandir(directory) as it:
+                entries = {e.name: e for e in it}
+        except OSError:
+            return {}
+        if scan_time - mtime > self.RACY_WINDOW_NS:
+            self.listings[directory] = (mtime, entries)
+        return entries
+
+    def _entry(self, path: str) -> T.Optional[os.DirEntry[str]]:
+        directory, name = os.path.split(path)
+        return self.entries(directory or '.').get(name)
+
+    def exists(self, path: str) -> bool:
+        entry = self._entry(path)
+        if entry is None:
+            return False
+        if not entry.is_symlink():
+            return True
+        return os.path.exists(path)
+
+    def is_file(self, path: str) -> bool:
+        entry = self._entry(path)
+        try:
+            return entry is not None and entry.is_file()
+        except OSError:
+            return False
+
+    def files(self, directory: str) -> T.List[str]:
+        '''Names of the files in directory, in no particular order.'''
+        result: T.List[str] = []
+        for name, entry in self.entries(directory).items():
+            try:
+                if entry.is_file():
+                    result.append(name)
+            except OSError:
+                pass
+        return result
+
+    def elf_class(self, path: str) -> T.Optional[int]:
+        '''
+        Returns 1 for 32-bit and 2 for 64-bit ELF files, 0 if the file is not
+        an ELF file and None if it cannot be read.
+        '''
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        cached = self.elf_classes.get(path)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(5)
+        except OSError:
+            return None
+        elf_class = header[4] if len(header) == 5 and header[1:4] == b'ELF' else 0
+        self.elf_classes[path] = (st.st_mtime_ns, st.st_size, elf_class)
+        return elf_class
+
+
+library_dir_index = DirectoryIndex()
+
 def windows_detect_native_arch() -> str:
     """
     The architecture of Windows itself: x86, amd64 or arm64
@@ -1340,6 +1506,140 @@ def do_conf_file(src: str, dst: str, confdata: 'ConfigurationData',
     replace_if_different(dst, dst_tmp)
     return missing_variables, confdata_useless
 
+# digest of the inputs, (mtime, size) of the output, missing variables,
+# configuration data useless, uses cmakedefine with more than two tokens
+ConfigureFileCacheEntry = T.Tuple[str, T.Tuple[int, int], T.FrozenSet[str], bool, bool]
+
+class ConfigureFileWriter:
+
+    """Generates the outputs of configure_file() in configuration mode.
+
+    Outputs whose template and configuration data did not change since they
+    were last generated, and that were not modified since, are left alone
+    without expanding the template again. The others are expanded right away,
+    so that problems are reported at the right place, but are written by a
+    thread pool. flush() must be called before anything may read them.
+    """
+
+    def __init__(self, cache: T.Dict[str, ConfigureFileCacheEntry]) -> None:
+        self.cache = cache
+        self.pending: T.Dict[str, Future[None]] = {}
+        self.executor: T.Optional[Executor] = None
+
+    @staticmethod
+    def _conf_digest(confdata: 'ConfigurationData', *extra: object) -> 'hashlib._Hash':
+        h = hashlib.sha256()
+        h.update(repr(extra).encode())
+        for k, (v, desc) in sorted(confdata.values.items()):
+            h.update(repr((k, v, desc)).encode())
+        return h
+
+    def _lookup(self, dst: str, digest: str) -> T.Optional[ConfigureFileCacheEntry]:
+        entry = self.cache.get(dst)
+        if entry is None or entry[0] != digest:
+            return None
+        try:
+            st = os.stat(dst)
+        except OSError:
+            return None
+        if (st.st_mtime_ns, st.st_size) != entry[1]:
+            return None
+        return entry
+
+    def _write(self, dst: str, data: T.List[bytes], mode_src: T.Optional[str],
+               entry: T.Tuple[str, T.FrozenSet[str], bool, bool]) -> None:
+        dst_tmp = dst + '~'
+        try:
+            with open(dst_tmp, 'wb') as f:
+                f.writelines(data)
+        except Exception as e:
+            raise MesonException(f'Could not write output file {dst}: {e!s}')
+        if mode_src is not None:
+            shutil.copymode(mode_src, dst_tmp)
+        replace_if_different(dst, dst_tmp)
+        st = os.stat(dst)
+        # A race with another configure_file() writing the same output only
+        # loses its cache entry, as the digest would not match anymore
+        self.cache[dst] = (entry[0], (st.st_mtime_ns, st.st_size), entry[1], entry[2], entry[3])
+
+    def _submit(self, dst: str, data: T.List[str], encoding: str, translate_newlines: bool,
+                mode_src: T.Optional[str], entry: T.Tuple[str, T.FrozenSet[str], bool, bool]) -> None:
+        # Encode here like a text file would, so that encoding errors are
+        # reported at the configure_file() call that caused them.
+        encoder = codecs.getincrementalencoder(encoding)()
+        try:
+            encoded = [encoder.encode(l.replace('\n', os.linesep) if translate_newlines else l) for l in data]
+            encoded.append(encoder.encode('', final=True))
+        except Exception as e:
+            raise MesonException(f'Could not write output file {dst}: {e!s}')
+        if dst in self.pending:
+            # The same output is configured twice, keep the writes in order
+            self.pending.pop(dst).result()
+        if self.executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.executor = ThreadPoolExecutor()
+        self.pending[dst] = self.executor.submit(self._write, dst, encoded, mode_src, entry)
+
+    def conf_file(self, src: str, dst: str, confdata: 'ConfigurationData',
+                  variable_format: Literal['meson', 'cmake', 'cmake@'],
+                  encoding: str = 'utf-8', subproject: T.Optional[SubProject] = None) -> T.Tuple[T.Set[str], bool]:
+        """Same as do_conf_file(), but skipping and deferring the work when possible."""
+        try:
+            with open(src, 'rb') as f:
+                raw = f.read()
+            mode = os.stat(src).st_mode
+        except Exception as e:
+            raise MesonException(f'Could not read input file {src}: {e!s}')
+        h = self._conf_digest(confdata, variable_format, encoding, mode)
+        h.update(raw)
+        digest = h.hexdigest()
+
+        entry = self._lookup(dst, digest)
+        if entry is not None:
+            if entry[4] and subproject is not None:
+                from ..interpreterbase.decorators import FeatureNew
+                FeatureNew.single_use('cmakedefine without exactly two tokens', '0.54.1', subproject)
+            return set(entry[2]), entry[3]
+
+        try:
+            data = io.StringIO(raw.decode(encoding), newline='').readlines()
+        except Exception as e:
+            raise MesonException(f'Could not read input file {src}: {e!s}')
+        result, missing_variables, confdata_useless = do_conf_str(src, data, confdata, variable_format, subproject)
+        odd_cmakedefine = variable_format != 'meson' and any(
+            l.lstrip().startswith('#cmakedefine') and len(l.split()) != 2 for l in data)
+        self._submit(dst, result, encoding, False, src,
+                     (digest, frozenset(missing_variables), confdata_useless, odd_cmakedefine))
+        return missing_variables, confdata_useless
+
+    def conf_header(self, dst: str, cdata: 'ConfigurationData',
+                    output_format: Literal['c', 'nasm', 'json'],
+                    macro_name: T.Optional[str]) -> None:
+        """Same as dump_conf_header(), but skipping and deferring the work when possible."""
+        digest = self._conf_digest(cdata, output_format, macro_name).hexdigest()
+        if self._lookup(dst, digest) is not None:
+            return
+        ofile = io.StringIO()
+        if output_format == 'json':
+            json.dump({k: v[0] for k, v in cdata.values.items()}, ofile, sort_keys=True)
+        else:  # c, nasm
+            _dump_c_header(ofile, cdata, output_format, macro_name)
+        self._submit(dst, [ofile.getvalue()], 'utf-8', True, None, (digest, frozenset(), False, False))
+
+    def flush(self) -> None:
+        """Wait until all the outputs are written."""
+        pending, self.pending = self.pending, {}
+        try:
+            for future in pending.values():
+                future.result()
+        finally:
+            # Don't leave writes behind if one of them failed
+            for future in pending.values():
+                future.cancel()
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
 CONF_C_PRELUDE = '''/*
  * Autogenerated by the Meson build system.
  * Do not edit, your changes will be lost.
@@ -1498,19 +1798,83 @@ def partition(pred: T.Callable[[_T], object], iterable: T.Iterable[_T]) -> T.Tup
     return (t for t in t1 if not pred(t)), (t for t in t2 if pred(t))
 
 
+# Commands started ahead of time by prefetch_popen(), with the number of
+# Popen_safe() calls that may still take their result.
+_prefetched_popen: T.Dict[T.Tuple[T.Tuple[str, ...], T.Optional[str], object, object, object],
+                          T.Tuple['Future[T.Tuple[subprocess.Popen[str], str, str]]', int]] = {}
+_prefetched_popen_lock = threading.Lock()
+
+def prefetch_popen(executor: 'Executor', args: T.List[str], write: T.Optional[str] = None,
+                   stdin: T.Union[T.TextIO, T.BinaryIO, int] = subprocess.DEVNULL
+                   ) -> 'Future[T.Tuple[subprocess.Popen[str], str, str]]':
+    '''
+    Start running args in executor, so that the next Popen_safe() call with
+    the same arguments only has to wait for the result instead of starting
+    the process itself. Used to run independent probes concurrently while
+    keeping the code that consumes their output sequential.
+
+    Prefetching the same command several times lets that many calls share
+    one run of it. Returns the future of the run.
+    '''
+    if write is not None:
+        stdin = subprocess.PIPE
+    key = (tuple(args), write, stdin, subprocess.PIPE, subprocess.PIPE)
+    with _prefetched_popen_lock:
+        if key in _prefetched_popen:
+            future, uses = _prefetched_popen[key]
+            _prefetched_popen[key] = (future, uses + 1)
+        else:
+            future = executor.submit(_run_popen_safe, args, write, stdin, subprocess.PIPE, subprocess.PIPE)
+            _prefetched_popen[key] = (future, 1)
+    return future
+
+def clear_prefetched_popen() -> None:
+    '''Drop the results of prefetched commands nobody asked for.'''
+    with _prefetched_popen_lock:
+        _prefetched_popen.clear()
+
+def _take_prefetched_popen(key: T.Tuple[T.Tuple[str, ...], T.Optional[str], object, object, object]
+                           ) -> T.Optional['Future[T.Tuple[subprocess.Popen[str], str, str]]']:
+    with _prefetched_popen_lock:
+        entry = _prefetched_popen.get(key)
+        if entry is None:
+            return None
+        future, uses = entry
+        # Only take results of commands that are already running, or the
+        # pool would run this one after everything queued before it
+        if not (future.running() or future.done()):
+            return None
+        if uses > 1:
+            _prefetched_popen[key] = (future, uses - 1)
+        else:
+            del _prefetched_popen[key]
+        return future
+
 def Popen_safe(args: T.List[str], write: T.Optional[str] = None,
                stdin: T.Union[T.TextIO, T.BinaryIO, int] = subprocess.DEVNULL,
                stdout: T.Union[T.TextIO, T.BinaryIO, int] = subprocess.PIPE,
                stderr: T.Union[T.TextIO, T.BinaryIO, int] = subprocess.PIPE,
                **kwargs: T.Any) -> T.Tuple['subprocess.Popen[str]', str, str]:
-    import locale
-    encoding = locale.getpreferredencoding()
     # Stdin defaults to DEVNULL otherwise the command run by us here might mess
     # up the console and ANSI colors will stop working on Windows.
     # If write is not None, set stdin to PIPE so data can be sent.
     if write is not None:
         stdin = subprocess.PIPE
 
+    if _prefetched_popen and not kwargs:
+        future = _take_prefetched_popen((tuple(args), write, stdin, stdout, stderr))
+        if future is not None:
+            return future.result()
+    return _run_popen_safe(args, write, stdin, stdout, stderr, **kwargs)
+
+
+def _run_popen_safe(args: T.List[str], write: T.Optional[str],
+                    stdin: T.Union[T.TextIO, T.BinaryIO, int],
+                    stdout: T.Union[T.TextIO, T.BinaryIO, int],
+                    stderr: T.Union[T.TextIO, T.BinaryIO, int],
+                    **kwargs: T.Any) -> T.Tuple['subprocess.Popen[str]', str, str]:
+    import locale
+    encoding = locale.getpreferredencoding()
     try:
         if not sys.stdout.encoding or encoding.upper() != 'UTF-8':
             p, o, e = Popen_safe_legacy(args, write=write, stdin=stdin, stdout=stdout, stderr=stderr, **kwargs)
@@ -2161,6 +2525,7 @@ _BUILTIN_NAMES = {
     'errorlogs',
     'genvslite',
     'install_umask',
+    'introspection_layout',
     'layout',
     'optimization',
     'prefer_static',
@@ -2168,10 +2533,12 @@ _BUILTIN_NAMES = {
     'strip',
     'unity',
     'unity_size',
+    'unity_strategy',
     'warning_level',
     'werror',
     'wrap_mode',
     'force_fallback_for',
+    'wrap_prefetch',
     'pkg_config_path',
     'cmake_prefix_path',
     'vsenv',
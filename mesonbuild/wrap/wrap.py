@@ -5,6 +5,7 @@ from __future__ import annotations
 
 from .. import mlog
 import contextlib
+import copy
 from dataclasses import dataclass
 import urllib.request
 import urllib.error
@@ -23,6 +24,7 @@ import textwrap
 import json
 
 from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
 from netrc import netrc
 from pathlib import Path, PurePath
 from functools import lru_cache
@@ -507,6 +509,31 @@ class Resolver:
         self.wrap.update_hash_cache(self.dirname)
         return rel_path, method
 
+    def prefetch(self, packagenames: T.List[str]) -> None:
+        '''
+        Download and extract the given subprojects in parallel, so that
+        resolving them later finds them in place.
+
+        Errors are only logged here, resolve() reports them again if the
+        subproject is actually used.
+        '''
+        names = [n for n in packagenames if n in self.wraps and self.wraps[n].has_wrap]
+        if not names:
+            return
+
+        def fetch(packagename: str) -> None:
+            # resolve() keeps its state in the resolver, use a copy per thread
+            r = copy.copy(self)
+            r.silent = True
+            try:
+                r.resolve(packagename)
+            except Exception as e:
+                mlog.debug(f'Could not prefetch subproject {packagename!r}: {e}')
+
+        mlog.log('Prefetching', mlog.bold(str(len(names))), 'subprojects')
+        with ThreadPoolExecutor() as executor:
+            list(executor.map(fetch, names))
+
     def check_can_download(self) -> None:
         # Don't download subproject data based on wrap file if requested.
         # Git submodules are ok (see above)!
@@ -592,7 +592,7 @@ def create_deterministic_builddir(test: TestDef, use_tmpdir: bool) -> str:
 
 def format_parameter_file(file_basename: str, test: TestDef, test_build_dir: str) -> Path:
     confdata = ConfigurationData()
-    confdata.values = {'MESON_TEST_ROOT': (str(test.path.absolute()), 'base directory of current test')}
+    confdata.values['MESON_TEST_ROOT'] = (str(test.path.absolute()), 'base directory of current test')
 
     template = test.path / (file_basename + '.in')
     destination = Path(test_build_dir) / file_basename
@@ -0,0 +1,4 @@
+#if defined _WIN32 || defined __CYGWIN__
+__declspec(dllexport)
+#endif
+int func(void) { return 0; }
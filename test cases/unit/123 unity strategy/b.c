@@ -0,0 +1,3 @@
+int func_b(void) {
+    return 2;
+}
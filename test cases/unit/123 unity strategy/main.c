@@ -0,0 +1,7 @@
+int big(int i);
+int func_a(void);
+int func_b(void);
+
+int main(void) {
+    return big(3) + func_a() + func_b() - 6;
+}
@@ -0,0 +1,5 @@
+#include "common.h"
+
+int func_a(void) {
+    return (int)strlen("a");
+}
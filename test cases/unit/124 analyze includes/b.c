@@ -0,0 +1,6 @@
+#include "common.h"
+#include <ctype.h>
+
+int func_b(void) {
+    return isdigit('b') ? 1 : 2;
+}
@@ -0,0 +1,9 @@
+#include "common.h"
+
+int func_a(void);
+int func_b(void);
+
+int main(void) {
+    printf("%d\n", func_a() + func_b());
+    return EXIT_SUCCESS;
+}
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The Meson development team
+
+'''Measures the overhead of the typed_pos_args and typed_kwargs decorators per
+call, using the keyword arguments of executable() and of a small method.
+
+Run it from different checkouts to compare changes to the decorators:
+
+    ./tools/decorator_benchmark.py --calls 20000
+'''
+
+import argparse
+import sys
+import timeit
+import typing as T
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+from mesonbuild.interpreterbase import KwargInfo, typed_kwargs, typed_pos_args
+from mesonbuild.interpreter.type_checking import EXECUTABLE_KWS, NATIVE_KW
+
+class Callee:
+
+    def __init__(self) -> None:
+        self.current_node = mock.Mock()
+        self.subproject = ''
+
+    def plain(self, node: T.Any, args: T.Any, kwargs: T.Any) -> None:
+        pass
+
+    @typed_pos_args('executable', str, varargs=str)
+    @typed_kwargs('executable', *EXECUTABLE_KWS, allow_unknown=True)
+    def executable(self, node: T.Any, args: T.Any, kwargs: T.Any) -> None:
+        pass
+
+    @typed_pos_args('method', str)
+    @typed_kwargs('method', NATIVE_KW, KwargInfo('required', bool, default=True))
+    def method(self, node: T.Any, args: T.Any, kwargs: T.Any) -> None:
+        pass
+
+def measure(func: T.Callable[[], None], calls: int) -> float:
+    '''Best time per call in microseconds.'''
+    return min(timeit.repeat(func, number=calls, repeat=5)) / calls * 1e6
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', 1)[0])
+    parser.add_argument('--calls', type=int, default=20000, help='number of calls per measurement (default: %(default)s)')
+    options = parser.parse_args()
+
+    c = Callee()
+    node = c.current_node
+    base = measure(lambda: c.plain(node, ['prog', 'main.c'], {'install': True}), options.calls)
+    cases = [
+        ('executable(), no kwargs', lambda: c.executable(node, ['prog', 'main.c'], {})),
+        ('executable(), 3 kwargs', lambda: c.executable(node, ['prog', 'main.c'],
+                                                        {'install': True, 'c_args': ['-DFOO'], 'link_args': []})),
+        ('method(), 1 kwarg', lambda: c.method(node, ['name'], {'required': False})),
+    ]
+    print(f'undecorated call: {base:8.2f} us')
+    for name, func in cases:
+        print(f'{name + ":":<25} {measure(func, options.calls) - base:8.2f} us overhead per call')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: Apache-2.0
+# Copyright 2024 The Meson development team
+
+'''Measures the size of the generated build.ninja and how long Ninja takes to
+load it, for a synthetic project with many targets, sources and flags.
+
+Pass --meson several times to compare different Meson checkouts, e.g. before
+and after a change to the Ninja backend:
+
+    ./tools/ninja_benchmark.py --meson /path/to/old/meson.py --meson ./meson.py
+'''
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import typing as T
+from pathlib import Path
+
+root_path = Path(__file__).parent.parent.absolute()
+
+def generate_project(srcdir: Path, targets: int, sources: int, flags: int) -> None:
+    project_args = ', '.join(f"'-DMESON_BENCH_FLAG_{i}=1'" for i in range(flags))
+    lines = ["project('ninja-benchmark', 'c')",
+             f'add_project_arguments({project_args}, language: \'c\')']
+    for t in range(targets):
+        subdir = srcdir / f'sub{t}'
+        subdir.mkdir(parents=True)
+        for s in range(sources):
+            (subdir / f'src{s}.c').write_text(f'int func_{t}_{s}(void) {{ return {s}; }}\n', encoding='utf-8')
+        srcs = ', '.join(f"'src{s}.c'" for s in range(sources))
+        (subdir / 'meson.build').write_text(f"static_library('lib{t}', {srcs}, c_args: ['-DTARGET_{t}'])\n",
+                                            encoding='utf-8')
+        lines.append(f"subdir('sub{t}')")
+    (srcdir / 'meson.build').write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+def ninja_load_time(ninja: str, builddir: Path, runs: int) -> T.Tuple[float, T.Optional[float]]:
+    '''Returns the best wall clock time and the best parse time reported by
+    Ninja itself, both in milliseconds.'''
+    wall: T.List[float] = []
+    parse: T.List[float] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        p = subprocess.run([ninja, '-C', str(builddir), '-d', 'stats', '-n', 'build.ninja'],
+                           stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, check=True)
+        wall.append((time.perf_counter() - start) * 1000)
+        m = re.search(r'^\.ninja parse\s+\d+\s+[\d.]+\s+([\d.]+)', p.stdout, re.MULTILINE)
+        if m:
+            parse.append(float(m.group(1)))
+    return min(wall), min(parse) if parse else None
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', 1)[0])
+    parser.add_argument('--meson', action='append', default=[],
+                        help='meson.py to benchmark, may be given multiple times (default: this checkout)')
+    parser.add_argument('--targets', type=int, default=20, help='number of static libraries (default: %(default)s)')
+    parser.add_argument('--sources', type=int, default=200, help='number of sources per target (default: %(default)s)')
+    parser.add_argument('--flags', type=int, default=300, help='number of project compile flags (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=5, help='number of times to load build.ninja (default: %(default)s)')
+    options = parser.parse_args()
+
+    ninja = shutil.which('ninja') or shutil.which('samu')
+    if ninja is None:
+        print('Ninja not found.', file=sys.stderr)
+        return 1
+    mesons = options.meson or [str(root_path / 'meson.py')]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        srcdir = Path(tmpdir, 'src')
+        generate_project(srcdir, options.targets, options.sources, options.flags)
+        print(f'{options.targets} targets x {options.sources} sources, {options.flags} flags')
+        for i, meson in enumerate(mesons):
+            builddir = Path(tmpdir, f'build{i}')
+            start = time.perf_counter()
+            subprocess.run([sys.executable, meson, 'setup', str(srcdir), str(builddir)],
+                           stdout=subprocess.DEVNULL, check=True)
+            setup_time = time.perf_counter() - start
+            size = os.path.getsize(builddir / 'build.ninja')
+            wall, parse = ninja_load_time(ninja, builddir, options.runs)
+            parse_str = f'{parse:.1f} ms' if parse is not None else 'n/a'
+            print(f'{meson}:')
+            print(f'  setup:            {setup_time:.2f} s')
+            print(f'  build.ninja size: {size / 1024 / 1024:.2f} MiB')
+            print(f'  ninja load:       {wall:.1f} ms (parse {parse_str})')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -24,6 +24,7 @@ import mesonbuild.dependencies.base
 import mesonbuild.dependencies.factory
 import mesonbuild.envconfig
 import mesonbuild.environment
+import mesonbuild.build
 import mesonbuild.coredata
 import mesonbuild.modules.gnome
 from mesonbuild.mesonlib import (
@@ -55,7 +56,7 @@ from mesonbuild.scripts import destdir_join
 from mesonbuild.wrap.wrap import PackageDefinition, WrapException
 
 from run_tests import (
-    Backend, exe_suffix, get_fake_env, get_convincing_fake_env_and_cc
+    Backend, ensure_backend_detects_changes, exe_suffix, get_fake_env, get_convincing_fake_env_and_cc
 )
 
 from .baseplatformtests import BasePlatformTests
@@ -881,11 +882,17 @@ class AllPlatformTests(BasePlatformTests):
         if self.backend is not Backend.ninja:
             raise SkipTest(f'mtest can\'t rebuild with {self.backend.name!r}')
 
-        testdir = os.path.join(self.common_test_dir, '206 tap tests')
+        orig_testdir = os.path.join(self.common_test_dir, '206 tap tests')
+        testdir = os.path.join(tempfile.mkdtemp(), 'src')
+        self.addCleanup(windows_proof_rmtree, os.path.dirname(testdir))
+        shutil.copytree(orig_testdir, testdir)
         self.init(testdir)
-        self.utime(os.path.join(testdir, 'meson.build'))
+        ensure_backend_detects_changes(self.backend)
+        with open(os.path.join(testdir, 'meson.build'), 'a', encoding='utf-8') as f:
+            f.write('\n')
         o = self._run(self.mtest_command + ['--list'])
         self.assertIn('Regenerating build files.', o)
+        self.assertIn('The Meson build system', o)
         self.assertIn('test_features / xfail', o)
         o = self._run(self.mtest_command + ['--list'])
         self.assertNotIn('Regenerating build files.', o)
@@ -893,7 +900,9 @@ class AllPlatformTests(BasePlatformTests):
         tester = os.path.join(self.builddir, 'tester' + exe_suffix)
         self.assertPathDoesNotExist(tester)
         # check that we don't reconfigure if --no-rebuild is passed
-        self.utime(os.path.join(testdir, 'meson.build'))
+        ensure_backend_detects_changes(self.backend)
+        with open(os.path.join(testdir, 'meson.build'), 'a', encoding='utf-8') as f:
+            f.write('\n')
         o = self._run(self.mtest_command + ['--list', '--no-rebuild'])
         self.assertNotIn('Regenerating build files.', o)
 
@@ -1281,9 +1290,11 @@ class AllPlatformTests(BasePlatformTests):
         self.build()
         # Immediately rebuilding should not do anything
         self.assertBuildIsNoop()
-        # Changing mtime of meson.build should not rebuild anything
+        # Changing mtime of meson.build should not even regenerate the
+        # build files, since its contents did not change
         self.utime(os.path.join(testdir, 'meson.build'))
-        self.assertReconfiguredBuildIsNoop()
+        self.assertNotIn('The Meson build system', self.build())
+        self.assertBuildIsNoop()
         # Changing mtime of libefile.c should rebuild the library, but not relink the executable
         self.utime(os.path.join(testdir, 'libfile.c'))
         self.assertBuildRelinkedOnlyTarget('mylib')
@@ -2358,7 +2369,10 @@ class AllPlatformTests(BasePlatformTests):
         self.assertIn(msg, out)
 
     def test_mixed_language_linker_check(self):
-        testdir = os.path.join(self.unit_test_dir, '97 compiler.links file arg')
+        orig_testdir = os.path.join(self.unit_test_dir, '97 compiler.links file arg')
+        testdir = os.path.join(tempfile.mkdtemp(), 'src')
+        self.addCleanup(windows_proof_rmtree, os.path.dirname(testdir))
+        shutil.copytree(orig_testdir, testdir)
         self.init(testdir)
         cmds = self.get_meson_log_compiler_checks()
         self.assertEqual(len(cmds), 5)
@@ -2375,7 +2389,9 @@ class AllPlatformTests(BasePlatformTests):
             #
             # only the ninja backend is competent enough to detect reconfigured
             # no-op builds without build targets
-            self.utime(os.path.join(testdir, 'test.c'))
+            ensure_backend_detects_changes(self.backend)
+            with open(os.path.join(testdir, 'test.c'), 'a', encoding='utf-8') as f:
+                f.write('\n')
             self.assertReconfiguredBuildIsNoop()
 
     def test_ndebug_if_release_disabled(self):
@@ -2392,6 +2408,115 @@ class AllPlatformTests(BasePlatformTests):
         exe = os.path.join(self.builddir, 'main')
         self.assertEqual(b'NDEBUG=0', subprocess.check_output(exe).strip())
 
+    def test_diamond_link_deps(self):
+        '''
+        Test that the transitive link dependencies of a target list every
+        library once, however many paths lead to it.
+        '''
+        testdir = os.path.join(self.unit_test_dir, '122 diamond link deps')
+        self.init(testdir)
+        b = mesonbuild.build.load(self.builddir)
+        prog = next(t for t in b.get_targets().values() if t.name == 'prog')
+        deps = [t.name for t in prog.get_transitive_link_deps()]
+        self.assertEqual(deps, ['a3', 'a2', 'a1', 'a0', 'b0', 'b1', 'b2', 'b3'])
+        self.build()
+        self.run_tests()
+
+    def test_unity_strategy(self):
+        '''
+        Test that unity files are balanced by source size or by the compile
+        times of the previous build, without changing their number.
+        '''
+        if self.backend is not Backend.ninja:
+            raise SkipTest(f'{self.backend.name!r} backend does not write .ninja_log')
+        testdir = os.path.join(self.unit_test_dir, '123 unity strategy')
+        privdir = os.path.join(self.builddir, 'prog.p')
+
+        def unity_files():
+            result = []
+            for f in sorted(glob(os.path.join(privdir, 'prog-unity*.c'))):
+                with open(f, encoding='utf-8') as ifile:
+                    result.append([os.path.basename(l.strip()[9:-1]) for l in ifile])
+            return result
+
+        self.init(testdir, extra_args=['--unity=on', '-Dunity_size=2'])
+        self.assertEqual(unity_files(), [['big.c', 'a.c'], ['b.c', 'main.c']])
+        self.init(testdir, extra_args=['--reconfigure', '-Dunity_strategy=size'])
+        self.assertEqual(unity_files(), [['big.c'], ['a.c', 'b.c', 'main.c']])
+
+        # Pretend that the unity file with the big source was the quickest.
+        # Ninja may discard a log in an older format, write it every time.
+        def write_ninja_log():
+            with open(os.path.join(self.builddir, '.ninja_log'), 'w', encoding='utf-8') as f:
+                f.write('# ninja log v5\n')
+                f.write('0\t10\t0\tprog.p/meson-generated_prog-unity0.c.o\t0\n')
+                f.write('0\t3000\t0\tprog.p/meson-generated_prog-unity1.c.o\t0\n')
+
+        # The durations are only used if the objects are newer than the
+        # unity files they were built from
+        write_ninja_log()
+        self.init(testdir, extra_args=['--reconfigure', '-Dunity_strategy=time'])
+        self.assertEqual(unity_files(), [['big.c'], ['a.c', 'b.c', 'main.c']])
+        for i in range(2):
+            mtime = os.stat(os.path.join(privdir, f'prog-unity{i}.c')).st_mtime_ns + 1
+            obj = os.path.join(privdir, f'meson-generated_prog-unity{i}.c.o')
+            Path(obj).touch()
+            os.utime(obj, ns=(mtime, mtime))
+        write_ninja_log()
+        self.init(testdir, extra_args=['--reconfigure'])
+        self.assertEqual(unity_files(), [['big.c', 'a.c', 'b.c'], ['main.c']])
+
+        # The durations do not describe the new unity files, which are split
+        # by size until they are built. Reconfiguring again before building
+        # must not move the boundaries.
+        write_ninja_log()
+        self.init(testdir, extra_args=['--reconfigure'])
+        self.assertEqual(unity_files(), [['big.c'], ['a.c', 'b.c', 'main.c']])
+        write_ninja_log()
+        self.init(testdir, extra_args=['--reconfigure'])
+        self.assertEqual(unity_files(), [['big.c'], ['a.c', 'b.c', 'main.c']])
+        self.build()
+
+    def test_analyze_includes(self):
+        '''
+        Test that headers included by most sources of a target are suggested
+        for a precompiled header.
+        '''
+        if self.backend is not Backend.ninja:
+            raise SkipTest(f'{self.backend.name!r} backend does not record header dependencies')
+        testdir = os.path.join(self.unit_test_dir, '124 analyze includes')
+        self.init(testdir)
+        self.build()
+        pchdir = os.path.join(self.builddir, 'pch')
+        out = self._run(self.meson_command + ['analyze-includes', '-C', self.builddir,
+                                              '--min-savings=0', '--write-pch', pchdir])
+        self.assertIn('prog (executable, c)', out)
+        self.assertIn('"common.h"', out)
+        self.assertNotIn('<ctype.h>', out)
+        with open(os.path.join(pchdir, 'prog_c_pch.h'), encoding='utf-8') as f:
+            self.assertIn('#include "common.h"\n', f.read())
+
+    def test_analyze_build(self):
+        '''
+        Test the report on the time spent building, and that the critical
+        path follows the chain of libraries.
+        '''
+        if self.backend is not Backend.ninja:
+            raise SkipTest(f'{self.backend.name!r} backend does not write .ninja_log')
+        testdir = os.path.join(self.unit_test_dir, '122 diamond link deps')
+        self.init(testdir)
+        self.build()
+        trace = os.path.join(self.builddir, 'trace.json')
+        out = self._run(self.meson_command + ['analyze-build', '-C', self.builddir, '--trace', trace])
+        self.assertIn('prog (executable)', out)
+        path = out.split('Critical path: ')[1].split('\n\n')[0].splitlines()[1:]
+        # The executable and one library of each of the four levels
+        self.assertGreaterEqual(len(path), 5)
+        self.assertTrue(path[-1].split()[-1].startswith('prog'), path)
+        with open(trace, encoding='utf-8') as f:
+            events = json.load(f)['traceEvents']
+        self.assertIn('prog', {e['cat'] for e in events})
+
     def test_guessed_linker_dependencies(self):
         '''
         Test that meson adds dependencies for libraries based on the final
@@ -2743,6 +2868,26 @@ class AllPlatformTests(BasePlatformTests):
             result[i['name']] = i['value']
         return result
 
+    def test_compdb_regen(self):
+        '''
+        Test that compile_commands.json is only rewritten when its contents
+        change.
+        '''
+        testdir = os.path.join(self.common_test_dir, '1 trivial')
+        self.init(testdir)
+        compdb = os.path.join(self.builddir, 'compile_commands.json')
+        self.assertLength(self.get_compdb(), 1)
+        mtime = os.stat(compdb).st_mtime_ns
+
+        self.setconf('-Dwarning_level=1')
+        self.build()
+        self.assertEqual(os.stat(compdb).st_mtime_ns, mtime)
+
+        self.setconf('-Dwarning_level=3')
+        self.build()
+        self.assertNotEqual(os.stat(compdb).st_mtime_ns, mtime)
+        self.assertIn('-Wextra', self.get_compdb()[0]['command'])
+
     def test_buildtype_setting(self):
         testdir = os.path.join(self.common_test_dir, '1 trivial')
         self.init(testdir)
@@ -3369,6 +3514,46 @@ class AllPlatformTests(BasePlatformTests):
 
         self.assertEqual(res_all, res_file)
 
+    def test_introspect_sharded_targets(self):
+        testdir = os.path.join(self.unit_test_dir, '56 introspection')
+        self.init(testdir)
+        res_monolithic = self.introspect('--targets')
+
+        self.init(testdir, extra_args=['--reconfigure', '-Dintrospection_layout=sharded'])
+        infodir = os.path.join(self.builddir, 'meson-info')
+        shard_dir = os.path.join(infodir, 'intro-targets')
+        self.assertPathDoesNotExist(os.path.join(infodir, 'intro-targets.json'))
+        with open(os.path.join(shard_dir, 'index.json'), encoding='utf-8') as fp:
+            index = json.load(fp)
+        self.assertEqual([i['id'] for i in index], [i['id'] for i in res_monolithic])
+        shards = []
+        for i in index:
+            with open(os.path.join(infodir, i['file']), encoding='utf-8') as fp:
+                shards.append(json.load(fp))
+        self.assertEqual(shards, res_monolithic)
+        self.assertEqual(self.introspect('--targets'), res_monolithic)
+
+        with open(os.path.join(infodir, 'meson-info.json'), encoding='utf-8') as fp:
+            info = json.load(fp)['introspection']['information']['targets']
+        self.assertEqual(info['file'], 'intro-targets/index.json')
+        self.assertTrue(info['sharded'])
+
+        # Unchanged targets must not be rewritten
+        def file_ids() -> T.Dict[str, T.Tuple[int, int]]:
+            ids = {}
+            for i in index:
+                st = os.stat(os.path.join(infodir, i['file']))
+                ids[i['file']] = (st.st_ino, st.st_mtime_ns)
+            return ids
+        before = file_ids()
+        self.init(testdir, extra_args=['--reconfigure'])
+        self.assertEqual(file_ids(), before)
+
+        # Switching back removes the per-target files
+        self.init(testdir, extra_args=['--reconfigure', '-Dintrospection_layout=monolithic'])
+        self.assertPathDoesNotExist(shard_dir)
+        self.assertEqual(self.introspect('--targets'), res_monolithic)
+
     def test_introspect_meson_info(self):
         testdir = os.path.join(self.unit_test_dir, '56 introspection')
         introfile = os.path.join(self.builddir, 'meson-info', 'meson-info.json')
@@ -3742,6 +3927,28 @@ class AllPlatformTests(BasePlatformTests):
             self._run([*self.meson_command, 'compile', '-C', self.builddir, '--vs-args=-t:{}:Clean'.format(re.sub(r'[\%\$\@\;\.\(\)\']', '_', get_exe_name('trivialprog')))])
             self.assertPathDoesNotExist(os.path.join(self.builddir, get_exe_name('trivialprog')))
 
+    def test_meson_compile_target_index(self):
+        """Test that meson compile resolves targets from the compact index."""
+        testdir = os.path.join(self.common_test_dir, '185 same target name')
+        self.init(testdir)
+        index_file = os.path.join(self.privatedir, 'target-index.json')
+        intro_file = os.path.join(self.builddir, 'meson-info', 'intro-targets.json')
+        self.assertPathExists(index_file)
+        with open(index_file, encoding='utf-8') as f:
+            index = json.load(f)
+        self.assertEqual(sorted(t['subdir'] for t in index['targets']['foo']), ['', 'sub'])
+
+        # The index alone must be enough to resolve a target
+        os.unlink(intro_file)
+        self._run([*self.meson_command, 'compile', '-C', self.builddir, 'sub/foo'])
+        self.assertPathExists(os.path.join(self.builddir, 'sub', 'libfoo.a'))
+
+        # Falls back to the full introspection data without an index
+        self.init(testdir, extra_args=['--wipe'])
+        os.unlink(index_file)
+        self._run([*self.meson_command, 'compile', '-C', self.builddir, './foo'])
+        self.assertPathExists(os.path.join(self.builddir, 'libfoo.a'))
+
     def test_spurious_reconfigure_built_dep_file(self):
         testdir = os.path.join(self.unit_test_dir, '73 dep files')
 
@@ -3797,6 +4004,136 @@ class AllPlatformTests(BasePlatformTests):
     def test_junit_valid_gtest(self):
         self._test_junit(os.path.join(self.framework_test_dir, '2 gtest'))
 
+    def test_ninja_shared_compile_args(self):
+        '''
+        Test that the compile arguments of a target are written once as a
+        Ninja variable, and still reach the compiler with the right quoting.
+        '''
+        if self.backend is not Backend.ninja:
+            raise SkipTest(f'{self.backend.name!r} backend does not use Ninja variables.')
+        testdir = os.path.join(self.common_test_dir, '107 spaces backslash')
+        self.init(testdir)
+        with open(os.path.join(self.builddir, 'build.ninja'), encoding='utf-8') as f:
+            contents = f.read()
+        self.assertRegex(contents, r'(?m)^SHARED_ARGS_\d+ = .*DEF_WITH_BACKSLASH')
+        self.assertRegex(contents, r'(?m)^ ARGS = \$SHARED_ARGS_\d+')
+        for cmd in self.get_compdb():
+            self.assertIn('-DDEF_WITH_BACKSLASH', cmd['command'])
+        self.build()
+        self.run_tests()
+
+    def test_profile_configure(self):
+        testdir = os.path.join(self.common_test_dir, '98 subproject subdir')
+        self.init(testdir, extra_args=['--profile-configure'])
+        with open(os.path.join(self.logdir, 'configure-profile.txt'), encoding='utf-8') as f:
+            report = f.read()
+        self.assertRegex(report, r'(?m)^ +[\d.]+ +[\d.]+ +\d+  meson\.build$')
+        self.assertRegex(report, r'(?m)^ +[\d.]+ +[\d.]+ +\d+  subprojects/sub/lib/meson\.build$')
+        self.assertRegex(report, r'(?m)  meson\.build:1: project$')
+        self.assertRegex(report, r'(?m)  meson\.build:2: subproject$')
+        with open(os.path.join(self.logdir, 'configure-profile.json'), encoding='utf-8') as f:
+            events = json.load(f)['traceEvents']
+        self.assertIn({'file': 'meson.build', 'line': 1},
+                      [e['args'] for e in events if e['name'] == 'project'])
+        self.assertIn(f'{self.backend.name} backend', [e['name'] for e in events])
+
+        # Not written unless requested
+        os.unlink(os.path.join(self.logdir, 'configure-profile.txt'))
+        self.init(testdir, extra_args=['--reconfigure'])
+        self.assertPathDoesNotExist(os.path.join(self.logdir, 'configure-profile.txt'))
+
+    def test_run_command_cache(self):
+        testdir = os.path.join(self.builddir, 'src')
+        os.mkdir(testdir)
+        self.new_builddir()
+        with open(os.path.join(testdir, 'count.py'), 'w', encoding='utf-8') as f:
+            f.write(textwrap.dedent('''\
+                import os, sys
+                with open(os.path.join(os.environ['MESON_BUILD_ROOT'], 'runs.txt'), 'a', encoding='utf-8') as f:
+                    f.write('run\\n')
+                with open(sys.argv[1], encoding='utf-8') as f:
+                    print(f.read().strip())
+                '''))
+        with open(os.path.join(testdir, 'input.txt'), 'w', encoding='utf-8') as f:
+            f.write('first\n')
+        with open(os.path.join(testdir, 'meson.build'), 'w', encoding='utf-8') as f:
+            f.write(textwrap.dedent('''\
+                project('run_command cache')
+                python = find_program('python3')
+                out = run_command(python, 'count.py', 'input.txt', check: true, cache: true).stdout().strip()
+                message('output is ' + out)
+                '''))
+        runs = os.path.join(self.builddir, 'runs.txt')
+
+        def count_runs() -> int:
+            with open(runs, encoding='utf-8') as f:
+                return len(f.readlines())
+
+        out = self.init(testdir)
+        self.assertIn('output is first', out)
+        self.assertEqual(count_runs(), 1)
+        out = self.init(testdir, extra_args=['--reconfigure'])
+        self.assertIn('output is first', out)
+        self.assertEqual(count_runs(), 1)
+
+        # Changing a file in the command line runs it again
+        with open(os.path.join(testdir, 'input.txt'), 'w', encoding='utf-8') as f:
+            f.write('second\n')
+        out = self.init(testdir, extra_args=['--reconfigure'])
+        self.assertIn('output is second', out)
+        self.assertEqual(count_runs(), 2)
+        self.init(testdir, extra_args=['--reconfigure', '--clearcache'])
+        self.assertEqual(count_runs(), 3)
+
+        # A cached failure is still an error with check: true
+        with open(os.path.join(testdir, 'meson.build'), 'w', encoding='utf-8') as f:
+            f.write(textwrap.dedent('''\
+                project('run_command cache')
+                python = find_program('python3')
+                rc = run_command(python, 'count.py', 'missing.txt', check: false, cache: true).returncode()
+                message('returncode is @0@'.format(rc))
+                '''))
+        out = self.init(testdir, extra_args=['--reconfigure'])
+        self.assertNotIn('returncode is 0', out)
+        self.assertEqual(count_runs(), 4)
+        with open(os.path.join(testdir, 'meson.build'), 'w', encoding='utf-8') as f:
+            f.write(textwrap.dedent('''\
+                project('run_command cache')
+                python = find_program('python3')
+                run_command(python, 'count.py', 'missing.txt', check: true, cache: true)
+                '''))
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            self.init(testdir, extra_args=['--reconfigure'])
+        self.assertIn('count.py missing.txt` failed with status 1.', cm.exception.stdout)
+        self.assertEqual(count_runs(), 4)
+
+    def test_program_version_cache_regen_dep(self):
+        if self.backend is not Backend.ninja:
+            raise SkipTest('This test reads the ninja file')
+        testdir = os.path.join(self.builddir, 'src')
+        os.mkdir(testdir)
+        self.new_builddir()
+        tool = os.path.join(testdir, 'tool.py')
+        with open(tool, 'w', encoding='utf-8') as f:
+            f.write('#!/usr/bin/env python3\nprint("tool 1.2")\n')
+        os.chmod(tool, 0o755)
+        with open(os.path.join(testdir, 'meson.build'), 'w', encoding='utf-8') as f:
+            f.write("project('version cache')\nfind_program('tool.py', version: '>=1.0')\n")
+
+        def regen_deps() -> str:
+            with open(os.path.join(self.builddir, 'build.ninja'), encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith('build build.ninja:'):
+                        return line
+            return ''
+
+        self.init(testdir)
+        self.assertIn('tool.py', regen_deps())
+        # The version now comes from the program cache, the program must
+        # still cause a reconfigure when it changes
+        self.init(testdir, extra_args=['--reconfigure'])
+        self.assertIn('tool.py', regen_deps())
+
     def test_link_language_linker(self):
         # TODO: there should be some way to query how we're linking things
         # without resorting to reading the ninja.build file
@@ -4167,12 +4504,16 @@ class AllPlatformTests(BasePlatformTests):
         # This checks a bug where if a non-meson project is used as a third
         # level (or deeper) subproject it doesn't cause a rebuild if the build
         # files for that project are changed
-        testdir = os.path.join(self.unit_test_dir, '84 nested subproject regenerate depends')
+        orig_testdir = os.path.join(self.unit_test_dir, '84 nested subproject regenerate depends')
+        testdir = os.path.join(tempfile.mkdtemp(), 'src')
+        self.addCleanup(windows_proof_rmtree, os.path.dirname(testdir))
+        shutil.copytree(orig_testdir, testdir)
         cmakefile = Path(testdir) / 'subprojects' / 'sub2' / 'CMakeLists.txt'
         self.init(testdir)
         self.build()
-        with cmakefile.open('a', encoding='utf-8'):
-            os.utime(str(cmakefile))
+        ensure_backend_detects_changes(self.backend)
+        with cmakefile.open('a', encoding='utf-8') as f:
+            f.write('\n')
         self.assertReconfiguredBuildIsNoop()
 
     def test_version_file(self):
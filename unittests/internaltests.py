@@ -1,10 +1,12 @@
 # SPDX-License-Identifier: Apache-2.0
 # Copyright 2016-2021 The Meson development team
 
+from concurrent.futures import ThreadPoolExecutor
 from configparser import ConfigParser
 from pathlib import Path
 from unittest import mock
 import contextlib
+import copy
 import io
 import json
 import operator
@@ -12,7 +14,9 @@ import os
 import pickle
 import stat
 import subprocess
+import sys
 import tempfile
+import time
 import typing as T
 import unittest
 
@@ -23,21 +27,30 @@ import mesonbuild.dependencies.factory
 import mesonbuild.envconfig
 import mesonbuild.environment
 import mesonbuild.modules.gnome
+import mesonbuild.scripts.run_tool
+import mesonbuild.utils.universal
 from mesonbuild import coredata
 from mesonbuild.compilers.c import ClangCCompiler, GnuCCompiler
 from mesonbuild.compilers.cpp import VisualStudioCPPCompiler
 from mesonbuild.compilers.d import DmdDCompiler
+from mesonbuild.compilers import detect_compiler_for, prefetch_compilers
+from mesonbuild.compilers.detect import _get_detection_cache_file
+from mesonbuild.arglist import Dedup
+from mesonbuild.build import ConfigurationData
 from mesonbuild.linkers import linkers
-from mesonbuild.interpreterbase import typed_pos_args, InvalidArguments, ObjectHolder
+from mesonbuild.interpreterbase import typed_pos_args, InvalidArguments, ObjectHolder, InterpreterBase, MesonOperator
+from mesonbuild.interpreter.primitives import (
+    ArrayHolder, DependencyVariableString, DependencyVariableStringHolder, IntegerHolder, StringHolder
+)
 from mesonbuild.interpreterbase import typed_pos_args, InvalidArguments, typed_kwargs, ContainerTypeInfo, KwargInfo
 from mesonbuild.mesonlib import (
     LibType, MachineChoice, PerMachine, Version, is_windows, is_osx,
-    is_cygwin, is_openbsd, search_version, MesonException, OptionKey,
-    OptionType
+    is_cygwin, is_openbsd, is_linux, search_version, MesonException, OptionKey,
+    OptionType, DirectoryIndex, Popen_safe, prefetch_popen, ConfigureFileWriter, File
 )
 from mesonbuild.interpreter.type_checking import in_set_validator, NoneType
 from mesonbuild.dependencies.pkgconfig import PkgConfigDependency, PkgConfigInterface, PkgConfigCLI
-from mesonbuild.programs import ExternalProgram
+from mesonbuild.programs import ExternalProgram, ProgramCache
 import mesonbuild.modules.pkgconfig
 
 
@@ -131,6 +144,19 @@ class InternalTests(unittest.TestCase):
         a += ['-Ifirst']
         self.assertEqual(a, ['-Ifirst', '-Isecond', '-Ithird'])
 
+    def test_compiler_args_dedup_cache_per_class(self):
+        # The memoized de-dup decisions must not leak between CompilerArgs
+        # subclasses since they use different rules.
+        cc = ClangCCompiler([], [], 'fake', MachineChoice.HOST, False, mock.Mock())
+        d = DmdDCompiler([], 'fake', MachineChoice.HOST, 'info', 'arch')
+        ca = cc.compiler_args()
+        da = d.compiler_args()
+        self.assertIsNot(type(ca)._dedup_cache, type(da)._dedup_cache)
+        self.assertIs(ca._can_dedup('-DFOO'), Dedup.OVERRIDDEN)
+        self.assertIs(da._can_dedup('-DFOO'), Dedup.NO_DEDUP)
+        self.assertIs(ca._can_dedup('-DFOO'), Dedup.OVERRIDDEN)
+        self.assertIn('-DFOO', type(ca)._dedup_cache)
+
     def test_compiler_args_class_clike(self):
         cc = ClangCCompiler([], [], 'fake', MachineChoice.HOST, False, mock.Mock())
         # Test that empty initialization works
@@ -470,6 +496,30 @@ class InternalTests(unittest.TestCase):
 
         self.assertEqual(forced_value, desired_value)
 
+    def test_file_interning(self):
+        f = File.from_built_file('sub', 'gen.c')
+        self.assertIs(f, File(True, 'sub', 'gen.c'))
+        self.assertIs(f, File.from_built_relative(os.path.join('sub', 'gen.c')))
+        self.assertIsNot(f, File(False, 'sub', 'gen.c'))
+        self.assertIs(f, copy.deepcopy(f))
+        self.assertIs(f, pickle.loads(pickle.dumps(f)))
+        self.assertFalse(hasattr(f, '__dict__'))
+
+        src = File(False, 'sub', 'main.c')
+        self.assertEqual(src.rel_to_builddir('../src'), os.path.join('../src', 'sub', 'main.c'))
+        self.assertEqual(src.rel_to_builddir('..'), os.path.join('..', 'sub', 'main.c'))
+        self.assertEqual(src.absolute_path('/s', '/b'), os.path.join('/s', 'sub', 'main.c'))
+        self.assertEqual(f.absolute_path('/s', '/b'), os.path.join('/b', 'sub', 'gen.c'))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with self.assertRaises(MesonException):
+                File.from_source_file(tmpdir, '', 'main.c')
+            Path(tmpdir, 'main.c').touch()
+            self.assertIs(File.from_source_file(tmpdir, '', 'main.c'), File(False, '', 'main.c'))
+            # Existence is checked again for another source root
+            with self.assertRaises(MesonException):
+                File.from_source_file(os.path.join(tmpdir, 'other'), '', 'main.c')
+
     def test_listify(self):
         listify = mesonbuild.mesonlib.listify
         # Test sanity
@@ -521,6 +571,30 @@ class InternalTests(unittest.TestCase):
         kwargs = {'sources': [1, [2, [3]]]}
         self.assertEqual([1, 2, 3], extract(kwargs, 'sources'))
 
+    def test_primitive_holders(self):
+        interp = InterpreterBase('', '', '')
+        interp.environment = None
+        interp.holder_map.update({str: StringHolder, int: IntegerHolder, list: ArrayHolder})
+
+        # Holders of immutable values are shared, mutable ones are not
+        foo = interp._holderify('foo')
+        self.assertIs(foo, interp._holderify('foo'))
+        self.assertIs(interp._holderify(3), interp._holderify(3))
+        self.assertIsNot(interp._holderify(['a']), interp._holderify(['a']))
+        self.assertIsNot(interp._holderify('x' * 1000), interp._holderify('x' * 1000))
+
+        # Methods and operators come from the class tables
+        self.assertEqual(foo.method_call('to_upper', [], {}), 'FOO')
+        self.assertEqual(foo.operator_call(MesonOperator.PLUS, 'bar'), 'foobar')
+        self.assertEqual(foo.operator_call(MesonOperator.INDEX, 1), 'o')
+        self.assertTrue(interp._holderify(3).operator_call(MesonOperator.EQUALS, 3))
+        with self.assertRaises(InvalidArguments):
+            foo.operator_call(MesonOperator.PLUS, 1)
+
+        # Subclasses override the methods named in the tables
+        dep_str = DependencyVariableStringHolder(DependencyVariableString('a'), interp)
+        self.assertIsInstance(dep_str.operator_call(MesonOperator.DIV, 'b'), DependencyVariableString)
+
     def _test_all_naming(self, cc, env, patterns, platform):
         shr = patterns[platform]['shared']
         stc = patterns[platform]['static']
@@ -592,6 +666,215 @@ class InternalTests(unittest.TestCase):
             env.machines.host.system = 'windows'
             self._test_all_naming(cc, env, patterns, 'windows-mingw')
 
+    def test_directory_index(self):
+        index = DirectoryIndex()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            Path(tmpdir, 'libfoo.so').write_bytes(b'\x7fELF\x02')
+            Path(tmpdir, 'libfoo.a').write_text('', encoding='utf-8')
+            Path(tmpdir, 'sub').mkdir()
+            self.assertTrue(index.is_file(os.path.join(tmpdir, 'libfoo.so')))
+            self.assertFalse(index.is_file(os.path.join(tmpdir, 'sub')))
+            self.assertTrue(index.exists(os.path.join(tmpdir, 'sub')))
+            self.assertFalse(index.exists(os.path.join(tmpdir, 'libbar.so')))
+            self.assertEqual(sorted(index.files(tmpdir)), ['libfoo.a', 'libfoo.so'])
+            self.assertEqual(index.elf_class(os.path.join(tmpdir, 'libfoo.so')), 2)
+            self.assertEqual(index.elf_class(os.path.join(tmpdir, 'libfoo.a')), 0)
+            self.assertIsNone(index.elf_class(os.path.join(tmpdir, 'libbar.so')))
+
+            # A directory that was just modified must be listed again
+            Path(tmpdir, 'libbar.so').write_text('', encoding='utf-8')
+            self.assertTrue(index.is_file(os.path.join(tmpdir, 'libbar.so')))
+            self.assertNotIn(tmpdir, index.listings)
+
+            # Older ones are listed once
+            old = time.time() - 60
+            os.utime(tmpdir, (old, old))
+            self.assertTrue(index.is_file(os.path.join(tmpdir, 'libbar.so')))
+            with mock.patch('os.scandir', side_effect=AssertionError):
+                self.assertTrue(index.is_file(os.path.join(tmpdir, 'libfoo.so')))
+                self.assertFalse(index.is_file(os.path.join(tmpdir, 'libbaz.so')))
+
+    @unittest.skipUnless(is_linux(), 'requires the GNU library layout')
+    def test_find_library_without_link_check(self):
+        '''
+        Libraries in the default search path of the compiler are found
+        without linking a test program.
+        '''
+        env = get_fake_env()
+        cc = detect_c_compiler(env, MachineChoice.HOST)
+        if not cc.get_library_dirs(env):
+            raise unittest.SkipTest('compiler does not report its library dirs')
+        with mock.patch.object(cc, '_get_elf_class', return_value=0), \
+                mock.patch.object(cc, 'links', side_effect=AssertionError('link check was run')):
+            self.assertEqual(cc.find_library('c', env, []), ['-lc'])
+            # Unless the flags from the environment change the search path
+            for arg in ['-L/opt/lib', '-Wl,-L/opt/lib', '--sysroot=/opt', '-static', '-nostdlib', '-B/opt/bin']:
+                with mock.patch.object(env.coredata, 'get_external_link_args', return_value=[arg]):
+                    self.assertFalse(cc._links_from_library_dirs('c', env), arg)
+                with mock.patch.object(env.coredata, 'get_external_args', return_value=[arg]):
+                    self.assertFalse(cc._links_from_library_dirs('c', env), arg)
+
+    def test_compiler_detection_cache(self):
+        with tempfile.TemporaryDirectory() as cachedir, \
+                mock.patch.dict(os.environ, {'MESON_COMPILER_CACHE_DIR': cachedir}):
+            env = get_fake_env()
+            cc = detect_compiler_for(env, 'c', MachineChoice.HOST, True)
+            self.assertEqual(len(os.listdir(cachedir)), 1)
+
+            # Detection is skipped, the sanity check is done once
+            env = get_fake_env()
+            with mock.patch('mesonbuild.compilers.detect.compiler_from_language',
+                            side_effect=AssertionError('compiler detected again')):
+                with mock.patch.object(type(cc), 'sanity_check') as sanity_check:
+                    cached = detect_compiler_for(env, 'c', MachineChoice.HOST, False)
+                    sanity_check.assert_called_once()
+                    detect_compiler_for(get_fake_env(), 'c', MachineChoice.HOST, False)
+                    sanity_check.assert_called_once()
+            self.assertIsInstance(cached, type(cc))
+            self.assertEqual(cached.get_exelist(), cc.get_exelist())
+            self.assertEqual(cached.version, cc.version)
+            self.assertEqual(cached.linker.id, cc.linker.id)
+            self.assertIn(OptionKey('args', lang='c'), env.coredata.options)
+
+            # Different flags are a different detection
+            with mock.patch.dict(os.environ, {'CFLAGS': '-DMESON_TEST_FLAG'}):
+                env = get_fake_env()
+            detect_compiler_for(env, 'c', MachineChoice.HOST, True)
+            self.assertEqual(len(os.listdir(cachedir)), 2)
+
+            # Languages detected with the help of the C compiler depend on it
+            with mock.patch.dict(os.environ, {'CC': 'mesontest-cc', 'CFLAGS': ''}):
+                other_env = get_fake_env()
+            for lang in ['rust', 'd', 'nasm']:
+                self.assertNotEqual(_get_detection_cache_file(env, lang, MachineChoice.HOST),
+                                    _get_detection_cache_file(other_env, lang, MachineChoice.HOST))
+            self.assertEqual(_get_detection_cache_file(get_fake_env(), 'cpp', MachineChoice.HOST),
+                             _get_detection_cache_file(other_env, 'cpp', MachineChoice.HOST))
+
+    def test_prefetch_compilers(self):
+        cmd = [sys.executable, '-c', 'print("prefetched")']
+        with ThreadPoolExecutor() as executor:
+            prefetch_popen(executor, cmd).result()
+            with mock.patch('mesonbuild.utils.universal._run_popen_safe',
+                            side_effect=AssertionError('command run again')):
+                p, o, _ = Popen_safe(cmd)
+        self.assertEqual(p.returncode, 0)
+        self.assertEqual(o.strip(), 'prefetched')
+        self.assertEqual(mesonbuild.utils.universal._prefetched_popen, {})
+
+        cc = detect_compiler_for(get_fake_env(), 'c', MachineChoice.HOST, True)
+        env = get_fake_env()
+        with prefetch_compilers(env, ['c'], [MachineChoice.HOST]):
+            prefetched = detect_compiler_for(env, 'c', MachineChoice.HOST, True)
+        self.assertEqual(mesonbuild.utils.universal._prefetched_popen, {})
+        self.assertIsInstance(prefetched, type(cc))
+        self.assertEqual(prefetched.get_exelist(), cc.get_exelist())
+        self.assertEqual(prefetched.version, cc.version)
+        self.assertEqual(prefetched.linker.id, cc.linker.id)
+
+    def test_program_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as bindir:
+            script = os.path.join(tmpdir, 'tool.py')
+            with open(script, 'w', encoding='utf-8') as f:
+                f.write('print("tool 1.2.3")\n')
+            cache = ProgramCache()
+            with mock.patch('mesonbuild.programs.program_cache', cache):
+                self.assertEqual(ExternalProgram('tool', [sys.executable, script]).get_version(), '1.2.3')
+                with mock.patch('mesonbuild.mesonlib.Popen_safe',
+                                side_effect=AssertionError('version queried again')):
+                    self.assertEqual(ExternalProgram('tool', [sys.executable, script]).get_version(), '1.2.3')
+                self.assertIsNone(cache.which('tool', bindir))
+
+                # Lookups in directories that changed just now are not saved
+                cache.save(tmpdir)
+                cache.load(tmpdir)
+                self.assertNotIn(('tool', bindir), cache.lookups)
+                self.assertEqual(cache.get_version([sys.executable, script]), '1.2.3')
+                os.utime(bindir, ns=(0, 0))
+                cache.which('tool', bindir)
+                cache.save(tmpdir)
+                cache.load(tmpdir)
+                self.assertIn(('tool', bindir), cache.lookups)
+
+                # Changes to the command or to the search path invalidate it
+                with open(script, 'w', encoding='utf-8') as f:
+                    f.write('print("tool 1.2.4")\n')
+                self.assertIsNone(cache.get_version([sys.executable, script]))
+                self.assertEqual(ExternalProgram('tool', [sys.executable, script]).get_version(), '1.2.4')
+                with open(os.path.join(bindir, 'tool'), 'w', encoding='utf-8'):
+                    pass
+                cache.load(tmpdir)
+                self.assertNotIn(('tool', bindir), cache.lookups)
+
+    def test_configuration_data_copy_on_write(self):
+        conf = ConfigurationData({f'KEY{i}': str(i) for i in range(1000)})
+        copies = []
+        for i in range(20):
+            conf.values[f'KEY{i}'] = ('changed', 'desc')
+            conf.values[f'NEW{i}'] = (i, None)
+            copies.append(copy.deepcopy(conf))
+        copies[0].values['KEY999'] = (True, None)
+        self.assertEqual(conf.get('KEY999'), ('999', None))
+        self.assertEqual(copies[0].get('KEY999'), (True, None))
+        self.assertEqual(copies[0].get('KEY1'), ('1', None))
+        self.assertNotIn('NEW1', copies[0])
+        self.assertEqual(len(copies[0].values), 1001)
+        self.assertEqual(len(conf.values), 1020)
+        self.assertEqual(list(conf.keys())[:2], ['KEY0', 'KEY1'])
+        self.assertEqual(list(conf.keys())[-1], 'NEW19')
+        self.assertEqual(dict(copies[-1].values), dict(conf.values))
+
+        merged = ConfigurationData()
+        merged.values.update(copies[5].values)
+        merged.values.update({'KEY0': ('merged', None)})
+        self.assertEqual(merged.get('KEY0'), ('merged', None))
+        self.assertEqual(copies[5].get('KEY0'), ('changed', 'desc'))
+        self.assertEqual(len(merged.values), 1006)
+
+        # Copies share their entries when pickled together
+        single = len(pickle.dumps(conf))
+        self.assertLess(len(pickle.dumps(copies)), 2 * single)
+        self.assertEqual(dict(pickle.loads(pickle.dumps(copies))[3].values), dict(copies[3].values))
+
+    def test_configure_file_writer(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            src = os.path.join(tmpdir, 'config.h.in')
+            dst = os.path.join(tmpdir, 'config.h')
+            hdr = os.path.join(tmpdir, 'defs.h')
+            with open(src, 'w', encoding='utf-8') as f:
+                f.write('#mesondefine FOO\n#define BAR @BAR@\n')
+            conf = ConfigurationData({'FOO': 'foo'})
+            cache: T.Dict[str, T.Any] = {}
+            writer = ConfigureFileWriter(cache)
+            self.assertEqual(writer.conf_file(src, dst, conf, 'meson'), ({'BAR'}, False))
+            writer.conf_header(hdr, conf, 'c', None)
+            self.assertEqual(len(writer.pending), 2)
+            writer.flush()
+            with open(dst, encoding='utf-8') as f:
+                self.assertEqual(f.read(), '#define FOO foo\n#define BAR \n')
+            self.assertTrue(os.path.isfile(hdr))
+
+            # Nothing changed, the templates are not expanded again
+            writer = ConfigureFileWriter(cache)
+            with mock.patch('mesonbuild.utils.universal.do_conf_str', side_effect=AssertionError('expanded')), \
+                    mock.patch('mesonbuild.utils.universal._dump_c_header', side_effect=AssertionError('expanded')):
+                self.assertEqual(writer.conf_file(src, dst, conf, 'meson'), ({'BAR'}, False))
+                writer.conf_header(hdr, conf, 'c', None)
+            self.assertEqual(writer.pending, {})
+
+            # Changed configuration data or output
+            conf = ConfigurationData({'FOO': 'foo', 'BAR': 'bar'})
+            self.assertEqual(writer.conf_file(src, dst, conf, 'meson'), (set(), False))
+            with open(hdr, 'w', encoding='utf-8') as f:
+                f.write('modified')
+            writer.conf_header(hdr, conf, 'c', None)
+            self.assertEqual(len(writer.pending), 2)
+            writer.flush()
+            with open(dst, encoding='utf-8') as f:
+                self.assertEqual(f.read(), '#define FOO foo\n#define BAR bar\n')
+            with open(hdr, encoding='utf-8') as f:
+                self.assertIn('#define BAR bar', f.read())
+
     @skipIfNoPkgconfig
     def test_pkgconfig_parse_libs(self):
         '''
@@ -929,6 +1212,43 @@ class InternalTests(unittest.TestCase):
             deps = d.get_all_dependencies(target)
             self.assertEqual(sorted(deps), sorted(expdeps))
 
+    def test_run_tool_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            srcdir = Path(tmpdir, 'src')
+            builddir = srcdir / 'build'
+            (srcdir / 'sub').mkdir(parents=True)
+            (builddir / 'meson-private').mkdir(parents=True)
+            for f in ['a.c', 'b.c', 'sub/c.cpp', 'sub/d.h', 'build/e.c', 'f.txt']:
+                (srcdir / f).write_text('int x;\n', encoding='utf-8')
+            (srcdir / '.tool-ignore').write_text('sub/*.h\n', encoding='utf-8')
+            (srcdir / '.clang-tidy').write_text('Checks: a\n', encoding='utf-8')
+
+            seen = []
+            def fn(fname: Path) -> subprocess.CompletedProcess:
+                seen.append(fname.relative_to(srcdir).as_posix())
+                return subprocess.CompletedProcess([], 1 if fname.name == 'b.c' else 0, f'{fname.name}\n')
+
+            def run() -> T.List[str]:
+                seen.clear()
+                cache = mesonbuild.scripts.run_tool.ResultCache(
+                    builddir / 'meson-private' / 'results.json', [], [], ['.clang-tidy'])
+                with mock.patch('mesonbuild.scripts.run_tool.quiet_git', return_value=(False, '')), \
+                        mock.patch('sys.stdout', io.StringIO()):
+                    ret = mesonbuild.scripts.run_tool.run_tool('tool', srcdir, builddir, fn, cache=cache)
+                self.assertEqual(ret, 1)
+                return sorted(seen)
+
+            self.assertEqual(run(), ['a.c', 'b.c', 'sub/c.cpp'])
+            # Failures are not cached
+            self.assertEqual(run(), ['b.c'])
+            (srcdir / 'sub/c.cpp').write_text('int y;\n', encoding='utf-8')
+            self.assertEqual(run(), ['b.c', 'sub/c.cpp'])
+            # A change of the configuration reruns the files below it
+            (srcdir / 'sub/.clang-tidy').write_text('Checks: b\n', encoding='utf-8')
+            self.assertEqual(run(), ['b.c', 'sub/c.cpp'])
+            (srcdir / '.clang-tidy').write_text('Checks: c\n', encoding='utf-8')
+            self.assertEqual(run(), ['a.c', 'b.c', 'sub/c.cpp'])
+
     def test_log_once(self):
         f = io.StringIO()
         with mock.patch('mesonbuild.mlog._logger.log_file', f), \
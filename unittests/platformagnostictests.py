@@ -250,7 +250,7 @@ class PlatformAgnosticTests(BasePlatformTests):
             expected = json.load(f)['meson']['modules']
 
         self.assertEqual(data['modules'], expected)
-        self.assertEqual(data['count'], 68)
+        self.assertEqual(data['count'], 70)
 
     def test_meson_package_cache_dir(self):
         # Copy testdir into temporary directory to not pollute meson source tree.
@@ -261,6 +261,18 @@ class PlatformAgnosticTests(BasePlatformTests):
         self.change_builddir(builddir)
         self.init(srcdir, override_envvars={'MESON_PACKAGE_CACHE_DIR': os.path.join(srcdir, 'cache_dir')})
 
+    def test_wrap_prefetch(self):
+        testdir = os.path.join(self.unit_test_dir, '125 wrap prefetch')
+        srcdir = os.path.join(self.builddir, 'srctree')
+        shutil.copytree(testdir, srcdir)
+        builddir = os.path.join(srcdir, '_build')
+        self.change_builddir(builddir)
+        out = self.init(srcdir, extra_args=['-Dwrap_prefetch=true'],
+                        override_envvars={'MESON_PACKAGE_CACHE_DIR': os.path.join(srcdir, 'cache_dir')})
+        self.assertIn('Prefetching 2 subprojects', out)
+        for name in ['foo', 'bar']:
+            self.assertPathExists(os.path.join(srcdir, 'subprojects', name, 'meson.build'))
+
     def test_cmake_openssl_not_found_bug(self):
         """Issue #12098"""
         testdir = os.path.join(self.unit_test_dir, '119 openssl cmake bug')
@@ -77,6 +77,24 @@ python = pymod.find_installation('python3', required: true)
         else:
             self.assertEqual(count, 5)
 
+    def test_bytecompile_incremental(self):
+        testdir = os.path.join(self.src_root, 'test cases', 'python', '2 extmodule')
+        self.init(testdir, extra_args=['-Dpython2=disabled', '-Dpython.bytecompile=2'])
+        self.build()
+        self.install()
+
+        def bytecode():
+            pycs = glob.glob(os.path.join(self.installdir, '**', '__pycache__', '*.pyc'), recursive=True)
+            return {f: os.stat(f).st_mtime_ns for f in pycs}
+
+        first = bytecode()
+        # 5 files at 3 optimization levels
+        self.assertLength(first, 15)
+
+        # Reinstalling unchanged sources leaves their bytecode alone
+        self.install()
+        self.assertEqual(bytecode(), first)
+
     def test_bytecompile_multi(self):
         if not shutil.which('python2') and not PythonModule._get_win_pythonpath('python2'):
             raise self.skipTest('python2 not installed')